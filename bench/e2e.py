@@ -0,0 +1,165 @@
+import json
+import os
+import psutil
+
+from tclogger import logger, logstr, brk, dict_to_str, get_now_str
+from time import perf_counter
+
+from configs.envs import DATA_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL
+from web.browser import BrowserClient
+from web.blinkit.scraper import BlinkitBrowserScraper, BlinkitProductDataExtractor
+from web.zepto.scraper import ZeptoBrowserScraper, ZeptoProductDataExtractor
+from web.swiggy.scraper import SwiggyBrowserScraper, SwiggyProductDataExtractor
+from web.dmart.scraper import DmartBrowserScraper, DmartProductDataExtractor
+from bench.fixtures import BenchFixtures
+from bench.server import BenchServer, BenchServerArgParser, get_profile
+
+BENCH_DUMPS_ROOT = DATA_ROOT / "bench" / "dumps"
+BENCH_RESULTS_ROOT = DATA_ROOT / "bench" / "results"
+SCRAPER_CLASSES = {
+    "blinkit": (BlinkitBrowserScraper, BlinkitProductDataExtractor),
+    "zepto": (ZeptoBrowserScraper, ZeptoProductDataExtractor),
+    "swiggy": (SwiggyBrowserScraper, SwiggyProductDataExtractor),
+    "dmart": (DmartBrowserScraper, DmartProductDataExtractor),
+}
+
+
+def get_cpu_seconds(process: psutil.Process) -> float:
+    """User and system cpu seconds of process and its children."""
+    seconds = 0
+    for proc in [process, *process.children(recursive=True)]:
+        try:
+            cpu_times = proc.cpu_times()
+        except psutil.Error:
+            continue
+        seconds += cpu_times.user + cpu_times.system
+    return seconds
+
+
+class E2EBench:
+    """Run real scrapers and extractors of each site against `BenchServer`.
+
+    Browser resolves hosts of sites to local server by `--host-resolver-rules`,
+    so scrapers visit the same urls as in production, without network.
+    """
+
+    def __init__(
+        self,
+        server: BenchServer,
+        fixtures: BenchFixtures = None,
+        browser_port: int = 9400,
+        limit: int = None,
+    ):
+        self.server = server
+        self.fixtures = fixtures or server.fixtures
+        self.browser_port = browser_port
+        self.limit = limit
+
+    def init_scraper(self, site: WEBSITE_LITERAL):
+        scraper_class, extractor_class = SCRAPER_CLASSES[site]
+        scraper = scraper_class(date_str="bench")
+        scraper.client = BrowserClient(
+            uid="bench",
+            port=self.browser_port,
+            arguments=self.server.get_browser_arguments(),
+        )
+        scraper.dump_root = BENCH_DUMPS_ROOT / site
+        extractor = extractor_class()
+        return scraper, extractor
+
+    def run_site(self, site: WEBSITE_LITERAL) -> dict:
+        product_ids = self.fixtures.get_ids(site)[: self.limit]
+        if not product_ids:
+            logger.warn(f"  × No fixtures of site: {logstr.mesg(brk(site))}")
+            return {"site": site, "products": 0}
+        logger.note(f"> Bench site: {logstr.mesg(brk(site))}")
+        scraper, extractor = self.init_scraper(site)
+        self_process = psutil.Process(os.getpid())
+        self_cpu_start = get_cpu_seconds(self_process)
+        done_count, failed_count = 0, 0
+        start = perf_counter()
+        for product_id in product_ids:
+            try:
+                product_info = scraper.run(product_id)
+                if not product_info:
+                    raise ValueError("empty product info")
+                extractor.extract(product_info)
+                done_count += 1
+            except Exception as e:
+                logger.warn(f"  × {site} {product_id}: {e}")
+                failed_count += 1
+        elapsed = perf_counter() - start
+        browser_cpu, browser_rss = 0, 0
+        client = scraper.client
+        if client.is_browser_opened:
+            browser_process = psutil.Process(client.browser.process_id)
+            browser_cpu = get_cpu_seconds(browser_process)
+            browser_rss = client.get_rss()
+        client.stop_client(close_browser=True)
+        self_cpu = get_cpu_seconds(self_process) - self_cpu_start
+        result = {
+            "site": site,
+            "products": len(product_ids),
+            "done": done_count,
+            "failed": failed_count,
+            "elapsed_seconds": round(elapsed, 3),
+            "products_per_min": round(done_count / elapsed * 60, 2),
+            "cpu_seconds": {
+                "python": round(self_cpu, 3),
+                "browser": round(browser_cpu, 3),
+            },
+            "browser_rss_mb": round(browser_rss / 1024 / 1024, 1),
+            "python_rss_mb": round(self_process.memory_info().rss / 1024 / 1024, 1),
+        }
+        logger.mesg(dict_to_str(result), indent=2)
+        return result
+
+    def run(self, sites: list[WEBSITE_LITERAL] = WEBSITE_NAMES) -> dict:
+        results = {
+            "run_at": get_now_str(),
+            "profile": self.server.profile.__dict__,
+            "sites": [self.run_site(site) for site in sites],
+        }
+        results["server"] = {
+            "requests": self.server.request_count,
+            "errors": self.server.error_count,
+        }
+        return results
+
+
+def save_results(results: dict, name: str) -> str:
+    run_id = results["run_at"].replace(" ", "_").replace(":", "-")
+    results_path = BENCH_RESULTS_ROOT / f"{name}_{run_id}.json"
+    results_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = results_path.with_suffix(".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as wf:
+        json.dump(results, wf, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, results_path)
+    logger.okay(f"  * Bench results: {brk(results_path)}")
+    return results_path
+
+
+class E2EArgParser(BenchServerArgParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-s", "--sites", nargs="+", default=WEBSITE_NAMES)
+        self.add_argument("-n", "--limit", type=int, default=None)
+        self.add_argument("-b", "--browser-port", type=int, default=9400)
+
+
+if __name__ == "__main__":
+    args = E2EArgParser().parse_args()
+    server = BenchServer(port=args.port, profile=get_profile(args))
+    server.start()
+    try:
+        bench = E2EBench(server, browser_port=args.browser_port, limit=args.limit)
+        results = bench.run(sites=args.sites)
+    finally:
+        server.stop()
+    save_results(results, name="e2e")
+
+    # Case 1: bench all sites with fixtures, without latency
+    # python -m bench.e2e
+
+    # Case 2: bench blinkit with typical latency and 5 products
+    # python -m bench.e2e -s blinkit -f typical -n 5
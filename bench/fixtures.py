@@ -0,0 +1,166 @@
+import argparse
+import json
+import pandas as pd
+import random
+import sys
+
+from pathlib import Path
+from tclogger import logger, logstr, brk, get_now_str
+from urllib.parse import quote, unquote
+
+from configs.envs import DATA_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL
+from file.excel_merger import DISCOUNT_COLUMNS_MAP, WEBSITE_CHECK_COLUMNS_MAP
+
+FIXTURES_ROOT = DATA_ROOT / "bench" / "fixtures"
+# keys added by scrapers, which are not parts of site responses
+SCRAPER_KEYS = ["cookies", "local_storage", "product_id"]
+
+
+def to_script_json(data: dict) -> str:
+    """Dump json which is safe to be embedded in `<script>`."""
+    return json.dumps(data, ensure_ascii=False).replace("</", "<\\/")
+
+
+class BenchFixtures:
+    """Product responses recorded from local dumps, and pages rendered from them
+    in the shapes which scrapers of each site parse.
+
+    Recorded fixtures: `data/bench/fixtures/<site>/<product_id>.json`
+    """
+
+    def __init__(self, fixtures_root: Path = FIXTURES_ROOT):
+        self.fixtures_root = fixtures_root
+
+    def get_site_root(self, site: WEBSITE_LITERAL) -> Path:
+        return self.fixtures_root / site
+
+    def get_ids(self, site: WEBSITE_LITERAL) -> list[str]:
+        site_root = self.get_site_root(site)
+        if not site_root.exists():
+            return []
+        # dmart dumps are named by quoted product url
+        return sorted(unquote(path.stem) for path in site_root.glob("*.json"))
+
+    def load(self, site: WEBSITE_LITERAL, product_id: str) -> dict:
+        fixture_path = self.get_site_root(site) / f"{quote(product_id, safe='')}.json"
+        if not fixture_path.exists():
+            return None
+        with open(fixture_path, "r", encoding="utf-8") as rf:
+            return json.load(rf)
+
+    def record(
+        self,
+        site: WEBSITE_LITERAL,
+        date_str: str,
+        location: str,
+        limit: int = 20,
+    ) -> int:
+        """Copy dumps of products to fixtures, without cookies of browser."""
+        dump_root = DATA_ROOT / "dumps" / date_str / site / location
+        dump_paths = sorted(dump_root.glob("*.json"))[:limit]
+        if not dump_paths:
+            logger.warn(f"  × No dumps in: {logstr.file(brk(dump_root))}")
+            return 0
+        site_root = self.get_site_root(site)
+        site_root.mkdir(parents=True, exist_ok=True)
+        for dump_path in dump_paths:
+            with open(dump_path, "r", encoding="utf-8") as rf:
+                product_info = json.load(rf)
+            if not product_info:
+                continue
+            product_info.pop("cookies", None)
+            with open(site_root / dump_path.name, "w", encoding="utf-8") as wf:
+                json.dump(product_info, wf, ensure_ascii=False)
+        logger.okay(
+            f"  ✓ Recorded {logstr.mesg(len(dump_paths))} fixtures: "
+            f"{logstr.file(brk(site_root))}"
+        )
+        return len(dump_paths)
+
+    def get_blinkit_layout(self, product_info: dict) -> dict:
+        return {k: v for k, v in product_info.items() if k not in SCRAPER_KEYS}
+
+    def get_swiggy_state(self, product_info: dict) -> dict:
+        return {k: v for k, v in product_info.items() if k not in SCRAPER_KEYS}
+
+    def get_dmart_next_data(self, product_info: dict) -> dict:
+        return {"props": {"pageProps": product_info.get("resp", {})}}
+
+    def get_zepto_flight_data(self, product_info: dict) -> dict:
+        """Data, which is `resp` again after `ZeptoResponseParser.clean_resp`."""
+        return {"children": [{}, product_info.get("resp", {})]}
+
+    def get_zepto_flight_push(self, product_info: dict) -> str:
+        data_str = json.dumps(self.get_zepto_flight_data(product_info))
+        # escaped as js string, reverted by `deserialize_str_to_json`
+        return f'self.__next_f.push([1,"5:{json.dumps(data_str)[1:-1]}"])'
+
+    def render_page(self, site: WEBSITE_LITERAL, product_id: str) -> str:
+        product_info = self.load(site, product_id) or {}
+        head = f"<head><title>{site} bench {product_id}</title></head>"
+        if site == "blinkit":
+            script = f"""
+            fetch("/api/feature-flags/receive", {{method: "POST", body: "{{}}"}});
+            fetch("/v1/layout/product/{product_id}", {{method: "POST", body: "{{}}"}});
+            """
+        elif site == "zepto":
+            local_storage = to_script_json(product_info.get("local_storage", {}))
+            script = f"""
+            self.__next_f = self.__next_f || [];
+            localStorage.setItem("user-position", JSON.stringify({local_storage}));
+            {self.get_zepto_flight_push(product_info)}
+            """
+        elif site == "swiggy":
+            state_str = to_script_json(self.get_swiggy_state(product_info))
+            script = f"window.___INITIAL_STATE___ = {state_str};"
+        else:
+            next_data_str = to_script_json(self.get_dmart_next_data(product_info))
+            return (
+                f"<html>{head}<body>"
+                f'<script id="__NEXT_DATA__" type="application/json">'
+                f"{next_data_str}</script></body></html>"
+            )
+        return f"<html>{head}<body><script>{script}</script></body></html>"
+
+
+def make_sku_df(rows: int = 1000, seed: int = 0) -> pd.DataFrame:
+    """Synthetic merged sku sheet, with link, instock, price and mrp columns."""
+    rand = random.Random(seed)
+    data = {"#": list(range(rows)), "Date": "2000/01/01", "Location": "bench"}
+    for check_cols in WEBSITE_CHECK_COLUMNS_MAP.values():
+        data[check_cols["link"]] = [f"https://bench/{i}" for i in range(rows)]
+        for check_col in check_cols["checks"]:
+            data[check_col] = [rand.choice([1, 0, "N/A", None]) for _ in range(rows)]
+    for col_map in DISCOUNT_COLUMNS_MAP.values():
+        mrps = [rand.choice([0, 50, 99, 120, 450]) for _ in range(rows)]
+        data.setdefault(col_map["mrp"], mrps)
+        data[col_map["price"]] = [
+            round(mrp * rand.uniform(0.6, 1), 1) for mrp in data[col_map["mrp"]]
+        ]
+    return pd.DataFrame(data)
+
+
+class FixturesArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-r", "--record", action="store_true")
+        self.add_argument("-d", "--date", type=str, default=None)
+        self.add_argument("-l", "--location", type=str, required=True)
+        self.add_argument("-s", "--sites", nargs="+", default=WEBSITE_NAMES)
+        self.add_argument("-n", "--limit", type=int, default=20)
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+if __name__ == "__main__":
+    args = FixturesArgParser().parse_args()
+    fixtures = BenchFixtures()
+    date_str = args.date or get_now_str()[:10]
+    if args.record:
+        for site in args.sites:
+            fixtures.record(site, date_str, args.location, limit=args.limit)
+
+    # Case 1: record fixtures from dumps of a date and location
+    # python -m bench.fixtures -r -d 2025-07-01 -l <location> -n 20
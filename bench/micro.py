@@ -0,0 +1,158 @@
+import argparse
+import sys
+import tempfile
+
+from pathlib import Path
+from tclogger import logger, logstr, brk, get_now_str
+from time import perf_counter
+from typing import Callable
+
+from configs.envs import WEBSITE_NAMES
+from file.excel_merger import ExcelMerger, ExcelChecker, DataframeEditor
+from web.blinkit.scraper import BlinkitProductDataExtractor
+from web.zepto.scraper import ZeptoResponseParser, ZeptoProductDataExtractor
+from web.swiggy.scraper import SwiggyProductDataExtractor
+from web.dmart.scraper import DmartResponseParser, DmartProductDataExtractor
+from bench.fixtures import BenchFixtures, make_sku_df
+from bench.e2e import save_results
+
+EXTRACTOR_CLASSES = {
+    "blinkit": BlinkitProductDataExtractor,
+    "zepto": ZeptoProductDataExtractor,
+    "swiggy": SwiggyProductDataExtractor,
+    "dmart": DmartProductDataExtractor,
+}
+
+
+class MicroBench:
+    """Repeat hot functions of parsing, extraction and excel stages on fixtures,
+    and report best and mean ms per call, in the style of `timeit`."""
+
+    def __init__(
+        self,
+        fixtures: BenchFixtures = None,
+        repeat: int = 5,
+        rows: int = 1000,
+    ):
+        self.fixtures = fixtures or BenchFixtures()
+        self.repeat = repeat
+        self.rows = rows
+        self.results = []
+
+    def timeit(
+        self, name: str, func: Callable, number: int = 1, setup: Callable = None
+    ):
+        """`setup` runs before each repeat and is not timed, its result is passed
+        to `func`."""
+        seconds = []
+        for _ in range(self.repeat):
+            arg = setup() if setup else None
+            start = perf_counter()
+            for _ in range(number):
+                func(arg) if setup else func()
+            seconds.append((perf_counter() - start) / number)
+        result = {
+            "name": name,
+            "number": number,
+            "repeat": self.repeat,
+            "best_ms": round(min(seconds) * 1000, 3),
+            "mean_ms": round(sum(seconds) / len(seconds) * 1000, 3),
+        }
+        self.results.append(result)
+        logger.mesg(
+            f"  * {name:<32} best={logstr.okay(result['best_ms'])}ms "
+            f"mean={result['mean_ms']}ms ({number}x{self.repeat})"
+        )
+        return result
+
+    def bench_parsers(self):
+        zepto_ids = self.fixtures.get_ids("zepto")
+        zepto_parser = ZeptoResponseParser()
+        for pid in zepto_ids[:1]:
+            html = self.fixtures.render_page("zepto", pid)
+            self.timeit(
+                "zepto.clean_resp",
+                lambda: zepto_parser.clean_resp(zepto_parser.extract_resp(html)),
+                number=10,
+            )
+        dmart_ids = self.fixtures.get_ids("dmart")
+        dmart_parser = DmartResponseParser()
+        for pid in dmart_ids[:1]:
+            html = self.fixtures.render_page("dmart", pid)
+            self.timeit(
+                "dmart.extract_resp",
+                lambda: dmart_parser.clean_resp(dmart_parser.extract_resp(html)),
+                number=10,
+            )
+
+    def bench_extractors(self):
+        for site in WEBSITE_NAMES:
+            product_infos = [
+                self.fixtures.load(site, pid) for pid in self.fixtures.get_ids(site)
+            ]
+            if not product_infos:
+                logger.warn(f"  × No fixtures of site: {logstr.mesg(brk(site))}")
+                continue
+            extractor = EXTRACTOR_CLASSES[site]()
+
+            def extract_all():
+                for product_info in product_infos:
+                    extractor.extract(product_info)
+
+            self.timeit(f"{site}.extract x{len(product_infos)}", extract_all)
+
+    def bench_excel(self, tmp_root: Path):
+        editor = DataframeEditor()
+        sku_df = make_sku_df(rows=self.rows)
+        self.timeit(
+            f"insert_discount_columns x{self.rows}",
+            editor.insert_discount_columns,
+            setup=sku_df.copy,
+        )
+        merged_df = editor.insert_discount_columns(sku_df.copy())
+        xlsx_path = tmp_root / "sku_bench.xlsx"
+
+        def write_workbook(merger: ExcelMerger):
+            merger.write_df_to_sheet(merged_df, "bench")
+            merger.workbook.save(xlsx_path)
+
+        self.timeit(
+            f"write_workbook x{self.rows}",
+            write_workbook,
+            setup=lambda: ExcelMerger(date_str="2000-01-01"),
+        )
+        checker = ExcelChecker(date_str="2000-01-01")
+        checker.xlsx_path = xlsx_path
+        checker.log_path = tmp_root / "sku_bench.log"
+        self.timeit(f"excel_check x{self.rows}", checker.check)
+
+    def run(self) -> dict:
+        logger.note(f"> Micro bench: repeat={self.repeat}")
+        self.bench_parsers()
+        self.bench_extractors()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self.bench_excel(Path(tmp_dir))
+        return {"run_at": get_now_str(), "results": self.results}
+
+
+class MicroArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-r", "--repeat", type=int, default=5)
+        self.add_argument("-n", "--rows", type=int, default=1000)
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+if __name__ == "__main__":
+    args = MicroArgParser().parse_args()
+    bench = MicroBench(repeat=args.repeat, rows=args.rows)
+    save_results(bench.run(), name="micro")
+
+    # Case 1: micro bench with 1000 rows of sku sheet
+    # python -m bench.micro
+
+    # Case 2: quick run
+    # python -m bench.micro -r 2 -n 200
@@ -0,0 +1,255 @@
+import argparse
+import json
+import random
+import re
+import ssl
+import subprocess
+import sys
+import threading
+
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from tclogger import logger, logstr, brk
+from time import sleep
+from urllib.parse import unquote, urlparse
+
+from configs.envs import DATA_ROOT
+from bench.fixtures import BenchFixtures
+
+CERT_ROOT = DATA_ROOT / "bench" / "cert"
+# hosts of sites, which are mapped to local server in browser
+SITE_HOSTS = {
+    "blinkit": "blinkit.com",
+    "zepto": "www.zeptonow.com",
+    "swiggy": "www.swiggy.com",
+    "dmart": "www.dmart.in",
+}
+# routes of product pages and apis, which scrapers visit or listen
+PAGE_ROUTES = {
+    "blinkit": r"^/prn/x/prid/(?P<pid>.+)$",
+    "zepto": r"^/pn/x/pvid/(?P<pid>.+)$",
+    "swiggy": r"^/stores/instamart/item/(?P<pid>.+)$",
+    "dmart": r"^/product/(?P<pid>.+)$",
+}
+BLINKIT_LAYOUT_ROUTE = r"^/v1/layout/product/(?P<pid>.+)$"
+BLINKIT_FLAG_ROUTE = r"^/api/feature-flags/receive$"
+
+
+@dataclass
+class LatencyProfile:
+    """Latency (ms) and errors injected into each response."""
+
+    latency_ms: float = 0
+    jitter_ms: float = 0
+    error_rate: float = 0
+    error_status: int = 429
+
+    def get_delay(self) -> float:
+        jitter = random.uniform(-self.jitter_ms, self.jitter_ms)
+        return max(self.latency_ms + jitter, 0) / 1000
+
+    def should_fail(self) -> bool:
+        return random.random() < self.error_rate
+
+
+LATENCY_PROFILES = {
+    "none": LatencyProfile(),
+    "fast": LatencyProfile(latency_ms=50, jitter_ms=20),
+    "typical": LatencyProfile(latency_ms=300, jitter_ms=150, error_rate=0.02),
+    "slow": LatencyProfile(latency_ms=1500, jitter_ms=500, error_rate=0.05),
+    "flaky": LatencyProfile(latency_ms=300, jitter_ms=200, error_rate=0.2),
+}
+
+
+def ensure_cert(cert_root: Path = CERT_ROOT) -> tuple[Path, Path]:
+    """Self-signed cert for local https, browser ignores cert errors in bench."""
+    cert_path = cert_root / "cert.pem"
+    key_path = cert_root / "key.pem"
+    if cert_path.exists() and key_path.exists():
+        return cert_path, key_path
+    cert_root.mkdir(parents=True, exist_ok=True)
+    cmd = [
+        *["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes"],
+        *["-keyout", str(key_path), "-out", str(cert_path)],
+        *["-days", "365", "-subj", "/CN=sku-tracker-bench"],
+    ]
+    subprocess.run(cmd, check=True, capture_output=True)
+    return cert_path, key_path
+
+
+class BenchRequestHandler(BaseHTTPRequestHandler):
+    server: "BenchServer"
+
+    def log_message(self, format: str, *args):
+        pass
+
+    def get_site(self) -> str:
+        host = (self.headers.get("Host") or "").split(":")[0]
+        for site, site_host in SITE_HOSTS.items():
+            if host == site_host:
+                return site
+        return None
+
+    def send_body(self, status: int, body: str, content_type: str):
+        body_bytes = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        self.send_header("Content-Length", str(len(body_bytes)))
+        self.end_headers()
+        self.wfile.write(body_bytes)
+
+    def route(self) -> tuple[int, str, str]:
+        site = self.get_site()
+        path = unquote(urlparse(self.path).path)
+        fixtures = self.server.fixtures
+        if site == "blinkit" and re.match(BLINKIT_FLAG_ROUTE, path):
+            return 200, "{}", "application/json"
+        match = re.match(BLINKIT_LAYOUT_ROUTE, path)
+        if site == "blinkit" and match:
+            product_info = fixtures.load(site, match.group("pid"))
+            if product_info is None:
+                return 404, "{}", "application/json"
+            layout = fixtures.get_blinkit_layout(product_info)
+            return 200, json.dumps(layout, ensure_ascii=False), "application/json"
+        if site in PAGE_ROUTES:
+            match = re.match(PAGE_ROUTES[site], path)
+            if match:
+                # dmart product id is path with query
+                pid = match.group("pid")
+                query = urlparse(self.path).query
+                if site == "dmart" and query:
+                    pid = f"{pid}?{unquote(query)}"
+                if fixtures.load(site, pid) is None:
+                    return 404, "<html><title>Not Found</title></html>", "text/html"
+                return 200, fixtures.render_page(site, pid), "text/html"
+        return 404, "", "text/plain"
+
+    def handle_request(self):
+        profile = self.server.profile
+        sleep(profile.get_delay())
+        self.server.count_request()
+        if profile.should_fail():
+            self.server.count_error()
+            self.send_body(profile.error_status, "", "text/plain")
+            return
+        status, body, content_type = self.route()
+        self.send_body(status, body, content_type)
+
+    def do_GET(self):
+        self.handle_request()
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            self.rfile.read(length)
+        self.handle_request()
+
+
+class BenchServer(ThreadingHTTPServer):
+    """Local https stand-in of sites, which replays fixtures with injected
+    latency and errors. Browser is pointed to it by `get_browser_arguments`."""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        port: int = 8443,
+        profile: LatencyProfile = None,
+        fixtures: BenchFixtures = None,
+    ):
+        super().__init__(("127.0.0.1", port), BenchRequestHandler)
+        self.port = port
+        self.profile = profile or LatencyProfile()
+        self.fixtures = fixtures or BenchFixtures()
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.error_count = 0
+        cert_path, key_path = ensure_cert()
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(cert_path, key_path)
+        self.socket = context.wrap_socket(self.socket, server_side=True)
+        self.thread = None
+
+    def count_request(self):
+        with self.lock:
+            self.request_count += 1
+
+    def count_error(self):
+        with self.lock:
+            self.error_count += 1
+
+    def get_browser_arguments(self) -> list[str]:
+        rules = ",".join(
+            f"MAP {host} 127.0.0.1:{self.port}" for host in SITE_HOSTS.values()
+        )
+        return [
+            f"--host-resolver-rules={rules}",
+            "--ignore-certificate-errors",
+        ]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        logger.okay(f"  ✓ Bench server: {logstr.file(brk(f'127.0.0.1:{self.port}'))}")
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        logger.mesg(
+            f"  * Bench server: requests={self.request_count}, "
+            f"errors={self.error_count}"
+        )
+
+
+class BenchServerArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-p", "--port", type=int, default=8443)
+        self.add_argument(
+            "-f",
+            "--profile",
+            type=str,
+            default="none",
+            choices=list(LATENCY_PROFILES.keys()),
+        )
+        self.add_argument("--latency-ms", type=float, default=None)
+        self.add_argument("--jitter-ms", type=float, default=None)
+        self.add_argument("--error-rate", type=float, default=None)
+        self.add_argument("--error-status", type=int, default=None)
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+def get_profile(args: argparse.Namespace) -> LatencyProfile:
+    """Named profile, with fields overridden by args if given."""
+    profile = LATENCY_PROFILES[args.profile]
+    overrides = {
+        "latency_ms": args.latency_ms,
+        "jitter_ms": args.jitter_ms,
+        "error_rate": args.error_rate,
+        "error_status": args.error_status,
+    }
+    overrides = {k: v for k, v in overrides.items() if v is not None}
+    return LatencyProfile(**{**profile.__dict__, **overrides})
+
+
+if __name__ == "__main__":
+    args = BenchServerArgParser().parse_args()
+    server = BenchServer(port=args.port, profile=get_profile(args))
+    logger.note(f"> Browser arguments:")
+    for argument in server.get_browser_arguments():
+        logger.file(f"  * {argument}")
+    try:
+        server.start()
+        server.thread.join()
+    except KeyboardInterrupt:
+        server.stop()
+
+    # Case 1: serve fixtures without latency
+    # python -m bench.server
+
+    # Case 2: serve fixtures with flaky profile and 503 errors
+    # python -m bench.server -f flaky --error-status 503
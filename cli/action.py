@@ -4,7 +4,7 @@ import sys
 from acto import Perioder
 from tclogger import shell_cmd, str_to_t
 
-from configs.envs import LOGS_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL
+from configs.envs import LOGS_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL, HEADLESS_SITES
 
 
 class ScrapeBatcherAction:
@@ -12,7 +12,11 @@ class ScrapeBatcherAction:
         self.pattern = "****-**-** 13:00:00"
         log_name = f"action_scrape_batcher_{website}.log"
         self.perioder = Perioder(self.pattern, log_path=LOGS_ROOT / log_name)
-        self.env = "DISPLAY=:99 DBUS_SESSION_BUS_ADDRESS=none"
+        # headless sites need no Xvfb display
+        if website in HEADLESS_SITES:
+            self.env = "DBUS_SESSION_BUS_ADDRESS=none"
+        else:
+            self.env = "DISPLAY=:99 DBUS_SESSION_BUS_ADDRESS=none"
         self.cmd_scrape = f"{self.env} python -m web.{website}.batcher -s"
 
     def desc_func(self, run_dt_str: str):
@@ -35,15 +39,10 @@ class ExtractBatcherAction:
         self.perioder = Perioder(
             self.pattern, log_path=LOGS_ROOT / f"action_extract_batcher.log"
         )
-        # swiggy must run last, as it uses data of blinkit and zepto
-        websites = ["blinkit", "zepto", "swiggy", "dmart"]
-        self.cmds_extract = [
-            f"python -m web.{website}.batcher -e" for website in websites
-        ]
-        self.cmds_file = [
-            "python -m file.excel_merger -m -k",
-            "python -m file.email",
-        ]
+        # extract, merge and email run as stages of cli.pipeline,
+        # where extracts of websites run concurrently,
+        # and merge still runs if extract of some website failed
+        self.cmds_extract = ["python -m cli.pipeline -e -x"]
         self.cmds_weekly = [
             "python -m file.excel_merger -p",
             "python -m file.email -t weekly",
@@ -57,7 +56,7 @@ class ExtractBatcherAction:
 
     def desc_func(self, run_dt_str: str):
         self.run_dt_str = run_dt_str
-        self.func_strs = [*self.cmds_extract, *self.cmds_file]
+        self.func_strs = [*self.cmds_extract]
         self.add_cmds_weekly()
         self.desc_str = "\n".join(self.func_strs)
         return self.func_strs, self.desc_str
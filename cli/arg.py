@@ -3,6 +3,16 @@ import sys
 
 from tclogger import logger
 
+PROFILE_MODES = ["cprofile", "pyinstrument", "tracemalloc"]
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    """`--profile` with `--profile-stage` scoped to a stage of instrument spans,
+    such as `extract` or `dump_excel`. See `web.profiler.Profiler`."""
+    parser.add_argument("--profile", type=str, default=None, choices=PROFILE_MODES)
+    parser.add_argument("--profile-stage", type=str, default=None)
+    parser.add_argument("--profile-top", type=int, default=20)
+
 
 class BatcherArgParser(argparse.ArgumentParser):
     def __init__(self, *args, **kwargs):
@@ -12,6 +22,8 @@ class BatcherArgParser(argparse.ArgumentParser):
         self.add_argument("-c", "--close-browser-after-done", action="store_true")
         self.add_argument("-f", "--force-scrape", action="store_true")
         self.add_argument("-d", "--date", type=str, default=None)
+        self.add_argument("-D", "--daemon", action="store_true")
+        add_profile_arguments(self)
 
     def parse_args(self):
         self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
@@ -35,9 +47,12 @@ class TraverserArgParser(argparse.ArgumentParser):
         self.add_argument("-s", "--traverse", action="store_true")
         self.add_argument("-e", "--summarize", action="store_true")
         self.add_argument("-d", "--date", type=str, default=None)
+        add_profile_arguments(self)
 
     def parse_args(self):
         self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        if self.unknown_args:
+            logger.warn(f"× Unknown arguments of traverser: {self.unknown_args}")
         self.check_args()
         return self.args
 
@@ -50,3 +65,29 @@ class TraverserArgParser(argparse.ArgumentParser):
             else:
                 return False
         return True
+
+
+class BlinkitTraverserArgParser(TraverserArgParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument(
+            "-m",
+            "--paginate-mode",
+            type=str,
+            default="scroll",
+            choices=["scroll", "fetch"],
+        )
+        self.add_argument("-j", "--max-tabs", type=int, default=3)
+
+
+class SwiggyTraverserArgParser(TraverserArgParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument(
+            "-F",
+            "--fetch-mode",
+            type=str,
+            default="listen",
+            choices=["listen", "direct", "batch"],
+        )
+        self.add_argument("-n", "--no-carry-over", action="store_true")
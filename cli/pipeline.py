@@ -0,0 +1,312 @@
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import threading
+
+from dataclasses import dataclass, field
+from tclogger import logger, logstr, brk, Runtimer
+from typing import Literal
+
+from configs.envs import WEBSITE_NAMES
+
+STAGE_STATUS = Literal["pending", "running", "done", "failed", "skipped"]
+
+# swiggy and dmart extract read dumps (not extract outputs) of blinkit and zepto
+# as mrp reference, so they wait for scrape of them only
+EXTRACT_REF_WEBSITES = ["blinkit", "zepto"]
+
+
+@dataclass
+class PipelineStage:
+    name: str
+    cmd: str
+    deps: list[str] = field(default_factory=list)
+    env: dict = field(default_factory=dict)
+    # run once deps are finished, even if some failed or were skipped
+    run_on_failure: bool = False
+    status: STAGE_STATUS = "pending"
+    returncode: int = None
+
+    def is_finished(self) -> bool:
+        return self.status in ["done", "failed", "skipped"]
+
+    def label_str(self) -> str:
+        return logstr.mesg(brk(self.name))
+
+
+class PipelineStagesBuilder:
+    def __init__(self, date_str: str = None, websites: list[str] = None):
+        self.date_str = date_str
+        self.websites = websites or WEBSITE_NAMES
+        self.date_arg = f" -d {date_str}" if date_str else ""
+
+    def scrape_stages(self) -> list[PipelineStage]:
+        # each website uses its own browser profile (uid/port in browser_settings),
+        # so scrapers of different websites could run concurrently
+        return [
+            PipelineStage(
+                name=f"{website}.scrape",
+                cmd=f"python -m web.{website}.batcher -s{self.date_arg}",
+            )
+            for website in self.websites
+        ]
+
+    def extract_stages(self, with_scrape: bool = False) -> list[PipelineStage]:
+        stages = []
+        for website in self.websites:
+            deps = []
+            if with_scrape:
+                deps.append(f"{website}.scrape")
+                if website not in EXTRACT_REF_WEBSITES:
+                    deps.extend(
+                        f"{ref_website}.scrape"
+                        for ref_website in EXTRACT_REF_WEBSITES
+                        if ref_website in self.websites
+                    )
+            stages.append(
+                PipelineStage(
+                    name=f"{website}.extract",
+                    cmd=f"python -m web.{website}.batcher -e{self.date_arg}",
+                    deps=deps,
+                )
+            )
+        return stages
+
+    def postprocess_stages(self, with_extract: bool = False) -> list[PipelineStage]:
+        merge_deps = []
+        if with_extract:
+            merge_deps = [f"{website}.extract" for website in self.websites]
+        return [
+            PipelineStage(
+                name="excel.merge",
+                cmd=f"python -m file.excel_merger -m -k{self.date_arg}",
+                deps=merge_deps,
+                run_on_failure=True,
+            ),
+            PipelineStage(
+                name="email.daily",
+                cmd=f"python -m file.email{self.date_arg}",
+                deps=["excel.merge"],
+            ),
+        ]
+
+    def weekly_stages(self, with_postprocess: bool = False) -> list[PipelineStage]:
+        package_deps = ["email.daily"] if with_postprocess else []
+        return [
+            PipelineStage(
+                name="excel.package",
+                cmd="python -m file.excel_merger -p",
+                deps=package_deps,
+            ),
+            PipelineStage(
+                name="email.weekly",
+                cmd="python -m file.email -c -t weekly",
+                deps=["excel.package"],
+            ),
+        ]
+
+    def build(
+        self,
+        scrape: bool = False,
+        extract: bool = False,
+        postprocess: bool = False,
+        weekly: bool = False,
+    ) -> list[PipelineStage]:
+        stages = []
+        if scrape:
+            stages.extend(self.scrape_stages())
+        if extract:
+            stages.extend(self.extract_stages(with_scrape=scrape))
+        if postprocess:
+            stages.extend(self.postprocess_stages(with_extract=extract))
+        if weekly:
+            stages.extend(self.weekly_stages(with_postprocess=postprocess))
+        return stages
+
+
+class PipelineRunner:
+    """Run stages as a DAG: a stage starts once all its deps are done,
+    and independent stages run concurrently in separate processes.
+    Stages with `run_on_failure` start once deps are finished in any status,
+    so daily report is still merged if some website failed."""
+
+    def __init__(self, stages: list[PipelineStage], max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.max_workers = max(max_workers, 1)
+        self.cond = threading.Condition()
+        self.print_lock = threading.Lock()
+        self.check_deps()
+
+    def check_deps(self):
+        for stage in self.stages.values():
+            for dep in stage.deps:
+                if dep not in self.stages:
+                    raise ValueError(f"Unknown dep {brk(dep)} of stage {stage.name}")
+        # detect cycles by resolving stages in topological order
+        resolved = set()
+        while len(resolved) < len(self.stages):
+            ready = [
+                name
+                for name, stage in self.stages.items()
+                if name not in resolved and all(dep in resolved for dep in stage.deps)
+            ]
+            if not ready:
+                raise ValueError("Cyclic deps in pipeline stages")
+            resolved.update(ready)
+
+    def log_stages(self):
+        logger.note(f"> Pipeline stages:")
+        for stage in self.stages.values():
+            deps_str = logstr.file(stage.deps) if stage.deps else ""
+            logger.mesg(f"  * {stage.label_str()} {stage.cmd} {deps_str}")
+
+    def stream_output(self, stage: PipelineStage, process: subprocess.Popen):
+        prefix = logstr.mesg(f"[{stage.name}]")
+        for line in process.stdout:
+            with self.print_lock:
+                print(f"{prefix} {line.rstrip()}", flush=True)
+
+    def run_stage(self, stage: PipelineStage):
+        env = {**os.environ, **stage.env, "PYTHONUNBUFFERED": "1"}
+        try:
+            process = subprocess.Popen(
+                shlex.split(stage.cmd),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT,
+                env=env,
+                text=True,
+                bufsize=1,
+            )
+            self.stream_output(stage, process)
+            returncode = process.wait()
+        except Exception as e:
+            with self.print_lock:
+                logger.warn(f"× {stage.name}: {e}")
+            returncode = -1
+        with self.cond:
+            stage.returncode = returncode
+            stage.status = "done" if returncode == 0 else "failed"
+            with self.print_lock:
+                if stage.status == "done":
+                    logger.okay(f"✓ Stage done: {stage.label_str()}")
+                else:
+                    logger.warn(
+                        f"× Stage failed: {stage.label_str()} (exit={returncode})"
+                    )
+            self.cond.notify_all()
+
+    def update_skipped(self):
+        """Skip stages whose deps failed or were skipped, recursively,
+        except stages with `run_on_failure`."""
+        is_changed = True
+        while is_changed:
+            is_changed = False
+            for stage in self.stages.values():
+                if stage.status != "pending" or stage.run_on_failure:
+                    continue
+                dep_stages = [self.stages[dep] for dep in stage.deps]
+                if any(dep.status in ["failed", "skipped"] for dep in dep_stages):
+                    stage.status = "skipped"
+                    logger.warn(f"× Stage skipped: {stage.label_str()}")
+                    is_changed = True
+
+    def is_ready(self, stage: PipelineStage) -> bool:
+        if stage.status != "pending":
+            return False
+        dep_stages = [self.stages[dep] for dep in stage.deps]
+        if stage.run_on_failure:
+            return all(dep.is_finished() for dep in dep_stages)
+        return all(dep.status == "done" for dep in dep_stages)
+
+    def get_ready_stages(self) -> list[PipelineStage]:
+        return [stage for stage in self.stages.values() if self.is_ready(stage)]
+
+    def count_running(self) -> int:
+        return sum(stage.status == "running" for stage in self.stages.values())
+
+    def run(self) -> bool:
+        self.log_stages()
+        threads: list[threading.Thread] = []
+        with self.cond:
+            while not all(stage.is_finished() for stage in self.stages.values()):
+                self.update_skipped()
+                for stage in self.get_ready_stages():
+                    if self.count_running() >= self.max_workers:
+                        break
+                    stage.status = "running"
+                    with self.print_lock:
+                        logger.hint(f"> Stage start: {stage.label_str()}")
+                    thread = threading.Thread(
+                        target=self.run_stage, args=(stage,), daemon=True
+                    )
+                    thread.start()
+                    threads.append(thread)
+                if all(stage.is_finished() for stage in self.stages.values()):
+                    break
+                self.cond.wait()
+        for thread in threads:
+            thread.join()
+        self.log_summary()
+        return all(stage.status == "done" for stage in self.stages.values())
+
+    def log_summary(self):
+        logger.note(f"> Pipeline summary:")
+        for stage in self.stages.values():
+            status_str = f"{stage.status} (exit={stage.returncode})"
+            if stage.status == "done":
+                logger.okay(f"  ✓ {stage.label_str()}: {status_str}")
+            else:
+                logger.warn(f"  × {stage.label_str()}: {status_str}")
+
+
+class PipelineArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-s", "--scrape", action="store_true")
+        self.add_argument("-e", "--extract", action="store_true")
+        self.add_argument("-x", "--postprocess", action="store_true")
+        self.add_argument("-w", "--weekly", action="store_true")
+        self.add_argument("-d", "--date", type=str, default=None)
+        self.add_argument("-j", "--max-workers", type=int, default=4)
+        self.add_argument(
+            "-t", "--websites", type=str, nargs="+", choices=WEBSITE_NAMES
+        )
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+def main(args: argparse.Namespace) -> int:
+    builder = PipelineStagesBuilder(date_str=args.date, websites=args.websites)
+    stages = builder.build(
+        scrape=args.scrape,
+        extract=args.extract,
+        postprocess=args.postprocess,
+        weekly=args.weekly,
+    )
+    if not stages:
+        logger.warn("× No stages: use `-s`, `-e`, `-x` or `-w`")
+        return 0
+    runner = PipelineRunner(stages, max_workers=args.max_workers)
+    is_all_done = runner.run()
+    return 0 if is_all_done else 1
+
+
+if __name__ == "__main__":
+    arg_parser = PipelineArgParser()
+    args = arg_parser.parse_args()
+    with Runtimer():
+        exit_code = main(args)
+    sys.exit(exit_code)
+
+    # Case 1: scrape all websites concurrently
+    # python -m cli.pipeline -s
+
+    # Case 2: extract, merge and email
+    # python -m cli.pipeline -e -x
+
+    # Case 3: scrape and extract for date, only some websites
+    # python -m cli.pipeline -s -e -d 2025-08-21 -t blinkit zepto
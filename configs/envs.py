@@ -1,5 +1,5 @@
+from functools import cache
 from pathlib import Path
-from tclogger import OSEnver
 from typing import Literal
 
 REPO_ROOT = Path(__file__).parents[1]
@@ -10,27 +10,85 @@ DATA_ROOT = REPO_ROOT / "data"
 
 CHROME_USER_DATA_DIR = DATA_ROOT / "chrome"
 
-SECRETS_PATH = CONFIGS_ROOT / "secrets.json"
-SECRETS = OSEnver(SECRETS_PATH)
-BLINKIT_LOCATIONS = SECRETS["blinkit_locations"]
-SWIGGY_LOCATIONS = SECRETS["swiggy_locations"]
-ZEPTO_LOCATIONS = SECRETS["zepto_locations"]
-DMART_LOCATIONS = SECRETS["dmart_locations"]
-LOCATION_LIST = SECRETS["location_list"]
-LOCATION_MAP = SECRETS["location_map"]
-SKIP_WEBSITE_CHECKS_MAP = SECRETS["skip_website_checks_map"]
-BROWSER_SETTINGS = SECRETS["browser_settings"]
-BLINKIT_BROWSER_SETTING = BROWSER_SETTINGS["blinkit"]
-SWIGGY_BROWSER_SETTING = BROWSER_SETTINGS["swiggy"]
-ZEPTO_BROWSER_SETTING = BROWSER_SETTINGS["zepto"]
-DMART_BROWSER_SETTING = BROWSER_SETTINGS["dmart"]
-TRAVERSER_SETTINGS = SECRETS["traverser_settings"]
-BLINKIT_TRAVERSER_SETTING = TRAVERSER_SETTINGS["blinkit"]
-SWIGGY_TRAVERSER_SETTING = TRAVERSER_SETTINGS["swiggy"]
-EMAIL_SENDER = SECRETS["email_sender"]
-EMAIL_RECVER = SECRETS["email_recver"]
-SKU_XLSX = DATA_ROOT / SECRETS["sku_xlsx"]
-HTTP_PROXY = SECRETS["http_proxy"]
-
 WEBSITE_NAMES = ["blinkit", "zepto", "swiggy", "dmart"]
 WEBSITE_LITERAL = Literal["blinkit", "zepto", "swiggy", "dmart"]
+
+SECRETS_PATH = CONFIGS_ROOT / "secrets.json"
+
+
+@cache
+def load_secrets_envs() -> dict:
+    """Constants from `secrets.json`, which is parsed on first access of any of
+    them, such as `from configs.envs import BLINKIT_LOCATIONS`, so modules which
+    only need paths above never read it."""
+    from tclogger import OSEnver
+
+    SECRETS = OSEnver(SECRETS_PATH)
+    # capabilities of sites, overridden by `site_capabilities` in secrets:
+    #   * headless: "new" if location switching of site works in headless chromium,
+    #     then its browser runs without Xvfb or virtual display; false otherwise
+    SITE_CAPABILITIES = {
+        site: {"headless": False, **(SECRETS["site_capabilities"] or {}).get(site, {})}
+        for site in WEBSITE_NAMES
+    }
+    BROWSER_SETTINGS = SECRETS["browser_settings"]
+    TRAVERSER_SETTINGS = SECRETS["traverser_settings"]
+    return {
+        "SECRETS": SECRETS,
+        "BLINKIT_LOCATIONS": SECRETS["blinkit_locations"],
+        "SWIGGY_LOCATIONS": SECRETS["swiggy_locations"],
+        "ZEPTO_LOCATIONS": SECRETS["zepto_locations"],
+        "DMART_LOCATIONS": SECRETS["dmart_locations"],
+        "LOCATION_LIST": SECRETS["location_list"],
+        "LOCATION_MAP": SECRETS["location_map"],
+        "SKIP_WEBSITE_CHECKS_MAP": SECRETS["skip_website_checks_map"],
+        "SITE_CAPABILITIES": SITE_CAPABILITIES,
+        "HEADLESS_SITES": [
+            site for site in WEBSITE_NAMES if SITE_CAPABILITIES[site]["headless"]
+        ],
+        "BROWSER_SETTINGS": BROWSER_SETTINGS,
+        "BLINKIT_BROWSER_SETTING": {
+            "headless": SITE_CAPABILITIES["blinkit"]["headless"],
+            **BROWSER_SETTINGS["blinkit"],
+        },
+        "SWIGGY_BROWSER_SETTING": {
+            "headless": SITE_CAPABILITIES["swiggy"]["headless"],
+            **BROWSER_SETTINGS["swiggy"],
+        },
+        "ZEPTO_BROWSER_SETTING": {
+            "headless": SITE_CAPABILITIES["zepto"]["headless"],
+            **BROWSER_SETTINGS["zepto"],
+        },
+        "DMART_BROWSER_SETTING": {
+            "headless": SITE_CAPABILITIES["dmart"]["headless"],
+            **BROWSER_SETTINGS["dmart"],
+        },
+        "TRAVERSER_SETTINGS": TRAVERSER_SETTINGS,
+        "BLINKIT_TRAVERSER_SETTING": {
+            "headless": SITE_CAPABILITIES["blinkit"]["headless"],
+            **TRAVERSER_SETTINGS["blinkit"],
+        },
+        "SWIGGY_TRAVERSER_SETTING": {
+            "headless": SITE_CAPABILITIES["swiggy"]["headless"],
+            **TRAVERSER_SETTINGS["swiggy"],
+        },
+        "PACER_SETTINGS": SECRETS["pacer_settings"] or {},
+        "METRICS_SETTINGS": SECRETS["metrics_settings"] or {},
+        "BROWSER_RECYCLE_SETTINGS": SECRETS["browser_recycle_settings"] or {},
+        "PROXY_SETTINGS": SECRETS["proxy_settings"] or {},
+        "EMAIL_SENDER": SECRETS["email_sender"],
+        "EMAIL_RECVER": SECRETS["email_recver"],
+        "SKU_XLSX": DATA_ROOT / SECRETS["sku_xlsx"],
+        "HTTP_PROXY": SECRETS["http_proxy"],
+    }
+
+
+def __getattr__(name: str):
+    if name.startswith("__"):
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    envs = load_secrets_envs()
+    if name not in envs:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    # cache in module globals, so later access skips `__getattr__`
+    globals()[name] = envs[name]
+    return envs[name]
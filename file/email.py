@@ -8,7 +8,8 @@ from tclogger import logger, get_now_str, brk, str_to_t, get_date_str
 from typing import Literal
 
 from configs.envs import DATA_ROOT, EMAIL_SENDER, EMAIL_RECVER
-from file.excel_merger import ExcelChecker
+from web.profiler import profile_from_args
+from cli.arg import add_profile_arguments
 
 
 class EmailSender:
@@ -62,6 +63,9 @@ class EmailSender:
         self.check_output()
 
     def init_emailer(self):
+        # pandas and openpyxl of excel checker are only imported when sending
+        from file.excel_merger import ExcelChecker
+
         self.emailer = Emailer(
             self.configs,
             confirm_before_send=self.confirm_before_send,
@@ -111,6 +115,7 @@ class BatcherArgParser(argparse.ArgumentParser):
         self.add_argument(
             "-t", "--task", type=str, choices=["daily", "weekly"], default="daily"
         )
+        add_profile_arguments(self)
 
     def parse_args(self):
         self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
@@ -120,10 +125,13 @@ class BatcherArgParser(argparse.ArgumentParser):
 def main():
     parser = BatcherArgParser()
     args = parser.parse_args()
-    email_sender = EmailSender(
-        date_str=args.date, confirm_before_send=args.confirm_before_send, task=args.task
-    )
-    email_sender.send()
+    with profile_from_args(args):
+        email_sender = EmailSender(
+            date_str=args.date,
+            confirm_before_send=args.confirm_before_send,
+            task=args.task,
+        )
+        email_sender.send()
 
 
 if __name__ == "__main__":
@@ -16,6 +16,10 @@ from collections import defaultdict
 from configs.envs import DATA_ROOT, LOCATION_LIST, LOCATION_MAP
 from configs.envs import SKIP_WEBSITE_CHECKS_MAP, WEBSITE_NAMES
 from web.logs import log_df_tail, log_df_dims
+from web.instrument import timed, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from cli.arg import add_profile_arguments
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -297,6 +301,7 @@ class ExcelMerger:
                 sheet.cell(row=row_idx, column=col_idx, value=value)
         self.set_sheet_styles(sheet)
 
+    @timed("excel_merge")
     def merge(self):
         logger.note(f"> Merging xlsx files for:")
         logger.mesg(f"  * locations: {logstr.file(LOCATION_LIST)}")
@@ -414,6 +419,7 @@ class ExcelChecker:
             json.dump(log_res, wf, indent=4, ensure_ascii=False)
         logger.file(f"  * {self.log_path}")
 
+    @timed("excel_check")
     def check(self, verbose: bool = False) -> list[dict]:
         """
         Example output:
@@ -548,6 +554,7 @@ class ExcelPackager:
         self.workbook.save(self.package_path)
         logger.okay(f"  * {self.package_path}")
 
+    @timed("excel_package")
     def package(self, sheet_format: Literal["by_date", "all_in_one"] = "all_in_one"):
         logger.note(f"> Packaging xlsx files for:")
         df_dates: list[tuple[pd.DataFrame, str]] = []
@@ -576,6 +583,7 @@ class ExcelMergerArgParser(argparse.ArgumentParser):
         self.add_argument("-m", "--merge", action="store_true")
         self.add_argument("-k", "--check", action="store_true")
         self.add_argument("-p", "--package", action="store_true")
+        add_profile_arguments(self)
 
     def parse_args(self):
         self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
@@ -583,24 +591,31 @@ class ExcelMergerArgParser(argparse.ArgumentParser):
 
 
 def main(args: argparse.Namespace):
-    if args.merge:
-        merger = ExcelMerger(date_str=args.date)
-        merger.merge()
+    exporter = PromTextfileExporter(job="excel_merger")
+    exporter.start()
+    try:
+        if args.merge:
+            merger = ExcelMerger(date_str=args.date)
+            merger.merge()
 
-    if args.check:
-        checker = ExcelChecker(date_str=args.date)
-        checker.check()
+        if args.check:
+            checker = ExcelChecker(date_str=args.date)
+            checker.check()
 
-    if args.package:
-        packager = ExcelPackager(date_str=args.date)
-        packager.package()
+        if args.package:
+            packager = ExcelPackager(date_str=args.date)
+            packager.package()
+    finally:
+        dump_summary(DATA_ROOT / "output" / get_date_str(args.date))
+        exporter.stop()
 
 
 if __name__ == "__main__":
     arg_parser = ExcelMergerArgParser()
     args = arg_parser.parse_args()
 
-    main(args)
+    with profile_from_args(args):
+        main(args)
 
     # Case 1: Extract data from websites and save to Excel files
     # python -m web.blinkit.batcher -e
@@ -616,3 +631,6 @@ if __name__ == "__main__":
 
     # Case 4: Package Excel files (weekly) into one
     # python -m file.excel_merger -p
+
+    # Case 5: Merge, and profile allocations of merge stage
+    # python -m file.excel_merger -m --profile tracemalloc --profile-stage excel_merge
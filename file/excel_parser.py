@@ -1,10 +1,14 @@
-import pandas as pd
 import warnings
 
 from pathlib import Path
 from tclogger import logger, match_val
+from typing import TYPE_CHECKING
 
 from configs.envs import SKU_XLSX
+from web.instrument import timed
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 warnings.filterwarnings("ignore", category=FutureWarning)
 
@@ -15,7 +19,10 @@ class ExcelReader:
         self.verbose = verbose
         self.init_df()
 
+    @timed("read_excel")
     def init_df(self):
+        import pandas as pd
+
         logger.enter_quiet(not self.verbose)
         logger.note("> Reading DataFrame from Excel:")
         self.df = pd.read_excel(
@@ -25,7 +32,7 @@ class ExcelReader:
         logger.file(f"  * {self.file_path}")
         logger.exit_quiet(not self.verbose)
 
-    def get_column_by_name(self, column: str) -> pd.Series:
+    def get_column_by_name(self, column: str) -> "pd.Series":
         _, column_idx, _ = match_val(column, self.columns, use_fuzz=True)
         if column_idx is None:
             return None
@@ -34,7 +41,7 @@ class ExcelReader:
 
 
 class DataframeParser:
-    def __init__(self, df: pd.DataFrame, verbose: bool = True):
+    def __init__(self, df: "pd.DataFrame", verbose: bool = True):
         self.df = df
         self.verbose = verbose
 
@@ -77,6 +84,7 @@ class DataframeParser:
                     logger.warn(f"× Invalid column: '{key}'")
                     continue
 
+    @timed("dump_excel")
     def dump_to_excel(self, output_path: Path = None, sheet_name: str = "Sheet1"):
         logger.enter_quiet(not self.verbose)
         logger.note(f"> Dumping DataFrame to Excel:")
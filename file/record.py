@@ -1,8 +1,10 @@
 import json
+import threading
 
 from tclogger import get_date_str
 
 from configs.envs import WEBSITE_LITERAL, DATA_ROOT
+from web.instrument import incr
 
 
 class LinksRecorder:
@@ -13,6 +15,7 @@ class LinksRecorder:
     ):
         self.website = website
         self.date_str = get_date_str(date_str)
+        self.lock = threading.Lock()
         self.init_paths()
         self.init_records()
 
@@ -62,19 +65,21 @@ class LinksRecorder:
         location: str,
         link: str,
     ):
-        idx, record = self.get_record(website, location, link)
-        if idx is not None:
-            self.records[idx]["count"] += 1
-        else:
-            self.records.append(
-                {
-                    "website": website,
-                    "location": location,
-                    "link": link,
-                    "count": 1,
-                }
-            )
-        self.save_records()
+        incr("link_retries", site=website, location=location)
+        with self.lock:
+            idx, record = self.get_record(website, location, link)
+            if idx is not None:
+                self.records[idx]["count"] += 1
+            else:
+                self.records.append(
+                    {
+                        "website": website,
+                        "location": location,
+                        "link": link,
+                        "count": 1,
+                    }
+                )
+            self.save_records()
 
     def is_record_good(
         self, website: WEBSITE_LITERAL, location: str, link: str, max_count: int = 3
@@ -0,0 +1,110 @@
+import json
+import os
+
+from pathlib import Path
+from tclogger import logger, logstr, brk
+from typing import TYPE_CHECKING, Callable
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+PATH_COLUMN = "_path"
+
+
+class RowCache:
+    """Rows extracted from json files, keyed by file path and mtime.
+
+    Rows are stored in a Parquet file, and mtimes in a json index beside it,
+    so a summarize run only re-extracts rows of changed files.
+    """
+
+    def __init__(self, cache_path: Path):
+        self.cache_path = cache_path
+        self.index_path = cache_path.with_suffix(".json")
+        self.load()
+
+    def load(self):
+        self.mtimes: dict[str, int] = {}
+        self.rows: dict[str, list[dict]] = {}
+        self.seen_keys: set[str] = set()
+        self.changed_keys: set[str] = set()
+        self.hits, self.misses = 0, 0
+        if not (self.cache_path.exists() and self.index_path.exists()):
+            return
+        import pandas as pd
+
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as rf:
+                self.mtimes = json.load(rf)
+            df = pd.read_parquet(self.cache_path)
+        except Exception as e:
+            logger.warn(f"× RowCache.load: {e}")
+            self.mtimes = {}
+            return
+        for key, group_df in df.groupby(PATH_COLUMN, sort=False):
+            group_df = group_df.drop(columns=[PATH_COLUMN]).astype(object)
+            group_df = group_df.where(group_df.notna(), None)
+            self.rows[key] = group_df.to_dict(orient="records")
+
+    def get_rows(self, path: Path, row_func: Callable[[], list[dict]]) -> list[dict]:
+        """Return cached rows of path if its mtime not changed, else call row_func."""
+        if not path.exists():
+            return row_func()
+        key = str(path)
+        mtime = path.stat().st_mtime_ns
+        self.seen_keys.add(key)
+        if self.mtimes.get(key) == mtime:
+            self.hits += 1
+            return self.rows.get(key, [])
+        self.misses += 1
+        rows = row_func()
+        self.rows[key] = rows
+        self.mtimes[key] = mtime
+        self.changed_keys.add(key)
+        return rows
+
+    def prune(self):
+        """Drop entries of files not seen in this run, such as deleted files."""
+        for key in list(self.mtimes.keys()):
+            if key not in self.seen_keys:
+                self.mtimes.pop(key, None)
+                self.rows.pop(key, None)
+                self.changed_keys.add(key)
+
+    def is_changed(self) -> bool:
+        return len(self.changed_keys) > 0
+
+    def to_df(self) -> "pd.DataFrame":
+        import pandas as pd
+
+        dfs = [
+            pd.DataFrame(rows).assign(**{PATH_COLUMN: key})
+            for key, rows in self.rows.items()
+            if rows
+        ]
+        if not dfs:
+            return pd.DataFrame(columns=[PATH_COLUMN])
+        df = pd.concat(dfs, ignore_index=True)
+        # parquet requires one type per column
+        for col in df.columns:
+            if pd.api.types.infer_dtype(df[col], skipna=True).startswith("mixed"):
+                df[col] = df[col].map(lambda x: None if x is None else str(x))
+        return df
+
+    def save(self):
+        logger.mesg(
+            f"  * Row cache: hits={logstr.okay(self.hits)}, "
+            f"misses={logstr.file(self.misses)}"
+        )
+        if not self.is_changed():
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_cache_path = self.cache_path.with_suffix(".parquet.tmp")
+        self.to_df().to_parquet(tmp_cache_path, index=False)
+        os.replace(tmp_cache_path, self.cache_path)
+        tmp_index_path = self.index_path.with_suffix(".json.tmp")
+        with open(tmp_index_path, "w", encoding="utf-8") as wf:
+            json.dump(self.mtimes, wf, ensure_ascii=False)
+        os.replace(tmp_index_path, self.index_path)
+        self.changed_keys = set()
+        logger.okay(f"  * Row cache saved: {brk(self.cache_path)}")
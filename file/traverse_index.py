@@ -0,0 +1,99 @@
+import hashlib
+import json
+import os
+import threading
+
+from pathlib import Path
+from tclogger import logger, brk, get_now_str
+from typing import TypedDict
+
+
+class IndexEntryType(TypedDict):
+    count: int
+    complete: bool
+    end_reason: str
+    checksum: str
+    mtime_ns: int
+    update_at: str
+
+
+def get_checksum(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class TraverseIndex:
+    """Sidecar index of traversal json files in one location dir,
+    so the completeness of a json could be checked without loading it.
+
+    Entries are keyed by path relative to the index dir, and an entry is only
+    trusted if the mtime of json file is unchanged since it was recorded.
+    """
+
+    def __init__(self, index_path: Path, flush_every: int = 20):
+        self.index_path = index_path
+        self.index_root = index_path.parent
+        self.flush_every = flush_every
+        self.lock = threading.Lock()
+        self.dirty_count = 0
+        self.load()
+
+    def load(self):
+        self.entries: dict[str, IndexEntryType] = {}
+        if not self.index_path.exists():
+            return
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as rf:
+                self.entries = json.load(rf)
+        except Exception as e:
+            logger.warn(f"× TraverseIndex.load: {e}")
+
+    def get_key(self, json_path: Path) -> str:
+        try:
+            return str(json_path.relative_to(self.index_root))
+        except ValueError:
+            return str(json_path)
+
+    def get_entry(self, json_path: Path) -> IndexEntryType:
+        with self.lock:
+            entry = self.entries.get(self.get_key(json_path))
+        if not entry or not json_path.exists():
+            return None
+        if entry.get("mtime_ns") != json_path.stat().st_mtime_ns:
+            return None
+        return entry
+
+    def update(
+        self,
+        json_path: Path,
+        count: int,
+        complete: bool,
+        end_reason: str = None,
+        checksum: str = None,
+    ) -> IndexEntryType:
+        entry: IndexEntryType = {
+            "count": count,
+            "complete": complete,
+            "end_reason": end_reason,
+            "checksum": checksum,
+            "mtime_ns": json_path.stat().st_mtime_ns,
+            "update_at": get_now_str(),
+        }
+        with self.lock:
+            self.entries[self.get_key(json_path)] = entry
+            self.dirty_count += 1
+            should_flush = self.dirty_count >= self.flush_every
+        if should_flush:
+            self.flush()
+        return entry
+
+    def flush(self):
+        with self.lock:
+            if self.dirty_count <= 0:
+                return
+            self.index_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.index_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as wf:
+                json.dump(self.entries, wf, ensure_ascii=False, indent=4)
+            os.replace(tmp_path, self.index_path)
+            self.dirty_count = 0
+        logger.mesg(f"  * Index flushed: {brk(self.index_path)}")
@@ -0,0 +1,222 @@
+import json
+import os
+import threading
+
+from tclogger import logger, logstr, brk, get_date_str
+from time import sleep, time
+from typing import Literal, Iterator, TypedDict
+
+from configs.envs import WEBSITE_LITERAL, DATA_ROOT
+
+ITEM_STATE = Literal["pending", "done", "failed", "poisoned"]
+
+
+class WorkItemType(TypedDict):
+    site: str
+    location: str
+    product_id: str
+    link: str
+    idx: int
+    state: ITEM_STATE
+    attempts: int
+    next_ts: float
+    error: str
+
+
+class WorkQueue:
+    """Durable queue of (site, location, product_id) items of one scrape run.
+
+    Updates are appended to a jsonl journal (latest line of item wins),
+    so a restarted batcher resumes from pending items, without re-validating dumps.
+    """
+
+    def __init__(
+        self,
+        website: WEBSITE_LITERAL,
+        date_str: str = None,
+        max_attempts: int = 3,
+        backoff_base: float = 15,
+        backoff_max: float = 300,
+    ):
+        self.website = website
+        self.date_str = get_date_str(date_str)
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        # items of a location are only updated by its own thread,
+        # while journal is shared by all locations
+        self.lock = threading.Lock()
+        self.init_paths()
+        self.load()
+
+    def init_paths(self):
+        self.queue_root = DATA_ROOT / "dumps" / self.date_str / self.website
+        self.queue_path = self.queue_root / "queue.jsonl"
+
+    def get_key(self, location: str, product_id: str) -> str:
+        return f"{location}/{product_id}"
+
+    def load(self):
+        self.items: dict[str, WorkItemType] = {}
+        self.locations: set[str] = set()
+        if not self.queue_path.exists():
+            return
+        lines_count = 0
+        with open(self.queue_path, "r", encoding="utf-8") as rf:
+            for line in rf:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except Exception as e:
+                    # last line might be truncated if process was killed
+                    logger.warn(f"× WorkQueue: skip bad line: {e}")
+                    continue
+                lines_count += 1
+                if item.get("state") == "location":
+                    self.locations.add(item.get("location"))
+                    continue
+                key = self.get_key(item["location"], item["product_id"])
+                self.items[key] = item
+        if lines_count > 2 * (len(self.items) + len(self.locations)):
+            self.compact()
+
+    def compact(self):
+        tmp_path = self.queue_path.with_suffix(".jsonl.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            for location in self.locations:
+                line = {"state": "location", "location": location}
+                wf.write(json.dumps(line, ensure_ascii=False) + "\n")
+            for item in self.items.values():
+                wf.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.queue_path)
+
+    def append(self, line: dict):
+        self.queue_path.parent.mkdir(parents=True, exist_ok=True)
+        with self.lock, open(self.queue_path, "a", encoding="utf-8") as wf:
+            wf.write(json.dumps(line, ensure_ascii=False) + "\n")
+            wf.flush()
+            os.fsync(wf.fileno())
+
+    def reset(self):
+        logger.note(f"> Reset work queue: {logstr.file(brk(self.queue_path))}")
+        self.items = {}
+        self.locations = set()
+        self.queue_path.unlink(missing_ok=True)
+
+    def has_location(self, location: str) -> bool:
+        """Whether items of location have all been added, i.e., queue is built."""
+        return location in self.locations
+
+    def add_location(self, location: str):
+        self.locations.add(location)
+        self.append({"state": "location", "location": location})
+
+    def add(
+        self,
+        location: str,
+        product_id: str,
+        link: str = None,
+        idx: int = None,
+        state: ITEM_STATE = "pending",
+    ) -> WorkItemType:
+        item: WorkItemType = {
+            "site": self.website,
+            "location": location,
+            "product_id": product_id,
+            "link": link,
+            "idx": idx,
+            "state": state,
+            "attempts": 0,
+            "next_ts": 0,
+            "error": None,
+        }
+        self.items[self.get_key(location, product_id)] = item
+        self.append(item)
+        return item
+
+    def get_item(self, location: str, product_id: str) -> WorkItemType:
+        return self.items.get(self.get_key(location, product_id))
+
+    def update(self, item: WorkItemType, **kwargs) -> WorkItemType:
+        item.update(kwargs)
+        self.append(item)
+        return item
+
+    def mark_done(self, item: WorkItemType) -> WorkItemType:
+        return self.update(item, state="done", error=None)
+
+    def mark_failed(self, item: WorkItemType, error: str = None) -> WorkItemType:
+        attempts = item.get("attempts", 0) + 1
+        if attempts >= self.max_attempts:
+            logger.warn(
+                f"  × Poisoned after {attempts} attempts: "
+                f"{logstr.file(brk(item.get('product_id')))}"
+            )
+            return self.update(item, state="poisoned", attempts=attempts, error=error)
+        backoff = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        logger.warn(
+            f"  × Failed ({attempts}/{self.max_attempts}), "
+            f"retry after {backoff:.0f}s: {logstr.file(brk(item.get('product_id')))}"
+        )
+        return self.update(
+            item,
+            state="failed",
+            attempts=attempts,
+            next_ts=time() + backoff,
+            error=error,
+        )
+
+    def release(self, item: WorkItemType, error: str = None) -> WorkItemType:
+        """Put item back to pending without counting an attempt, as its failure
+        is caused by environment (such as an unhealthy proxy), not by item."""
+        return self.update(item, state="pending", next_ts=0, error=error)
+
+    def get_location_items(self, location: str) -> list[WorkItemType]:
+        return [item for item in self.items.values() if item["location"] == location]
+
+    def count_states(self, location: str = None) -> dict[str, int]:
+        counts = {"pending": 0, "done": 0, "failed": 0, "poisoned": 0}
+        for item in self.items.values():
+            if location is not None and item["location"] != location:
+                continue
+            counts[item["state"]] = counts.get(item["state"], 0) + 1
+        return counts
+
+    def get_ready_items(self, location: str) -> tuple[list[WorkItemType], float]:
+        """Pending items and failed items whose backoff has expired, and seconds
+        to wait for next failed item if none is ready. Both empty means done."""
+        todo_items = [
+            item
+            for item in self.get_location_items(location)
+            if item["state"] in ["pending", "failed"]
+        ]
+        if not todo_items:
+            return [], 0
+        now = time()
+        ready_items = [item for item in todo_items if item["next_ts"] <= now]
+        if ready_items:
+            return ready_items, 0
+        wait_seconds = min(item["next_ts"] for item in todo_items) - now
+        return [], max(wait_seconds, 0)
+
+    def iter_pending(self, location: str, wait: bool = True) -> Iterator[WorkItemType]:
+        """Yield pending items, then failed items whose backoff has expired,
+        until no items left to retry. Caller should mark each yielded item.
+        If not `wait`, stop once only items in backoff are left."""
+        while True:
+            ready_items, wait_seconds = self.get_ready_items(location)
+            if not ready_items and (not wait_seconds or not wait):
+                break
+            if not ready_items:
+                logger.note(f"> Waiting {wait_seconds:.0f}s for failed items ...")
+                sleep(wait_seconds)
+                continue
+            for item in ready_items:
+                yield item
+
+    def log_counts(self, location: str = None):
+        counts = self.count_states(location)
+        counts_str = ", ".join(f"{k}={v}" for k, v in counts.items())
+        logger.mesg(f"  * Queue [{location}]: {logstr.file(counts_str)}")
@@ -11,9 +11,17 @@ from typing import Union
 
 from configs.envs import DATA_ROOT, BLINKIT_LOCATIONS
 from file.excel_parser import ExcelReader, DataframeParser
+from web.browser import BrowserClient
 from web.blinkit.scraper import BlinkitLocationChecker, BlinkitLocationSwitcher
 from web.blinkit.scraper import BlinkitBrowserScraper, BlinkitProductDataExtractor
+from web.logs import log_link_idx, log_traceback
 from file.local_dump import LocalAddressExtractor
+from file.work_queue import WorkQueue
+from web.pacer import get_pacer
+from web.instrument import set_labels, incr, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from web.daemon import use_daemon
 from cli.arg import BatcherArgParser
 
 WEBSITE_NAME = "blinkit"
@@ -40,8 +48,15 @@ class BlinkitScrapeBatcher:
         self.switcher = BlinkitLocationSwitcher()
         self.checker = BlinkitLocationChecker()
         self.scraper = BlinkitBrowserScraper(date_str=date_str)
-        self.extractor = BlinkitProductDataExtractor()
+        self.scraper.client.on_recycle = self.restore_location
         self.addr_extractor = LocalAddressExtractor(website_name=WEBSITE_NAME)
+        self.queue = WorkQueue(website=WEBSITE_NAME, date_str=date_str)
+        self.pacer = get_pacer(WEBSITE_NAME)
+
+    def restore_location(self, client: BrowserClient):
+        """Relaunch recycled browser by switcher, and set its location again."""
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
 
     def close_switcher(self):
         try:
@@ -57,45 +72,77 @@ class BlinkitScrapeBatcher:
         except Exception as e:
             logger.warn(f"× BlinkitScrapeBatcher.close_scraper: {e}")
 
+    def init_queue(self, location_name: str, links: list[str]):
+        """Add links of location which are not in queue yet, such as rows added to
+        xlsx later, and validate their local dumps once."""
+        logger.note(f"> Init work queue: {logstr.mesg(brk(location_name))}")
+        for link_idx, link in enumerate(links):
+            if not link:
+                continue
+            product_id = link.split("/")[-1].strip()
+            if self.queue.get_item(location_name, product_id):
+                continue
+            state = "pending"
+            dump_path = self.scraper.get_dump_path(product_id, parent=location_name)
+            if self.skip_exists and dump_path.exists():
+                if self.addr_extractor.check_dump_path_location(
+                    dump_path, correct_location_name=location_name
+                ):
+                    state = "done"
+                    incr("products", status="skipped")
+                else:
+                    logger.warn(f"> Remove local dump file, and re-scrape")
+                    logger.file(f"  * {dump_path}")
+                    dump_path.unlink(missing_ok=True)
+            self.queue.add(
+                location_name, product_id, link=link, idx=link_idx, state=state
+            )
+        if not self.queue.has_location(location_name):
+            self.queue.add_location(location_name)
+
     def run(self):
         blinkit_links = self.excel_reader.get_column_by_name("weblink_blinkit")
         for location_idx, location_item in enumerate(BLINKIT_LOCATIONS):
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             location_text = location_item.get("text", "")
             links = blinkit_links[:]
+            self.init_queue(location_name, links)
             is_set_location = False
-            for link_idx, link in enumerate(links):
-                if not link:
-                    logger.mesg(f"> Skip empty link at row [{link_idx}]")
-                    continue
-                else:
-                    logger.note(
-                        f"[{logstr.mesg(link_idx+1)}/{logstr.file(len(links))}]",
-                        end=" ",
-                    )
-                product_id = link.split("/")[-1].strip()
-                dump_path = self.scraper.get_dump_path(product_id, parent=location_name)
-                if self.skip_exists and dump_path.exists():
-                    if self.addr_extractor.check_dump_path_location(
-                        dump_path, correct_location_name=location_name
-                    ):
-                        # logger.note(f"> Skip exists:  {logstr.file(brk(dump_path))}")
-                        continue
-                    else:
-                        logger.warn(f"> Remove local dump file, and re-scrape")
-                        logger.file(f"  * {dump_path}")
-                        dump_path.unlink(missing_ok=True)
+            for item in self.queue.iter_pending(location_name):
+                product_id = item["product_id"]
                 if not is_set_location:
                     logger.hint(f"> New Location: {location_name} ({location_text})")
                     self.switcher.set_location(location_idx)
                     is_set_location = True
-                product_info = self.scraper.run(product_id, parent=location_name)
-                self.checker.check_product_location(
-                    product_info, location_idx, extra_msg="BlinkitScrapeBatcher"
-                )
-                extracted_data = self.extractor.extract(product_info)
-                if extracted_data:
-                    sleep(2)
+                log_link_idx(item["idx"], len(links))
+                self.pacer.wait()
+                try:
+                    product_info = self.scraper.run(product_id, parent=location_name)
+                except Exception as e:
+                    log_traceback(e)
+                    incr("products", status="failed")
+                    self.queue.mark_failed(item, error=str(e))
+                    continue
+                try:
+                    self.checker.check_product_location(
+                        product_info, location_idx, extra_msg="BlinkitScrapeBatcher"
+                    )
+                except Exception as e:
+                    # location might be reset by website, so set it again
+                    dump_path = self.scraper.get_dump_path(
+                        product_id, parent=location_name
+                    )
+                    dump_path.unlink(missing_ok=True)
+                    self.pacer.on_failure("location_reset")
+                    incr("products", status="failed")
+                    self.queue.mark_failed(item, error=str(e))
+                    is_set_location = False
+                    continue
+                incr("products", status="done")
+                self.queue.mark_done(item)
+                self.pacer.on_success()
+            self.queue.log_counts(location_name)
 
         self.close_scraper()
 
@@ -156,6 +203,7 @@ class BlinkitExtractBatcher:
             df = deepcopy(self.excel_reader.df)
             df_parser = DataframeParser(df, verbose=self.verbose)
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             links = blinkit_links[:]
             location_bar.update(desc=logstr.mesg(brk(location_name)), flush=True)
             row_dicts: list[dict] = []
@@ -205,6 +253,8 @@ def run_scrape_batcher(args: argparse.Namespace):
             date_str=args.date,
             close_browser_after_done=args.close_browser_after_done,
         )
+        if args.daemon:
+            use_daemon(scraper_batcher, WEBSITE_NAME)
         scraper_batcher.run()
     except Exception as e:
         logger.warn(e)
@@ -215,19 +265,29 @@ def run_scrape_batcher(args: argparse.Namespace):
 
 
 def main(args: argparse.Namespace):
-    if args.scrape:
-        with Retrier(max_retries=10, retry_interval=60) as retrier:
-            retrier.run(run_scrape_batcher, args=args)
+    exporter = PromTextfileExporter(job=f"{WEBSITE_NAME}_batcher")
+    exporter.start()
+    try:
+        if args.scrape:
+            if args.force_scrape:
+                WorkQueue(website=WEBSITE_NAME, date_str=args.date).reset()
+            # retried batcher resumes from pending items in work queue
+            with Retrier(max_retries=10, retry_interval=60) as retrier:
+                retrier.run(run_scrape_batcher, args=args)
 
-    if args.extract:
-        extract_batcher = BlinkitExtractBatcher(date_str=args.date)
-        extract_batcher.run()
+        if args.extract:
+            extract_batcher = BlinkitExtractBatcher(date_str=args.date)
+            extract_batcher.run()
+    finally:
+        date_str = args.date or get_now_str()[:10]
+        dump_summary(DATA_ROOT / "output" / date_str / WEBSITE_NAME)
+        exporter.stop()
 
 
 if __name__ == "__main__":
     arg_parser = BatcherArgParser()
     args = arg_parser.parse_args()
-    with Runtimer():
+    with Runtimer(), profile_from_args(args):
         main(args)
 
     # Case 1: Batch scrape
@@ -238,3 +298,6 @@ if __name__ == "__main__":
 
     # Case 3: Batch scrape and extract
     # python -m web.blinkit.batcher -s -e
+
+    # Case 4: Batch extract, and profile only the extract stage
+    # python -m web.blinkit.batcher -e --profile cprofile --profile-stage extract
@@ -1,18 +1,23 @@
 import json
 
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from tclogger import logger, logstr, brk, dict_to_str, dict_get, dict_set, get_now_str
 from time import sleep
-from typing import Union
+from typing import TYPE_CHECKING, Union
 from urllib.parse import unquote
 
 from configs.envs import DATA_ROOT, BLINKIT_LOCATIONS, BLINKIT_BROWSER_SETTING
 from web.clicker import BlinkitLocationClicker
 from web.browser import BrowserClient
 from web.fetch import fetch_with_retry
+from web.pacer import get_pacer, is_captcha_title
+from web.instrument import timed
+from web.session import LocationSessionCache
 from file.local_dump import LocalAddressExtractor
 
+if TYPE_CHECKING:
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
 WEBSITE_NAME = "blinkit"
 BLINKIT_MAIN_URL = "https://blinkit.com"
 BLINKIT_FLAG_URL = "https://blinkit.com/api/feature-flags/receive"
@@ -59,7 +64,7 @@ class BlinkitLocationChecker:
         return True
 
     def check_tab_location(
-        self, tab: ChromiumTab, location_idx: int, extra_msg: str = ""
+        self, tab: "ChromiumTab", location_idx: int, extra_msg: str = ""
     ) -> bool:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         local_address = cookies_dict.get("gr_1_locality", "")
@@ -82,6 +87,9 @@ class BlinkitLocationSwitcher:
         self.locations = locations or BLINKIT_LOCATIONS
         self.checker = BlinkitLocationChecker()
         self.client = BrowserClient(**self.client_settings)
+        self.session_cache = LocationSessionCache(
+            website=WEBSITE_NAME, client_settings=self.client_settings
+        )
         self.current_location_idx = None
 
     def is_at_idx(self, location_idx: int) -> bool:
@@ -90,6 +98,31 @@ class BlinkitLocationSwitcher:
             and self.current_location_idx == location_idx
         )
 
+    def get_location_name(self, location_idx: int) -> str:
+        return self.locations[location_idx].get("name", "")
+
+    def restore_session(self, tab: "ChromiumTab", location_idx: int) -> bool:
+        location_name = self.get_location_name(location_idx)
+        if not self.session_cache.restore(tab, location_name):
+            return False
+        tab.get(BLINKIT_MAIN_URL)
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="BlinkitLocationSwitcher"
+        ):
+            return True
+        self.session_cache.invalidate(location_name)
+        return False
+
+    def save_session(self, tab: "ChromiumTab", location_idx: int, force: bool = True):
+        location_name = self.get_location_name(location_idx)
+        if not force and self.session_cache.get(location_name):
+            return
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="BlinkitLocationSwitcher"
+        ):
+            self.session_cache.snapshot(tab, location_name)
+
+    @timed("set_location", site=WEBSITE_NAME)
     def set_location(self, location_idx: int = 0) -> dict:
         self.client.start_client()
         tab = self.client.browser.latest_tab
@@ -102,6 +135,9 @@ class BlinkitLocationSwitcher:
             tab, location_idx, extra_msg="BlinkitLocationSwitcher"
         ):
             logger.okay("  * Location already correctly set. Skip.")
+            self.save_session(tab, location_idx, force=False)
+        elif self.restore_session(tab, location_idx):
+            logger.okay("  * Location restored from session cache. Skip.")
         else:
             logger.note(f"  > Setting location:")
             self.clicker = BlinkitLocationClicker(tab=tab, suffix=WEBSITE_NAME)
@@ -128,6 +164,7 @@ class BlinkitLocationSwitcher:
             logger.note(f"  > Clicking target location item ...")
             self.clicker.click_target_position()
             sleep(10)
+            self.save_session(tab, location_idx)
 
         self.current_location_idx = location_idx
         # self.client.close_other_tabs(create_new_tab=True)
@@ -139,13 +176,14 @@ class BlinkitBrowserScraper:
         self.date_str = date_str
         self.client = BrowserClient(**BLINKIT_BROWSER_SETTING)
         self.checker = BlinkitLocationChecker()
+        self.pacer = get_pacer(WEBSITE_NAME)
         self.init_paths()
 
     def init_paths(self):
         self.date_str = self.date_str or get_now_str()[:10]
         self.dump_root = DATA_ROOT / "dumps" / self.date_str / WEBSITE_NAME
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         cookies_dict["url"] = tab.url
         cookies_dict["now"] = get_now_str()
@@ -176,6 +214,7 @@ class BlinkitBrowserScraper:
         dict_set(resp, atttributes_keys, clean_attributes)
         return resp
 
+    @timed("fetch", site=WEBSITE_NAME)
     def fetch(self, product_id: Union[str, int], save_cookies: bool = True) -> dict:
         prn_url = f"{BLINKIT_PRN_URL}/{product_id}"
         logger.note(f"> Visiting product page: {logstr.mesg(brk(product_id))}")
@@ -191,6 +230,8 @@ class BlinkitBrowserScraper:
 
         tab.get(prn_url)
         logger.mesg(f"  ✓ Title: {brk(tab.title)}")
+        if is_captcha_title(tab.title):
+            self.pacer.on_failure("captcha")
 
         logger.note(f"  > Listening targets:")
         for target in listen_targets:
@@ -213,7 +254,9 @@ class BlinkitBrowserScraper:
 
         if layout_packet:
             layout_resp = layout_packet.response
-            if layout_resp:
+            if layout_resp and layout_resp.status == 429:
+                self.pacer.on_failure("http_429")
+            elif layout_resp:
                 layout_data = layout_resp.body
                 layout_data = self.clean_resp(layout_data)
 
@@ -231,6 +274,7 @@ class BlinkitBrowserScraper:
             dump_path = self.dump_root / filename
         return dump_path
 
+    @timed("dump", site=WEBSITE_NAME)
     def dump(self, product_id: Union[str, int], resp: dict, parent: str = None):
         logger.note(f"  > Dump product data to json:", end=" ")
         dump_path = self.get_dump_path(product_id, parent)
@@ -243,7 +287,10 @@ class BlinkitBrowserScraper:
         self, product_id: Union[str, int], save_cookies: bool = True, parent: str = None
     ) -> dict:
         product_info = fetch_with_retry(
-            self.fetch, product_id=product_id, save_cookies=save_cookies
+            self.fetch,
+            product_id=product_id,
+            save_cookies=save_cookies,
+            pacer=self.pacer,
         )
         self.dump(product_id=product_id, resp=product_info, parent=parent)
         return product_info
@@ -254,6 +301,7 @@ class BlinkitProductDataExtractor:
         self.verbose = verbose
         self.address_extractor = LocalAddressExtractor(website_name=WEBSITE_NAME)
 
+    @timed("extract", site=WEBSITE_NAME)
     def extract(self, resp: dict) -> dict:
         logger.enter_quiet(not self.verbose)
         if not resp:
@@ -1,21 +1,35 @@
 import argparse
 import json
-import pandas as pd
+import os
+import queue
 import re
+import threading
 
 from dataclasses import dataclass
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from time import sleep, monotonic
 from tclogger import logger, logstr, brk, get_now_str, Runtimer, dict_get
-from typing import Literal
-from urllib.parse import parse_qs, urlparse
+from typing import TYPE_CHECKING, Literal
+from urllib.parse import parse_qs, urlencode, urlparse
 
 from configs.envs import DATA_ROOT, BLINKIT_LOCATIONS, BLINKIT_TRAVERSER_SETTING
 from web.blinkit.scraper import BlinkitLocationChecker, BlinkitLocationSwitcher
 from web.browser import BrowserClient
+from web.categ_tree import get_categ_tree
 from web.constants import norm_date_str
-from cli.arg import TraverserArgParser
+from web.js_literal import js_literal_to_json
+from web.instrument import set_labels, timed, incr, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from web.pacer import get_pacer, is_captcha_title
+from file.row_cache import RowCache
+from file.traverse_index import TraverseIndex, get_checksum
+from cli.arg import BlinkitTraverserArgParser
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from DrissionPage._pages.chromium_tab import ChromiumTab
 
 WEBSITE_NAME = "blinkit"
 BLINKIT_CATEG_URL = "https://blinkit.com/categories"
@@ -23,6 +37,7 @@ BLINKIT_FLAG_URL = "https://blinkit.com/api/feature-flags/receive"
 BLINKIT_CATEG_JS = "https://blinkit.com/.*/categories.*js"
 BLINKIT_DEEPLINK_URL = "https://blinkit.com/v2/search/deeplink"
 BLINKIT_LISTING_URL = "https://blinkit.com/v1/layout/listing_widgets"
+PAGINATE_MODE = Literal["scroll", "fetch"]
 # -/(\.(js|woff|css|svg|ico|png)|data:)/
 
 
@@ -42,6 +57,18 @@ def get_categ_dump_path(date_str: str = None, location: str = None) -> Path:
     return dump_root.joinpath(*path_parts)
 
 
+def get_categ_js_cache_path() -> Path:
+    return DATA_ROOT / "caches" / WEBSITE_NAME / "categories_js.json"
+
+
+def get_index_path(date_str: str = None, location: str = None) -> Path:
+    dump_root = get_dump_root(date_str)
+    path_parts = ["index.json"]
+    if location:
+        path_parts = [location] + path_parts
+    return dump_root.joinpath(*path_parts)
+
+
 def norm_name(name: str) -> str:
     return re.sub(r"[^a-zA-Z0-9]+", "-", name.lower()).strip("-")
 
@@ -61,9 +88,38 @@ class BlinkitCategoriesExtractor:
     def __init__(self, client: BrowserClient, verbose: bool = False):
         self.client = client
         self.verbose = verbose
+        self.cache_path = get_categ_js_cache_path()
+
+    def load_cache(self, js_url: str) -> dict:
+        """Categories parsed from the same hashed js bundle url in last run."""
+        cache_data = load_json(self.cache_path)
+        if not js_url or cache_data.get("url") != js_url:
+            return {}
+        categories = cache_data.get("categories", [])
+        if not categories:
+            return {}
+        logger.okay(f"  + Reuse {len(categories)} categories of unchanged js bundle")
+        return {"categories": categories, "count": len(categories)}
+
+    def save_cache(self, js_url: str, categories: list):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".json.tmp")
+        cache_data = {
+            "url": js_url,
+            "update_at": get_now_str(),
+            "categories": categories,
+        }
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            json.dump(cache_data, wf, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
 
     def js_to_json_str(self, js_str: str) -> str:
-        """Convert JS object notation to JSON string"""
+        """Convert JS object notation to JSON string.
+        Parse in Python first, and fallback to browser for unsupported syntax."""
+        try:
+            return js_literal_to_json(js_str)
+        except ValueError as e:
+            logger.warn(f"  × Failed to parse js in python, fallback to browser: {e}")
         tab = self.client.browser.latest_tab
         # JSON.stringify()
         json_str = tab.run_js(
@@ -96,7 +152,8 @@ class BlinkitCategoriesExtractor:
 
         return categories
 
-    def extract(self, js_str: str) -> dict:
+    @timed("extract_categories", site=WEBSITE_NAME)
+    def extract(self, js_str: str, js_url: str = None) -> dict:
         logger.enter_quiet(not self.verbose)
         if not js_str:
             logger.warn("  × Empty response js to extract")
@@ -106,6 +163,8 @@ class BlinkitCategoriesExtractor:
         categories = self.extract_categories_from_js_str(js_str)
         if categories:
             categ_data = {"categories": categories, "count": len(categories)}
+            if js_url:
+                self.save_cache(js_url, categories)
         else:
             categ_data = {"categories": [], "count": -1}
         logger.exit_quiet(not self.verbose)
@@ -121,7 +180,7 @@ class BlinkitCategoriesFetcher:
         self.extractor = BlinkitCategoriesExtractor(client=client, verbose=True)
         self.location = location
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         cookies_dict["url"] = tab.url
         cookies_dict["now"] = get_now_str()
@@ -161,10 +220,11 @@ class BlinkitCategoriesFetcher:
                 logger.warn(f"  × Unexpected packet: {packet_url_str}")
 
         if categ_packet:
+            categ_data = self.extractor.load_cache(categ_packet.url)
             categ_resp = categ_packet.response
-            if categ_resp:
+            if not categ_data and categ_resp:
                 categ_js_str = categ_resp.body
-                categ_data = self.extractor.extract(categ_js_str)
+                categ_data = self.extractor.extract(categ_js_str, categ_packet.url)
 
         if categ_data:
             categ_data["cookies"] = self.get_cookies(tab)
@@ -172,13 +232,13 @@ class BlinkitCategoriesFetcher:
         self.client.stop_client(close_browser=False)
         return categ_data
 
+    @timed("dump_categories", site=WEBSITE_NAME)
     def dump(self, resp: dict):
-        self.dump_path = get_categ_dump_path(self.date_str, location=self.location)
-        logger.note(f"  > Dump categories data to json:", end=" ")
-        self.dump_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.dump_path, "w", encoding="utf-8") as wf:
-            json.dump(resp, wf, indent=4, ensure_ascii=False)
+        categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+        self.dump_path = categ_tree.tree_path
+        logger.note(f"  > Merge categories data to tree:", end=" ")
         logger.okay(f"{brk(self.dump_path)}")
+        categ_tree.add_location(self.location, resp)
 
     def run(self):
         resp_data = self.fetch()
@@ -208,6 +268,7 @@ class BlinkitListingExtractor:
         }
         return snippet_dict
 
+    @timed("extract_listing", site=WEBSITE_NAME)
     def extract(self, resp: dict) -> list[dict]:
         res = []
         snippets = dict_get(resp, "response.snippets") or []
@@ -238,7 +299,7 @@ class BlinkitListingScroller:
         })()
         """
 
-    def scroll(self, tab: ChromiumTab) -> bool:
+    def scroll(self, tab: "ChromiumTab") -> bool:
         try:
             logger.note(f"  > Scrolling listing container ...")
             js_res = tab.run_js(self.scroll_js, as_expr=True)
@@ -253,6 +314,90 @@ class BlinkitListingScroller:
             return False
 
 
+class BlinkitListingPaginator:
+    """Request listing pages directly with in-page fetch, using the contract
+    (method, headers, body, offset/limit) of the first captured listing packet."""
+
+    # headers which could not be set by fetch, or are set by browser itself
+    SKIP_HEADERS = [
+        *["host", "cookie", "content-length", "connection", "user-agent"],
+        *["referer", "origin", "accept-encoding"],
+    ]
+    MAX_PAGES = 200
+
+    def __init__(self):
+        self.fetch_js = """
+        (async () => {
+            try {
+                const resp = await fetch(%s, {
+                    method: %s, headers: %s, body: %s, credentials: 'include'
+                });
+                const text = await resp.text();
+                return { ok: resp.ok, status: resp.status, text: text };
+            } catch (e) {
+                return { ok: false, status: 0, error: String(e) };
+            }
+        })()
+        """
+
+    def get_query(self, url: str) -> dict:
+        return {k: v[0] for k, v in parse_qs(urlparse(url).query).items() if v}
+
+    def get_contract(self, packet) -> dict:
+        request = packet.request
+        query = self.get_query(packet.url)
+        headers = {
+            k: v
+            for k, v in dict(request.headers or {}).items()
+            if k.lower() not in self.SKIP_HEADERS
+            and not k.lower().startswith(("sec-", ":"))
+        }
+        return {
+            "url": packet.url,
+            "method": request.method or "GET",
+            "headers": headers,
+            "body": request.postData or None,
+            "offset": int(query.get("offset") or 0),
+            "limit": int(query["limit"]) if query.get("limit") else None,
+        }
+
+    def build_page_url(self, contract: dict, offset: int) -> str:
+        parsed = urlparse(contract["url"])
+        query = self.get_query(contract["url"])
+        query["offset"] = str(offset)
+        return parsed._replace(query=urlencode(query)).geturl()
+
+    def build_page_body(self, contract: dict, offset: int) -> str:
+        # postData of packet is parsed to dict if it is json
+        body = contract["body"]
+        if not body:
+            return None
+        if isinstance(body, dict):
+            body = dict(body)
+            if "offset" in body:
+                body["offset"] = offset
+            return json.dumps(body)
+        return str(body)
+
+    def fetch_page(self, tab: "ChromiumTab", contract: dict, offset: int) -> dict:
+        fetch_js = self.fetch_js % (
+            json.dumps(self.build_page_url(contract, offset)),
+            json.dumps(contract["method"]),
+            json.dumps(contract["headers"]),
+            json.dumps(self.build_page_body(contract, offset)),
+        )
+        js_res = tab.run_js(fetch_js, as_expr=True)
+        if not isinstance(js_res, dict):
+            return {"ok": False, "status": 0, "error": f"bad js result: {js_res}"}
+        if js_res.get("ok"):
+            try:
+                js_res["data"] = json.loads(js_res.get("text") or "{}")
+            except Exception as e:
+                js_res["ok"] = False
+                js_res["error"] = f"bad json: {e}"
+        return js_res
+
+
 @dataclass
 class BlinkitSubCategoryContext:
     sidx: int
@@ -308,15 +453,28 @@ class BlinkitCategoryIterator:
         self.dump_root = get_dump_root(self.date_str)
         self.load_categories()
 
-    def load_categories(self) -> list[dict]:
+    def load_categories(self):
+        """Load categories of location from shared categ tree,
+        or from legacy per-location `categories.json`."""
+        self.categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+        if self.categ_tree.has_location(self.location):
+            self.categ_path = self.categ_tree.tree_path
+            self.categories = None
+            self.ctotal = self.categ_tree.count_categories(self.location)
+            return
         self.categ_path = get_categ_dump_path(
             date_str=self.date_str, location=self.location
         )
-        if not self.categ_path.exists():
-            return []
-        with open(self.categ_path, "r", encoding="utf-8") as rf:
-            categ_data = json.load(rf)
-        self.categories = categ_data.get("categories", []) or []
+        self.categories = []
+        if self.categ_path.exists():
+            categ_data = load_json(self.categ_path)
+            self.categories = categ_data.get("categories", []) or []
+        self.ctotal = len(self.categories)
+
+    def iter_categories(self):
+        if self.categories is None:
+            return self.categ_tree.iter_categories(self.location)
+        return iter(self.categories)
 
     def get_json_path(self, cid: int, sid: int) -> Path:
         cid_str = str(cid)
@@ -330,8 +488,8 @@ class BlinkitCategoryIterator:
         return f"https://blinkit.com/cn/{mark}/cid/{cid}/{sid}"
 
     def __iter__(self):
-        ctotal = len(self.categories)
-        for cidx, categ in enumerate(self.categories, start=1):
+        ctotal = self.ctotal
+        for cidx, categ in enumerate(self.iter_categories(), start=1):
             cname = categ.get("name", "")
             cid = categ.get("id", -1)
             sub_categs = categ.get("subCategories", []) or []
@@ -365,10 +523,32 @@ class BlinkitCategoryIterator:
             )
 
 
+# end reasons of lists truncated by failed pages
+FAILED_END_REASONS = ["http_429", "page_failed"]
+
+
+@dataclass
+class BlinkitListingState:
+    """Offset state of listing pages in one tab."""
+
+    last_offset: int = None
+    same_offset_count: int = 0
+    # explicit end-of-list marker of last scrape: short_page/same_offset/empty_page,
+    # or failure of a page, which truncates list: http_429/page_failed
+    end_reason: str = None
+
+    def reset(self):
+        self.last_offset = None
+        self.same_offset_count = 0
+
+
 class BlinkitCategoryScraper:
     LISTEN_INITIAL_TIMEOUT = 30
     LISTEN_POLL_INTERVAL = 0.5
     LISTEN_DRAIN_TIMEOUT = 0.5
+    # tabs stop after this many sub-categories, so browser is checked for
+    # recycling (rss and targets) between batches, while no tab is in use
+    RECYCLE_CHECK_CONTEXTS = 20
 
     def __init__(
         self,
@@ -376,19 +556,38 @@ class BlinkitCategoryScraper:
         switcher: BlinkitLocationSwitcher,
         date_str: str = None,
         location: str = None,
+        paginate_mode: PAGINATE_MODE = "scroll",
+        max_tabs: int = 3,
     ):
         self.client = client
         self.switcher = switcher
         self.date_str = norm_date_str(date_str)
         self.location = location
+        self.paginate_mode = paginate_mode
+        self.max_tabs = max(max_tabs, 1)
         self.extractor = BlinkitListingExtractor()
         self.scroller = BlinkitListingScroller()
-        self.last_offset: int = None
-        self.same_offset_count: int = 0
-
-    def reset_offset_state(self):
-        self.last_offset = None
-        self.same_offset_count = 0
+        self.paginator = BlinkitListingPaginator()
+        # own pacer, as gaps between subcategories are longer than between products
+        self.pacer = get_pacer(WEBSITE_NAME, interval=8, scope="traverser")
+        # pages fetched by paginator are paced apart, and shared by all tabs
+        self.page_pacer = get_pacer(WEBSITE_NAME, interval=0.5, scope="traverser_page")
+        self.index = TraverseIndex(get_index_path(self.date_str, self.location))
+        self.batch_lock = threading.Lock()
+        self.batch_count = 0
+
+    def count_page(self):
+        with self.batch_lock:
+            self.client.page_count += 1
+
+    def is_batch_done(self) -> bool:
+        # each batch takes at least one context, so it always makes progress
+        if self.batch_count == 0:
+            return False
+        recycle_pages = self.client.recycle_pages
+        return self.batch_count >= self.RECYCLE_CHECK_CONTEXTS or bool(
+            recycle_pages and self.client.page_count >= recycle_pages
+        )
 
     def extract_offset(self, packet_url: str) -> int:
         if not packet_url:
@@ -408,29 +607,33 @@ class BlinkitCategoryScraper:
             logger.warn(f"  × Failed to parse offset: {e}")
             return None
 
-    def is_listing_end(self, item_count: int, packet_url: str) -> bool:
+    def is_listing_end(
+        self, state: BlinkitListingState, item_count: int, packet_url: str
+    ) -> bool:
         if item_count < 15:
-            self.reset_offset_state()
+            state.reset()
+            state.end_reason = "short_page"
             return True
 
         offset = self.extract_offset(packet_url)
         if offset is None:
-            self.reset_offset_state()
+            state.reset()
             return False
 
-        if offset == self.last_offset:
-            self.same_offset_count += 1
+        if offset == state.last_offset:
+            state.same_offset_count += 1
         else:
-            self.last_offset = offset
-            self.same_offset_count = 1
+            state.last_offset = offset
+            state.same_offset_count = 1
 
-        if self.same_offset_count >= 3:
-            self.reset_offset_state()
+        if state.same_offset_count >= 3:
+            state.reset()
+            state.end_reason = "same_offset"
             return True
 
         return False
 
-    def collect_packets(self, tab: ChromiumTab, initial_wait: float) -> list:
+    def collect_packets(self, tab: "ChromiumTab", initial_wait: float) -> list:
         packets: list = []
         deadline = monotonic() + initial_wait
         while True:
@@ -448,21 +651,67 @@ class BlinkitCategoryScraper:
                 break
         return packets
 
-    def scrape(self, url: str) -> list:
-        tab = self.client.browser.latest_tab
+    def paginate(
+        self,
+        tab: "ChromiumTab",
+        contract: dict,
+        page_size: int,
+        state: BlinkitListingState,
+    ) -> list:
+        """Fetch remaining pages after the first one, until an empty page."""
+        products_data = []
+        limit = contract["limit"] or page_size
+        offset = contract["offset"]
+        for _ in range(self.paginator.MAX_PAGES):
+            offset += limit
+            self.page_pacer.wait()
+            page_res = self.paginator.fetch_page(tab, contract, offset)
+            self.count_page()
+            if page_res.get("status") == 429:
+                self.page_pacer.on_failure("http_429")
+                self.pacer.on_failure("http_429")
+                state.end_reason = "http_429"
+                break
+            if not page_res.get("ok"):
+                error = page_res.get("error") or page_res.get("status")
+                logger.warn(f"  × Failed to fetch page (offset={offset}): {error}")
+                self.page_pacer.on_failure("error")
+                state.end_reason = "page_failed"
+                break
+            self.page_pacer.on_success()
+            resp_data = self.extractor.extract(page_res.get("data"))
+            logger.okay(f"  + Listing page fetched: offset={offset}", end=" ")
+            logger.mesg(f"+ Extracted {len(resp_data)} items")
+            if not resp_data:
+                state.end_reason = "empty_page"
+                break
+            products_data.extend(resp_data)
+        else:
+            logger.warn(f"  × Reached max pages: {self.paginator.MAX_PAGES}")
+        return products_data
+
+    def scrape(
+        self, url: str, tab: "ChromiumTab" = None, state: BlinkitListingState = None
+    ) -> list:
+        tab = tab or self.client.browser.latest_tab
+        state = state or BlinkitListingState()
         listen_targets = [BLINKIT_LISTING_URL]
         tab.listen.start(targets=listen_targets)
         tab.set.load_mode.none()
         tab.get(url)
+        self.count_page()
 
         logger.mesg(f"  ✓ Title: {brk(tab.title)}")
+        if is_captcha_title(tab.title):
+            self.pacer.on_failure("captcha")
         logger.note(f"  > Listening targets:")
         for target in listen_targets:
             logger.file(f"    * {target}")
 
         products_data = []
         last_action = "navigate"
-        self.reset_offset_state()
+        state.reset()
+        state.end_reason = None
 
         while True:
             initial_wait = (
@@ -496,8 +745,18 @@ class BlinkitCategoryScraper:
                         item_count = len(resp_data)
                         logger.mesg(f"+ Extracted {item_count} items")
                         products_data.extend(resp_data)
+                        if self.paginate_mode == "fetch" and item_count > 0:
+                            contract = self.paginator.get_contract(packet)
+                            tab.listen.stop()
+                            tab.stop_loading()
+                            products_data.extend(
+                                self.paginate(
+                                    tab, contract, page_size=item_count, state=state
+                                )
+                            )
+                            return products_data
                         if self.is_listing_end(
-                            item_count=item_count, packet_url=packet_url
+                            state=state, item_count=item_count, packet_url=packet_url
                         ):
                             tab.stop_loading()
                             return products_data
@@ -513,6 +772,7 @@ class BlinkitCategoryScraper:
                 break
 
             scroll_res = self.scroller.scroll(tab)
+            self.count_page()
             last_action = "scroll"
             if not scroll_res:
                 logger.warn("  × Unable to scroll listing container")
@@ -525,23 +785,56 @@ class BlinkitCategoryScraper:
         with logger.temp_indent(2):
             logger.mesg(f"  ✓ Skip existed json: {logstr.file(brk(json_path))}")
 
-    def save_json(self, data: list[dict], save_path: Path):
+    def save_json(self, data: list[dict], save_path: Path) -> str:
+        """Return checksum of saved json."""
         items = dict_get(data, "products", [])
         logger.okay(f"  ✓ Save {len(items)} items to:", end=" ")
         save_path.parent.mkdir(parents=True, exist_ok=True)
+        json_str = json.dumps(data, ensure_ascii=False, indent=4)
         with open(save_path, "w", encoding="utf-8") as wf:
-            json.dump(data, wf, ensure_ascii=False, indent=4)
+            wf.write(json_str)
         logger.okay(f"{brk(save_path)}")
+        return get_checksum(json_str)
+
+    def is_count_complete(self, items_count: int, end_reason: str = None) -> bool:
+        # list truncated by failed page is incomplete, and re-scraped
+        if end_reason in FAILED_END_REASONS:
+            return False
+        # without explicit end marker, 15x items count may be incomplete
+        if end_reason:
+            return True
+        return not (items_count > 0 and items_count % 15 == 0)
+
+    def update_index(
+        self,
+        json_path: Path,
+        items_count: int,
+        end_reason: str = None,
+        checksum: str = None,
+    ):
+        self.index.update(
+            json_path,
+            count=items_count,
+            complete=self.is_count_complete(items_count, end_reason),
+            end_reason=end_reason,
+            checksum=checksum,
+        )
 
     def check_json_status(
         self, json_path: Path
-    ) -> Literal["not_exists", "incomplete", "exists"]:
+    ) -> Literal["not_exists", "failed", "incomplete", "exists"]:
         if not json_path.exists():
             return "not_exists"
-        json_data = load_json(json_path)
-        products = dict_get(json_data, "products", []) or []
-        items_count = len(products)
-        if items_count > 0 and items_count % 15 == 0:
+        entry = self.index.get_entry(json_path)
+        if entry is None:
+            # json saved before index existed or modified outside: load and backfill
+            json_data = load_json(json_path)
+            products = dict_get(json_data, "products", []) or []
+            self.update_index(json_path, items_count=len(products))
+            entry = self.index.get_entry(json_path)
+        if entry.get("end_reason") in FAILED_END_REASONS:
+            return "failed"
+        if not entry["complete"]:
             return "incomplete"
         return "exists"
 
@@ -563,45 +856,128 @@ class BlinkitCategoryScraper:
         }
         return save_data
 
+    @timed("process_context", site=WEBSITE_NAME)
     def process_context(
-        self, cctx: BlinkitCategoryContext, sctx: BlinkitSubCategoryContext
+        self,
+        cctx: BlinkitCategoryContext,
+        sctx: BlinkitSubCategoryContext,
+        tab: "ChromiumTab" = None,
+        state: BlinkitListingState = None,
     ):
+        state = state or BlinkitListingState()
         with logger.temp_indent(2):
-            products_data = self.scrape(sctx.url)
+            products_data = self.scrape(sctx.url, tab=tab, state=state)
+            is_failed = state.end_reason in FAILED_END_REASONS
+            if not products_data:
+                self.pacer.on_failure("empty")
+            elif not is_failed:
+                self.pacer.on_success()
             save_data = self.construct_save_data(
                 cctx=cctx, sctx=sctx, products_data=products_data
             )
-            self.save_json(save_data, sctx.json_path)
+            checksum = self.save_json(save_data, sctx.json_path)
+            self.update_index(
+                sctx.json_path,
+                items_count=len(products_data),
+                end_reason=state.end_reason,
+                checksum=checksum,
+            )
+            incr("listing_products", len(products_data))
+            is_done = products_data and not is_failed
+            incr("subcategories", status="done" if is_done else "failed")
 
-    def wait_next(self, seconds: int = 8):
-        logger.note(f"  > Waiting {seconds}s for next ...")
-        sleep(seconds)
+    def wait_next(self):
+        self.pacer.wait()
 
-    def run(self, location: str = None, location_idx: int = 0):
-        self.location = location or self.location
-        iterator = BlinkitCategoryIterator(
-            date_str=self.date_str, location=self.location
-        )
-        self.client.start_client()
+    def get_todo_contexts(
+        self, iterator: BlinkitCategoryIterator
+    ) -> list[tuple[BlinkitCategoryContext, BlinkitSubCategoryContext]]:
+        todo_contexts = []
         for cctx in iterator:
-            cctx.log_info()
             for sctx in cctx.sctxs:
-                json_path = sctx.json_path
-                json_status = self.check_json_status(json_path)
+                json_status = self.check_json_status(sctx.json_path)
                 if json_status == "exists":
-                    # self.skip_json(json_path)
+                    # self.skip_json(sctx.json_path)
+                    incr("subcategories", status="skipped")
                     continue
                 if json_status == "incomplete":
                     # logger.warn(f"  ? Items count is 15x, may be incomplete")
                     # raise_breakpoint()
                     continue
+                # not_exists or failed: scrape and save
+                todo_contexts.append((cctx, sctx))
+        return todo_contexts
+
+    def open_tabs(self, count: int) -> list["ChromiumTab"]:
+        tabs = [self.client.browser.latest_tab]
+        for _ in range(count - 1):
+            tabs.append(self.client.browser.new_tab())
+        return tabs
+
+    def close_tabs(self, tabs: list["ChromiumTab"]):
+        for tab in tabs[1:]:
+            try:
+                tab.close()
+            except Exception as e:
+                logger.warn(f"  × Failed to close tab: {e}")
+
+    def run_worker(self, tab: "ChromiumTab", todo_queue: queue.Queue):
+        """Process contexts from shared queue in one tab, with its own listener,
+        until queue is empty or batch is done."""
+        set_labels(site=WEBSITE_NAME, location=self.location)
+        state = BlinkitListingState()
+        while True:
+            with self.batch_lock:
+                if self.is_batch_done():
+                    break
+                try:
+                    cctx, sctx = todo_queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.batch_count += 1
+            try:
+                self.wait_next()
                 sctx.log_info()
-                # not_exists/incomplete: scrape and save
-                if not self.switcher.is_at_idx(location_idx):
-                    self.switcher.set_location(location_idx)
-                self.process_context(cctx=cctx, sctx=sctx)
-                self.wait_next(8)
-                # raise_breakpoint()
+                self.process_context(cctx=cctx, sctx=sctx, tab=tab, state=state)
+            except Exception as e:
+                logger.warn(f"  × Failed to process {sctx.idx_label_str()}: {e}")
+            finally:
+                todo_queue.task_done()
+        tab.listen.stop()
+
+    def run(self, location: str = None, location_idx: int = 0):
+        self.location = location or self.location
+        iterator = BlinkitCategoryIterator(
+            date_str=self.date_str, location=self.location
+        )
+        self.index = TraverseIndex(get_index_path(self.date_str, self.location))
+        todo_contexts = self.get_todo_contexts(iterator)
+        self.index.flush()
+        if not todo_contexts:
+            return
+        logger.note(f"> Sub-categories to scrape: {logstr.mesg(len(todo_contexts))}")
+        if not self.switcher.is_at_idx(location_idx):
+            self.switcher.set_location(location_idx)
+        todo_queue = queue.Queue()
+        for cctx, sctx in todo_contexts:
+            todo_queue.put((cctx, sctx))
+        while not todo_queue.empty():
+            # browser is recycled between batches if over thresholds,
+            # and `on_recycle` restores location
+            self.client.start_client()
+            self.batch_count = 0
+            # tabs share cookies of the location-pinned browser
+            tabs = self.open_tabs(min(self.max_tabs, todo_queue.qsize()))
+            workers = [
+                threading.Thread(target=self.run_worker, args=(tab, todo_queue))
+                for tab in tabs
+            ]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            self.close_tabs(tabs)
+            self.index.flush()
         self.client.stop_client()
 
 
@@ -612,6 +988,8 @@ class BlinkitTraverser:
         date_str: str = None,
         client_settings: dict = None,
         locations: list = None,
+        paginate_mode: PAGINATE_MODE = "scroll",
+        max_tabs: int = 3,
     ):
         self.skip_exists = skip_exists
         self.date_str = norm_date_str(date_str)
@@ -622,22 +1000,36 @@ class BlinkitTraverser:
         self.switcher = BlinkitLocationSwitcher(
             client_settings=self.client_settings, locations=self.locations
         )
+        self.client.on_recycle = self.restore_location
         self.fetcher = BlinkitCategoriesFetcher(
             client=self.client, date_str=self.date_str
         )
         self.scraper = BlinkitCategoryScraper(
-            client=self.client, switcher=self.switcher, date_str=self.date_str
+            client=self.client,
+            switcher=self.switcher,
+            date_str=self.date_str,
+            paginate_mode=paginate_mode,
+            max_tabs=max_tabs,
         )
 
+    def restore_location(self, client: BrowserClient):
+        """Relaunch recycled browser by switcher, and set its location again."""
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
+
     def run(self):
         for location_idx, location_item in enumerate(self.locations[:]):
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             location_text = location_item.get("text", "")
             self.fetcher.location = location_name
             logger.hint(f"> Location: {location_name} - {location_text}")
             categ_path = get_categ_dump_path(
                 date_str=self.date_str, location=location_name
             )
+            categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+            if categ_tree.has_location(location_name):
+                categ_path = categ_tree.tree_path
             if self.skip_exists and categ_path.exists():
                 logger.mesg(
                     f"> Skip fetch existed categories: {logstr.file(brk(categ_path))}"
@@ -671,6 +1063,7 @@ class BlinkitSummarizer:
         self.date_str = norm_date_str(date_str)
         self.locations = locations or BLINKIT_LOCATIONS
         self.summary_root = get_summary_root(self.date_str)
+        self.row_cache = RowCache(self.summary_root / "row_cache.parquet")
 
     def product_dict_to_row(self, product: dict) -> dict:
         if product.get("product_id") is None and product.get("product_name") is None:
@@ -686,8 +1079,15 @@ class BlinkitSummarizer:
         row["product_link"] = product_link
         return row
 
-    def categ_dict_to_row(self, data: dict) -> dict:
-        return {col: data.get(col, None) for col in CATEG_COLUMNS}
+    def categ_ctx_to_row(self, sctx: BlinkitSubCategoryContext) -> dict:
+        # join with categ tree, instead of reading categ info from each json
+        return {
+            "categ": sctx.cname,
+            "sub_categ": sctx.sname,
+            "url": sctx.url,
+            "cid": sctx.cid,
+            "sid": sctx.sid,
+        }
 
     def get_rows_from_context(
         self, sctx: BlinkitSubCategoryContext, location: str
@@ -697,7 +1097,7 @@ class BlinkitSummarizer:
             logger.warn(f"  × JSON not exists: {logstr.file(brk(json_path))}")
             return []
         json_data = load_json(json_path)
-        categ_row = self.categ_dict_to_row(json_data)
+        categ_row = self.categ_ctx_to_row(sctx)
         products = dict_get(json_data, "products", []) or []
         product_rows = [self.product_dict_to_row(product) for product in products]
         rows = []
@@ -713,7 +1113,9 @@ class BlinkitSummarizer:
             rows.append(row)
         return rows
 
-    def rows_to_df(self, rows: list[dict]) -> pd.DataFrame:
+    def rows_to_df(self, rows: list[dict]) -> "pd.DataFrame":
+        import pandas as pd
+
         df = pd.DataFrame(rows)
         for col in DF_INT_COLUMNS:
             if col not in df.columns:
@@ -728,7 +1130,7 @@ class BlinkitSummarizer:
     def get_xlsx_sheet_name(self, location: str) -> tuple[Path, str]:
         return f"{self.date_str}_{WEBSITE_NAME}_{location}"
 
-    def save_df_to_xlsx(self, df: pd.DataFrame, location: str):
+    def save_df_to_xlsx(self, df: "pd.DataFrame", location: str):
         sheet_name = self.get_xlsx_sheet_name(location)
         xlsx_name = f"summary_{sheet_name}.xlsx"
         xlsx_path = self.summary_root / xlsx_name
@@ -737,10 +1139,15 @@ class BlinkitSummarizer:
         df.to_excel(xlsx_path, sheet_name=sheet_name, index=False, engine="openpyxl")
         logger.okay(f"  * {brk(xlsx_path)}")
 
-    def save_dfs_to_xlsx(self, df_locs: list[tuple[pd.DataFrame, str]]):
+    def get_combined_xlsx_path(self) -> Path:
         xlsx_name = f"summary_{self.date_str}_{WEBSITE_NAME}.xlsx"
-        xlsx_root = self.summary_root.parent
-        xlsx_path = xlsx_root / xlsx_name
+        return self.summary_root.parent / xlsx_name
+
+    @timed("dump_excel", site=WEBSITE_NAME)
+    def save_dfs_to_xlsx(self, df_locs: "list[tuple[pd.DataFrame, str]]"):
+        import pandas as pd
+
+        xlsx_path = self.get_combined_xlsx_path()
         logger.note(f"> Save combined summary to xslx:")
         with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
             for df, location in df_locs:
@@ -751,7 +1158,7 @@ class BlinkitSummarizer:
         logger.okay(f"  * {brk(xlsx_path)}")
 
     def run(self):
-        df_locs: list[tuple[pd.DataFrame, str]] = []
+        rows_locs: list[tuple[list[dict], str]] = []
         for location_idx, location_item in enumerate(self.locations[:]):
             location = location_item.get("name", "")
             location_text = location_item.get("text", "")
@@ -762,34 +1169,63 @@ class BlinkitSummarizer:
             rows: list[dict] = []
             for cctx in iterator:
                 for sctx in cctx.sctxs:
-                    sctx_rows = self.get_rows_from_context(sctx=sctx, location=location)
+                    sctx_rows = self.row_cache.get_rows(
+                        sctx.json_path,
+                        lambda: self.get_rows_from_context(
+                            sctx=sctx, location=location
+                        ),
+                    )
                     rows.extend(sctx_rows)
-            df = self.rows_to_df(rows)
-            df_locs.append((df, location))
+            rows_locs.append((rows, location))
+
+        self.row_cache.prune()
+        if not self.row_cache.is_changed() and self.get_combined_xlsx_path().exists():
+            logger.okay(f"> Skip summary, as no traversal json changed")
+            self.row_cache.save()
+            return
 
+        df_locs = [(self.rows_to_df(rows), location) for rows, location in rows_locs]
         for df, location in df_locs:
             self.save_df_to_xlsx(df, location)
         self.save_dfs_to_xlsx(df_locs)
+        self.row_cache.save()
 
 
 def main(args: argparse.Namespace):
-    if args.traverse:
-        traverser = BlinkitTraverser(skip_exists=True, date_str=args.date)
-        traverser.run()
+    exporter = PromTextfileExporter(job=f"{WEBSITE_NAME}_traverser")
+    exporter.start()
+    try:
+        if args.traverse:
+            traverser = BlinkitTraverser(
+                skip_exists=True,
+                date_str=args.date,
+                paginate_mode=args.paginate_mode,
+                max_tabs=args.max_tabs,
+            )
+            traverser.run()
 
-    if args.summarize:
-        summarizer = BlinkitSummarizer(date_str=args.date)
-        summarizer.run()
+        if args.summarize:
+            summarizer = BlinkitSummarizer(date_str=args.date)
+            summarizer.run()
+    finally:
+        dump_summary(get_dump_root(args.date))
+        exporter.stop()
 
 
 if __name__ == "__main__":
-    arg_parser = TraverserArgParser()
+    arg_parser = BlinkitTraverserArgParser()
     args = arg_parser.parse_args()
-    with Runtimer():
+    with Runtimer(), profile_from_args(args):
         main(args)
 
     # Case 1: traverse, scrape, save
     # python -m web.blinkit.traverser -s
 
-    # Case 2: summarize
+    # Case 2: traverse with direct pagination requests, instead of scrolling
+    # python -m web.blinkit.traverser -s -m fetch
+
+    # Case 3: traverse with 4 tabs concurrently
+    # python -m web.blinkit.traverser -s -j 4
+
+    # Case 4: summarize
     # python -m web.blinkit.traverser -e
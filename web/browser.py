@@ -1,9 +1,14 @@
-from DrissionPage import Chromium, ChromiumOptions
-from pyvirtualdisplay import Display
+import psutil
+
 from tclogger import logger, dict_to_str
-from typing import Union, TypedDict, Optional
+from typing import Callable, Union, TypedDict, Optional
+
+from configs.envs import CHROME_USER_DATA_DIR, BROWSER_RECYCLE_SETTINGS
+from web.instrument import INSTRUMENT, span, set_gauge, incr
 
-from configs.envs import CHROME_USER_DATA_DIR
+HEADLESS_MODE = "new"
+# default screen size of pyvirtualdisplay
+HEADLESS_WINDOW_SIZE = "1024,768"
 
 
 class BrowserSettingType(TypedDict):
@@ -11,6 +16,11 @@ class BrowserSettingType(TypedDict):
     port: Optional[Union[int, str]]
     proxy: Optional[str]
     use_virtual_display: Optional[bool]
+    arguments: Optional[list[str]]
+    headless: Optional[Union[bool, str]]
+    recycle_rss_mb: Optional[float]
+    recycle_targets: Optional[int]
+    recycle_pages: Optional[int]
 
 
 class BrowserClient:
@@ -20,16 +30,39 @@ class BrowserClient:
         port: Union[int, str] = None,
         proxy: str = None,
         use_virtual_display: bool = False,
+        arguments: list[str] = None,
+        headless: Union[bool, str] = False,
+        recycle_rss_mb: float = None,
+        recycle_targets: int = None,
+        recycle_pages: int = None,
+        on_recycle: Callable[["BrowserClient"], None] = None,
     ):
+        """Browser is recycled (closed and relaunched with same profile) when
+        starting client past any threshold of `recycle_*`, which default to
+        `browser_recycle_settings` (`rss_mb`, `targets`, `pages`) in secrets."""
         self.use_virtual_display = use_virtual_display
+        self.arguments = arguments or []
+        self.headless = HEADLESS_MODE if headless is True else headless
         self.proxy = proxy
         self.port = port
         self.uid = uid
+        self.recycle_rss_mb = recycle_rss_mb or BROWSER_RECYCLE_SETTINGS.get("rss_mb")
+        self.recycle_targets = recycle_targets or BROWSER_RECYCLE_SETTINGS.get(
+            "targets"
+        )
+        self.recycle_pages = recycle_pages or BROWSER_RECYCLE_SETTINGS.get("pages")
+        self.on_recycle = on_recycle
+        self.page_count = 0
         self.is_using_virtual_display = False
         self.is_browser_opened = False
 
     def open_virtual_display(self):
+        # headless browser needs no X server
+        if self.headless:
+            return
         if self.use_virtual_display and not self.is_using_virtual_display:
+            from pyvirtualdisplay import Display
+
             self.display = Display()
             self.display.start()
             self.is_using_virtual_display = True
@@ -41,7 +74,13 @@ class BrowserClient:
 
     def open_browser(self):
         if self.is_browser_opened:
-            return
+            if self.browser.states.is_alive:
+                return
+            # closed by another client on same port (recycled), or crashed
+            INSTRUMENT.remove_sampler(self.sample_usage)
+            self.is_browser_opened = False
+        from DrissionPage import Chromium, ChromiumOptions
+
         logger.note("> Opening browser ...")
         info_dict = {}
         chrome_options = ChromiumOptions()
@@ -55,24 +94,97 @@ class BrowserClient:
         if self.proxy:
             chrome_options.set_proxy(self.proxy)
             info_dict["proxy"] = self.proxy
+        if self.headless:
+            chrome_options.set_argument("--headless", self.headless)
+            # same viewport as virtual display, so screenshots match templates
+            if not any(arg.startswith("--window-size") for arg in self.arguments):
+                chrome_options.set_argument("--window-size", HEADLESS_WINDOW_SIZE)
+            info_dict["headless"] = self.headless
+        for argument in self.arguments:
+            chrome_options.set_argument(argument)
+        if self.arguments:
+            info_dict["arguments"] = self.arguments
         if info_dict:
             logger.mesg(dict_to_str(info_dict), indent=2)
         self.chrome_options = chrome_options
-        self.browser = Chromium(addr_or_opts=self.chrome_options)
+        with span("browser_open"):
+            self.browser = Chromium(addr_or_opts=self.chrome_options)
         self.is_browser_opened = True
+        INSTRUMENT.add_sampler(self.sample_usage)
+
+    def get_rss(self) -> int:
+        """RSS bytes of browser process and its children (renderers, gpu, ...)."""
+        process = psutil.Process(self.browser.process_id)
+        processes = [process, *process.children(recursive=True)]
+        rss = 0
+        for proc in processes:
+            try:
+                rss += proc.memory_info().rss
+            except psutil.Error:
+                continue
+        return rss
+
+    def get_target_count(self) -> int:
+        """Open page targets, which are leaked by tabs never closed."""
+        return self.browser.tabs_count
+
+    def sample_usage(self):
+        if not self.is_browser_opened:
+            return
+        browser_label = str(self.uid or self.port or "default")
+        set_gauge("browser_rss_bytes", self.get_rss(), browser=browser_label)
+        set_gauge("browser_targets", self.get_target_count(), browser=browser_label)
+        set_gauge("browser_pages", self.page_count, browser=browser_label)
 
-    def close_browser(self):
+    def get_recycle_reason(self) -> str:
+        # freshly opened browser is never recycled, even if over thresholds
+        if self.page_count == 0:
+            return None
+        if self.recycle_pages and self.page_count >= self.recycle_pages:
+            return "pages"
+        if self.recycle_rss_mb:
+            rss_mb = self.get_rss() / 1024 / 1024
+            if rss_mb >= self.recycle_rss_mb:
+                return "rss"
+        if self.recycle_targets:
+            if self.get_target_count() >= self.recycle_targets:
+                return "targets"
+        return None
+
+    def recycle(self, reason: str = None):
+        """`on_recycle` is called after browser is closed and before it is
+        reopened, so callback could relaunch it by another client (such as
+        switcher with proxy) and restore location."""
+        logger.warn(f"> Recycling browser after {self.page_count} pages: {reason}")
+        incr("browser_recycles", reason=reason)
+        self.close_browser(force=True)
+        self.page_count = 0
+        if self.on_recycle:
+            self.on_recycle(self)
+        self.open_browser()
+
+    def close_browser(self, force: bool = False):
         if hasattr(self, "browser") and self.is_browser_opened:
             logger.note(f"> Closing browser ...")
+            INSTRUMENT.remove_sampler(self.sample_usage)
             try:
-                self.browser.quit()
+                self.browser.quit(force=force)
             except Exception as e:
                 logger.warn(f"× BrowserClient.close_browser: {e}")
             self.is_browser_opened = False
 
     def start_client(self):
+        """Each start is counted as one page, and checked for recycling before."""
         self.open_virtual_display()
         self.open_browser()
+        try:
+            reason = self.get_recycle_reason()
+        except Exception as e:
+            logger.warn(f"× BrowserClient.get_recycle_reason: {e}")
+            reason = None
+        if reason:
+            self.recycle(reason)
+        self.page_count += 1
 
     def stop_client(self, close_browser: bool = False):
         if close_browser:
@@ -80,7 +192,7 @@ class BrowserClient:
         self.close_virtual_display()
 
     def close_other_tabs(self, create_new_tab: bool = True):
-        if hasattr(self, "browser") and isinstance(self.browser, Chromium):
+        if hasattr(self, "browser") and self.is_browser_opened:
             if create_new_tab:
                 self.browser.new_tab()
             self.browser.latest_tab.close(others=True)
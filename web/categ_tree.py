@@ -0,0 +1,185 @@
+import copy
+import json
+import os
+import threading
+
+from pathlib import Path
+from tclogger import logger, logstr, brk
+from typing import Iterator
+
+from configs.envs import DATA_ROOT, WEBSITE_LITERAL
+from web.constants import norm_date_str
+
+
+def get_categ_tree_path(website: WEBSITE_LITERAL, date_str: str = None) -> Path:
+    return (
+        DATA_ROOT / "traverses" / norm_date_str(date_str) / website / "categ_tree.json"
+    )
+
+
+def get_categ_key(cid, sid=None) -> str:
+    if sid is None:
+        return str(cid)
+    return f"{cid}/{sid}"
+
+
+class CategoryTree:
+    """Canonical category tree of one website in one date, shared by locations.
+
+    ```json
+    {
+        "categories": [{"id": ..., "name": ..., "subCategories": [...]}, ...],
+        "locations": {
+            "<location>": {
+                "missing": ["<cid>", "<cid>/<sid>", ...],
+                "overrides": {"<cid>/<sid>": {...}},
+                "cookies": {...}
+            }
+        }
+    }
+    ```
+
+    Canonical tree is the union of categories of all locations, and each location
+    only stores its delta: missing keys, and items which differ from canonical ones.
+    """
+
+    def __init__(self, website: WEBSITE_LITERAL, date_str: str = None):
+        self.website = website
+        self.date_str = norm_date_str(date_str)
+        self.tree_path = get_categ_tree_path(website, self.date_str)
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        self.categories: list[dict] = []
+        self.locations: dict[str, dict] = {}
+        if not self.tree_path.exists():
+            return
+        with open(self.tree_path, "r", encoding="utf-8") as rf:
+            data = json.load(rf)
+        self.categories = data.get("categories", []) or []
+        self.locations = data.get("locations", {}) or {}
+
+    def save(self):
+        self.tree_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.tree_path.with_suffix(".json.tmp")
+        data = {"categories": self.categories, "locations": self.locations}
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            json.dump(data, wf, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.tree_path)
+
+    def has_location(self, location: str) -> bool:
+        return location in self.locations
+
+    def get_categ_info(self, categ: dict) -> dict:
+        return {k: v for k, v in categ.items() if k != "subCategories"}
+
+    def get_keys(self, categories: list[dict]) -> list[str]:
+        keys = []
+        for categ in categories:
+            cid = categ.get("id")
+            keys.append(get_categ_key(cid))
+            for sub_categ in categ.get("subCategories", []) or []:
+                keys.append(get_categ_key(cid, sub_categ.get("id")))
+        return keys
+
+    def merge(self, categories: list[dict]) -> list[str]:
+        """Merge categories into canonical tree, and return keys of new items."""
+        new_keys = []
+        canon_categs = {get_categ_key(c.get("id")): c for c in self.categories}
+        for categ in categories:
+            cid = categ.get("id")
+            ckey = get_categ_key(cid)
+            if ckey not in canon_categs:
+                canon_categ = copy.deepcopy(categ)
+                self.categories.append(canon_categ)
+                canon_categs[ckey] = canon_categ
+                new_keys.extend(self.get_keys([canon_categ]))
+                continue
+            canon_subs = canon_categs[ckey].setdefault("subCategories", [])
+            canon_sids = {sub.get("id") for sub in canon_subs}
+            for sub_categ in categ.get("subCategories", []) or []:
+                if sub_categ.get("id") not in canon_sids:
+                    canon_subs.append(copy.deepcopy(sub_categ))
+                    new_keys.append(get_categ_key(cid, sub_categ.get("id")))
+        return new_keys
+
+    def get_overrides(self, categories: list[dict]) -> dict[str, dict]:
+        overrides = {}
+        canon_items = dict(self.iter_items(self.categories))
+        for key, item in self.iter_items(categories):
+            if canon_items.get(key) != item:
+                overrides[key] = item
+        return overrides
+
+    def iter_items(self, categories: list[dict]) -> Iterator[tuple[str, dict]]:
+        """Yield (key, item), where item of category excludes its subCategories."""
+        for categ in categories:
+            cid = categ.get("id")
+            yield get_categ_key(cid), self.get_categ_info(categ)
+            for sub_categ in categ.get("subCategories", []) or []:
+                yield get_categ_key(cid, sub_categ.get("id")), sub_categ
+
+    def add_location(self, location: str, categ_data: dict):
+        categories = categ_data.get("categories", []) or []
+        with self.lock:
+            new_keys = self.merge(categories)
+            # items new to canonical tree are missing in other locations
+            for other_location, delta in self.locations.items():
+                if other_location != location:
+                    delta["missing"].extend(new_keys)
+            location_keys = set(self.get_keys(categories))
+            self.locations[location] = {
+                "missing": [
+                    key
+                    for key in self.get_keys(self.categories)
+                    if key not in location_keys
+                ],
+                "overrides": self.get_overrides(categories),
+                "cookies": categ_data.get("cookies", {}),
+            }
+            self.save()
+        delta = self.locations[location]
+        logger.okay(
+            f"  ✓ Categories of {logstr.mesg(brk(location))} merged: "
+            f"canonical={len(self.categories)}, missing={len(delta['missing'])}, "
+            f"overrides={len(delta['overrides'])}"
+        )
+
+    def count_categories(self, location: str) -> int:
+        missing = set(self.locations.get(location, {}).get("missing", []))
+        return sum(
+            get_categ_key(categ.get("id")) not in missing for categ in self.categories
+        )
+
+    def iter_categories(self, location: str) -> Iterator[dict]:
+        """Lazily yield categories available in location, with overrides applied."""
+        delta = self.locations.get(location, {})
+        missing = set(delta.get("missing", []))
+        overrides = delta.get("overrides", {})
+        for categ in self.categories:
+            cid = categ.get("id")
+            ckey = get_categ_key(cid)
+            if ckey in missing:
+                continue
+            sub_categs = []
+            for sub_categ in categ.get("subCategories", []) or []:
+                skey = get_categ_key(cid, sub_categ.get("id"))
+                if skey in missing:
+                    continue
+                sub_categs.append(overrides.get(skey, sub_categ))
+            categ_info = overrides.get(ckey, self.get_categ_info(categ))
+            yield {**categ_info, "subCategories": sub_categs}
+
+
+CATEG_TREES: dict[str, tuple[int, CategoryTree]] = {}
+
+
+def get_categ_tree(website: WEBSITE_LITERAL, date_str: str = None) -> CategoryTree:
+    """Get tree shared in process, and reload it only if its file is changed."""
+    tree_path = get_categ_tree_path(website, date_str)
+    mtime = tree_path.stat().st_mtime_ns if tree_path.exists() else None
+    key = str(tree_path)
+    if key not in CATEG_TREES or CATEG_TREES[key][0] != mtime:
+        CATEG_TREES[key] = (mtime, CategoryTree(website, date_str))
+    return CATEG_TREES[key][1]
@@ -0,0 +1,332 @@
+import asyncio
+import base64
+import json
+import os
+import struct
+import urllib.request
+
+from tclogger import logger
+from typing import Callable
+from urllib.parse import urlparse
+
+# websocket opcodes of RFC 6455
+WS_CONTINUATION, WS_TEXT, WS_BINARY = 0x0, 0x1, 0x2
+WS_CLOSE, WS_PING, WS_PONG = 0x8, 0x9, 0xA
+CDP_TIMEOUT = 30
+
+
+def get_browser_ws_url(address: str) -> str:
+    """Websocket url of browser, such as `ws://127.0.0.1:9301/devtools/browser/<id>`."""
+    with urllib.request.urlopen(f"http://{address}/json/version", timeout=10) as res:
+        return json.loads(res.read())["webSocketDebuggerUrl"]
+
+
+class CDPConnection:
+    """Async client of Chrome DevTools Protocol on one websocket of browser.
+
+    Pages are attached as flat sessions of the same websocket, so one event loop
+    drives many tabs without a thread per tab. Events of each session are put
+    into the queue registered by `subscribe`.
+    """
+
+    def __init__(self, ws_url: str, timeout: float = CDP_TIMEOUT):
+        self.ws_url = ws_url
+        self.timeout = timeout
+        self.reader: asyncio.StreamReader = None
+        self.writer: asyncio.StreamWriter = None
+        self.msg_id = 0
+        self.pendings: dict[int, asyncio.Future] = {}
+        self.subscribers: dict[str, asyncio.Queue] = {}
+        self.recv_task: asyncio.Task = None
+        self.write_lock = asyncio.Lock()
+
+    @classmethod
+    async def from_address(cls, address: str, **kwargs) -> "CDPConnection":
+        ws_url = await asyncio.to_thread(get_browser_ws_url, address)
+        conn = cls(ws_url, **kwargs)
+        await conn.connect()
+        return conn
+
+    async def connect(self):
+        url = urlparse(self.ws_url)
+        # json of large responses (such as page html) exceeds default 64 KiB
+        self.reader, self.writer = await asyncio.open_connection(
+            url.hostname, url.port or 80, limit=2**24
+        )
+        key = base64.b64encode(os.urandom(16)).decode()
+        handshake = (
+            f"GET {url.path} HTTP/1.1\r\n"
+            f"Host: {url.netloc}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        )
+        self.writer.write(handshake.encode())
+        await self.writer.drain()
+        res_head = await self.reader.readuntil(b"\r\n\r\n")
+        status_line = res_head.split(b"\r\n", 1)[0].decode()
+        if " 101 " not in f"{status_line} ":
+            raise RuntimeError(f"CDP handshake failed: {status_line}")
+        self.recv_task = asyncio.create_task(self.recv_loop())
+
+    async def write_frame(self, opcode: int, payload: bytes):
+        """Client frames are masked, as required by RFC 6455."""
+        header = bytes([0x80 | opcode])
+        length = len(payload)
+        if length < 126:
+            header += bytes([0x80 | length])
+        elif length < 2**16:
+            header += bytes([0x80 | 126]) + struct.pack("!H", length)
+        else:
+            header += bytes([0x80 | 127]) + struct.pack("!Q", length)
+        mask = os.urandom(4)
+        masked = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        async with self.write_lock:
+            self.writer.write(header + mask + masked)
+            await self.writer.drain()
+
+    async def read_frame(self) -> tuple[bool, int, bytes]:
+        head = await self.reader.readexactly(2)
+        fin, opcode = bool(head[0] & 0x80), head[0] & 0x0F
+        is_masked, length = bool(head[1] & 0x80), head[1] & 0x7F
+        if length == 126:
+            (length,) = struct.unpack("!H", await self.reader.readexactly(2))
+        elif length == 127:
+            (length,) = struct.unpack("!Q", await self.reader.readexactly(8))
+        mask = await self.reader.readexactly(4) if is_masked else None
+        payload = await self.reader.readexactly(length)
+        if mask:
+            payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+        return fin, opcode, payload
+
+    async def read_message(self) -> str:
+        """Text of next message, with fragments joined and control frames handled."""
+        chunks: list[bytes] = []
+        while True:
+            fin, opcode, payload = await self.read_frame()
+            if opcode == WS_PING:
+                await self.write_frame(WS_PONG, payload)
+                continue
+            if opcode == WS_PONG:
+                continue
+            if opcode == WS_CLOSE:
+                raise ConnectionError("CDP websocket closed by browser")
+            chunks.append(payload)
+            if fin:
+                return b"".join(chunks).decode("utf-8")
+
+    async def recv_loop(self):
+        try:
+            while True:
+                msg = json.loads(await self.read_message())
+                if "id" in msg:
+                    future = self.pendings.pop(msg["id"], None)
+                    if future and not future.done():
+                        future.set_result(msg)
+                    continue
+                queue = self.subscribers.get(msg.get("sessionId"))
+                if queue is not None:
+                    queue.put_nowait(msg)
+        except (asyncio.IncompleteReadError, ConnectionError) as e:
+            error = e
+        except asyncio.CancelledError:
+            error = ConnectionError("CDP connection closed")
+        except Exception as e:
+            logger.warn(f"× CDPConnection.recv_loop: {e}")
+            error = e
+        for future in self.pendings.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"CDP connection lost: {error}"))
+        self.pendings.clear()
+
+    async def send(
+        self, method: str, session_id: str = None, timeout: float = None, **params
+    ) -> dict:
+        """Send command, and return its result. Raise RuntimeError on CDP error."""
+        if self.recv_task is None or self.recv_task.done():
+            raise ConnectionError("CDP connection is not open")
+        self.msg_id += 1
+        msg = {"id": self.msg_id, "method": method, "params": params}
+        if session_id:
+            msg["sessionId"] = session_id
+        future = asyncio.get_running_loop().create_future()
+        self.pendings[self.msg_id] = future
+        await self.write_frame(WS_TEXT, json.dumps(msg).encode("utf-8"))
+        try:
+            res = await asyncio.wait_for(future, timeout or self.timeout)
+        finally:
+            self.pendings.pop(msg["id"], None)
+        if "error" in res:
+            raise RuntimeError(f"CDP {method}: {res['error'].get('message')}")
+        return res.get("result", {})
+
+    def subscribe(self, session_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers[session_id] = queue
+        return queue
+
+    def unsubscribe(self, session_id: str):
+        self.subscribers.pop(session_id, None)
+
+    async def close(self):
+        if self.recv_task:
+            self.recv_task.cancel()
+            try:
+                await self.recv_task
+            except asyncio.CancelledError:
+                pass
+        if self.writer:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except Exception:
+                pass
+
+
+class CDPTab:
+    """Page target attached to `CDPConnection`, with async waits on its events.
+
+    Events not matched by a wait are kept in backlog until next `navigate`, so
+    a response which arrives before DOM is ready is not lost.
+    """
+
+    def __init__(self, conn: CDPConnection, target_id: str, session_id: str):
+        self.conn = conn
+        self.target_id = target_id
+        self.session_id = session_id
+        self.events = conn.subscribe(session_id)
+        self.backlog: list[dict] = []
+        self.url = None
+
+    @classmethod
+    async def create(cls, conn: CDPConnection, url: str = "about:blank") -> "CDPTab":
+        target = await conn.send("Target.createTarget", url=url)
+        target_id = target["targetId"]
+        session = await conn.send(
+            "Target.attachToTarget", targetId=target_id, flatten=True
+        )
+        tab = cls(conn, target_id, session["sessionId"])
+        for domain in ["Page", "Network", "Runtime"]:
+            await tab.send(f"{domain}.enable")
+        return tab
+
+    async def send(self, method: str, **params) -> dict:
+        return await self.conn.send(method, session_id=self.session_id, **params)
+
+    async def wait_event(
+        self, match: Callable[[dict], bool], timeout: float = CDP_TIMEOUT
+    ) -> dict:
+        """First event (`{"method": ..., "params": ...}`) which matches.
+        Raise TimeoutError if none in `timeout` seconds."""
+        for idx, event in enumerate(self.backlog):
+            if match(event):
+                return self.backlog.pop(idx)
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            remain = deadline - loop.time()
+            if remain <= 0:
+                raise TimeoutError(f"No matched event in {timeout}s")
+            event = await asyncio.wait_for(self.events.get(), remain)
+            if match(event):
+                return event
+            self.backlog.append(event)
+
+    def clear_events(self):
+        self.backlog.clear()
+        while not self.events.empty():
+            self.events.get_nowait()
+
+    async def navigate(self, url: str):
+        """Start loading url, and return without waiting for page load,
+        same as load mode `none` of DrissionPage."""
+        self.clear_events()
+        res = await self.send("Page.navigate", url=url)
+        if res.get("errorText"):
+            raise RuntimeError(f"Navigate failed: {res['errorText']}")
+        self.url = url
+
+    async def wait_dom_ready(self, timeout: float = CDP_TIMEOUT):
+        """Wait until DOM of navigated page is parsed, so inline data is available.
+        Event is kept in backlog if it fired before this call."""
+        await self.wait_event(
+            lambda e: e["method"] == "Page.domContentEventFired", timeout
+        )
+
+    async def wait_response(
+        self, url: str, timeout: float = CDP_TIMEOUT
+    ) -> tuple[int, object]:
+        """Status and body of first response whose url contains `url`.
+        Body is parsed as json if possible."""
+        # request methods by id, which precede responses in backlog and queue
+        methods: dict[str, str] = {}
+
+        def is_target_response(event: dict) -> bool:
+            params = event.get("params", {})
+            if event["method"] == "Network.requestWillBeSent":
+                methods[params["requestId"]] = params["request"]["method"]
+                return False
+            if event["method"] != "Network.responseReceived":
+                return False
+            # skip cors preflight, as DrissionPage listens GET and POST only
+            if methods.get(params["requestId"]) == "OPTIONS":
+                return False
+            return url in params["response"]["url"]
+
+        event = await self.wait_event(is_target_response, timeout)
+        request_id = event["params"]["requestId"]
+        status = event["params"]["response"]["status"]
+        await self.wait_event(
+            lambda e: e["method"]
+            in ["Network.loadingFinished", "Network.loadingFailed"]
+            and e["params"].get("requestId") == request_id,
+            timeout,
+        )
+        try:
+            res = await self.send("Network.getResponseBody", requestId=request_id)
+        except RuntimeError as e:
+            logger.warn(f"  × No response body: {e}")
+            return status, None
+        body = res.get("body", "")
+        if res.get("base64Encoded"):
+            body = base64.b64decode(body).decode("utf-8", errors="replace")
+        try:
+            body = json.loads(body)
+        except ValueError:
+            pass
+        return status, body
+
+    async def evaluate(self, expression: str):
+        res = await self.send(
+            "Runtime.evaluate",
+            expression=expression,
+            returnByValue=True,
+            awaitPromise=True,
+        )
+        if "exceptionDetails" in res:
+            raise RuntimeError(
+                f"Evaluate failed: {res['exceptionDetails'].get('text')}"
+            )
+        return res.get("result", {}).get("value")
+
+    async def get_title(self) -> str:
+        return await self.evaluate("document.title")
+
+    async def get_html(self) -> str:
+        return await self.evaluate("document.documentElement.outerHTML")
+
+    async def get_cookies(self) -> list[dict]:
+        """Cookies of current page, same as `Network.getCookies` of DrissionPage."""
+        res = await self.send("Network.getCookies")
+        return res.get("cookies", [])
+
+    async def stop_loading(self):
+        await self.send("Page.stopLoading")
+
+    async def close(self):
+        self.conn.unsubscribe(self.session_id)
+        try:
+            await self.conn.send("Target.closeTarget", targetId=self.target_id)
+        except Exception as e:
+            logger.warn(f"× CDPTab.close: {e}")
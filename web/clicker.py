@@ -1,74 +1,183 @@
-import cv2
+import threading
 
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from time import sleep
+from typing import TYPE_CHECKING
 
 from configs.envs import IMGS_ROOT
 
+if TYPE_CHECKING:
+    import numpy as np
+
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
+# region of interest in source image: (left, top, right, bottom)
+RegionType = tuple[int, int, int, int]
+
 
 class ImageMatcher:
-    def __init__(self, source_image_path: Path, template_image_path: Path):
-        self.source_image = cv2.imread(str(source_image_path))
-        self.template_image = cv2.imread(str(template_image_path))
-        self.detected_image_path = (
-            source_image_path.parent / f"{source_image_path.stem}_detected.png"
-        )
+    """cv2 (with numpy) is imported on first match, as it is slow to import and
+    only needed when location is switched by clicking."""
+
+    # grayscale templates shared by all matchers, keyed by image path
+    TEMPLATES: "dict[str, np.ndarray]" = {}
+    TEMPLATES_LOCK = threading.Lock()
+
+    def __init__(
+        self,
+        source_image: "np.ndarray",
+        template_image: "np.ndarray",
+        roi: RegionType = None,
+        levels: int = 2,
+    ):
+        self.source_image = source_image
+        self.template_image = template_image
+        self.roi = roi
+        self.levels = levels
+
+    @classmethod
+    def load_template(cls, template_image_path: Path) -> "np.ndarray":
+        import cv2
+
+        key = str(template_image_path)
+        with cls.TEMPLATES_LOCK:
+            if key not in cls.TEMPLATES:
+                template_image = cv2.imread(key, cv2.IMREAD_GRAYSCALE)
+                if template_image is None:
+                    raise FileNotFoundError(f"Template image not found: {key}")
+                cls.TEMPLATES[key] = template_image
+            return cls.TEMPLATES[key]
+
+    @staticmethod
+    def decode_image(image_bytes: bytes) -> "np.ndarray":
+        import cv2
+        import numpy as np
+
+        image_array = np.frombuffer(image_bytes, dtype=np.uint8)
+        return cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
+    def to_gray(self, image: "np.ndarray") -> "np.ndarray":
+        import cv2
+
+        if image.ndim == 2:
+            return image
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+    def crop_roi(self, image: "np.ndarray") -> "tuple[np.ndarray, int, int]":
+        if not self.roi:
+            return image, 0, 0
+        height, width = image.shape[:2]
+        left, top, right, bottom = self.roi
+        left, top = max(left, 0), max(top, 0)
+        right, bottom = min(right, width), min(bottom, height)
+        return image[top:bottom, left:right], left, top
+
+    def get_levels(self, template: "np.ndarray") -> int:
+        """Max pyramid levels that keep template large enough to match."""
+        levels = self.levels
+        while levels > 0 and min(template.shape[:2]) // (2**levels) < 8:
+            levels -= 1
+        return levels
+
+    def match_at(self, source: "np.ndarray", template: "np.ndarray") -> tuple[int, int]:
+        import cv2
+
+        res = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED)
+        _, _, _, (left, top) = cv2.minMaxLoc(res)
+        return left, top
 
     def match(self):
         """
         OpenCV: Template Matching
         * https://docs.opencv.org/3.4/de/da9/tutorial_template_matching.html
 
+        Match coarse-to-fine: locate at downscaled pyramid level,
+        then refine at full resolution in a small window around it.
+
         Return: (left, top, right, bottom)
         """
-        res = cv2.matchTemplate(
-            self.source_image, self.template_image, cv2.TM_CCOEFF_NORMED
-        )
-        _, _, _, (left, top) = cv2.minMaxLoc(res)
-        right = left + self.template_image.shape[1]
-        bottom = top + self.template_image.shape[0]
+        import cv2
+
+        source = self.to_gray(self.source_image)
+        template = self.to_gray(self.template_image)
+        source, roi_left, roi_top = self.crop_roi(source)
+        t_height, t_width = template.shape[:2]
+        levels = self.get_levels(template)
+        if levels > 0:
+            coarse_source, coarse_template = source, template
+            for _ in range(levels):
+                coarse_source = cv2.pyrDown(coarse_source)
+                coarse_template = cv2.pyrDown(coarse_template)
+            coarse_left, coarse_top = self.match_at(coarse_source, coarse_template)
+            scale = 2**levels
+            # search window with margin of one coarse pixel step on each side
+            margin = scale * 2
+            win_left = max(coarse_left * scale - margin, 0)
+            win_top = max(coarse_top * scale - margin, 0)
+            win_right = min(coarse_left * scale + t_width + margin, source.shape[1])
+            win_bottom = min(coarse_top * scale + t_height + margin, source.shape[0])
+            window = source[win_top:win_bottom, win_left:win_right]
+            left, top = self.match_at(window, template)
+            left, top = left + win_left, top + win_top
+        else:
+            left, top = self.match_at(source, template)
+        left, top = left + roi_left, top + roi_top
+        right = left + t_width
+        bottom = top + t_height
         self.match_region = (left, top, right, bottom)
         return self.match_region
 
-    def draw_rectangle(self):
+    def draw_rectangle(self, detected_image_path: Path):
+        import cv2
+
+        detected_image = self.source_image.copy()
         cv2.rectangle(
-            img=self.source_image,
+            img=detected_image,
             pt1=self.match_region[:2],
             pt2=self.match_region[2:],
             color=(0, 255, 0),  # BGR
             thickness=2,
         )
-        cv2.imwrite(str(self.detected_image_path), self.source_image)
+        cv2.imwrite(str(detected_image_path), detected_image)
 
 
 class LocationClicker:
-    def __init__(self, tab: ChromiumTab = None, suffix: str = ""):
+    def __init__(
+        self,
+        tab: "ChromiumTab" = None,
+        suffix: str = "",
+        roi: RegionType = None,
+        debug: bool = False,
+    ):
         self.tab = tab
         self.suffix = suffix
+        self.roi = roi
+        self.debug = debug
         self.init_paths()
 
     def init_paths(self):
         screenshot_name = "screenshot"
         if self.suffix:
             screenshot_name = f"{screenshot_name}_{self.suffix}"
-        self.screenshot_image_path = IMGS_ROOT / f"{screenshot_name}.png"
+        self.detected_image_path = IMGS_ROOT / f"{screenshot_name}_detected.png"
 
     def set_location_image_name(self, location_image_name: str):
         self.location_image_name = location_image_name
         self.location_image_path = IMGS_ROOT / self.location_image_name
 
-    def get_screenshot(self):
-        self.tab.get_screenshot(path=self.screenshot_image_path, full_page=False)
+    def get_screenshot(self) -> "np.ndarray":
+        image_bytes = self.tab.get_screenshot(as_bytes="png", full_page=False)
+        return ImageMatcher.decode_image(image_bytes)
 
     def get_location_item_position(self):
-        self.get_screenshot()
         matcher = ImageMatcher(
-            source_image_path=self.screenshot_image_path,
-            template_image_path=self.location_image_path,
+            source_image=self.get_screenshot(),
+            template_image=ImageMatcher.load_template(self.location_image_path),
+            roi=self.roi,
         )
         left, top, right, bottom = matcher.match()
-        matcher.draw_rectangle()
+        if self.debug:
+            matcher.draw_rectangle(self.detected_image_path)
         center_x = (left + right) / 2
         center_y = (top + bottom) / 2
         return center_x, center_y
@@ -87,13 +196,13 @@ class LocationClicker:
 
 
 class BlinkitLocationClicker(LocationClicker):
-    def __init__(self, tab: ChromiumTab, suffix: str = "blinkit"):
-        super().__init__(tab=tab, suffix=suffix)
+    def __init__(self, tab: "ChromiumTab", suffix: str = "blinkit", **kwargs):
+        super().__init__(tab=tab, suffix=suffix, **kwargs)
 
 
 class SwiggyLocationClicker(LocationClicker):
-    def __init__(self, tab: ChromiumTab, suffix: str = "swiggy"):
-        super().__init__(tab=tab, suffix=suffix)
+    def __init__(self, tab: "ChromiumTab", suffix: str = "swiggy", **kwargs):
+        super().__init__(tab=tab, suffix=suffix, **kwargs)
 
     def type_target_location_text(self, location_text: str):
         # select input field with triple clicks
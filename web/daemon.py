@@ -0,0 +1,363 @@
+import argparse
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+from pathlib import Path
+from tclogger import logger, logstr, brk, get_now_str
+from typing import Union
+
+from configs.envs import DATA_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL
+from web.instrument import set_labels
+from web.pacer import get_pacer
+
+DAEMON_SOCKET_PATH = DATA_ROOT / "daemon" / "browser.sock"
+DAEMON_TIMEOUT = 600
+
+
+def get_site_classes(site: WEBSITE_LITERAL) -> tuple[type, type]:
+    """(switcher, scraper) classes of site, imported only when site is used."""
+    if site == "blinkit":
+        from web.blinkit.scraper import BlinkitLocationSwitcher, BlinkitBrowserScraper
+
+        return BlinkitLocationSwitcher, BlinkitBrowserScraper
+    if site == "zepto":
+        from web.zepto.scraper import ZeptoLocationSwitcher, ZeptoBrowserScraper
+
+        return ZeptoLocationSwitcher, ZeptoBrowserScraper
+    if site == "swiggy":
+        from web.swiggy.scraper import SwiggyLocationSwitcher, SwiggyBrowserScraper
+
+        return SwiggyLocationSwitcher, SwiggyBrowserScraper
+    if site == "dmart":
+        from web.dmart.scraper import DmartLocationSwitcher, DmartBrowserScraper
+
+        return DmartLocationSwitcher, DmartBrowserScraper
+    raise ValueError(f"Unknown site: {site}")
+
+
+class SiteWorker:
+    """Browser and location session of one site, owned by daemon.
+    Jobs of same site are serialized, as they share one browser, and each fetch
+    carries location of its client, which is switched to under same lock,
+    so clients of different locations never scrape under each other's."""
+
+    def __init__(self, site: WEBSITE_LITERAL):
+        self.site = site
+        switcher_class, scraper_class = get_site_classes(site)
+        # switcher is created before scraper, see `ZeptoScrapeBatcher`
+        self.switcher = switcher_class()
+        self.scraper = scraper_class()
+        self.scraper.client.on_recycle = self.restore_location
+        self.lock = threading.Lock()
+        self.job_count = 0
+
+    def restore_location(self, client):
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
+
+    def set_location(self, location_idx: int) -> dict:
+        with self.lock:
+            self.switcher.set_location(location_idx)
+        return {}
+
+    def fetch(
+        self,
+        product_id: Union[str, int],
+        location_idx: int = None,
+        date_str: str = None,
+        parent: str = None,
+        save_cookies: bool = True,
+    ) -> dict:
+        with self.lock:
+            if (
+                location_idx is not None
+                and location_idx != self.switcher.current_location_idx
+            ):
+                self.switcher.set_location(location_idx)
+            if date_str and date_str != self.scraper.date_str:
+                self.scraper.date_str = date_str
+                self.scraper.init_paths()
+            # signals raised in daemon are replayed by pacer of client
+            signal_counts = dict(self.scraper.pacer.signal_counts)
+            product_info = self.scraper.run(
+                product_id, save_cookies=save_cookies, parent=parent
+            )
+            self.job_count += 1
+            pacer_signals = []
+            for signal, count in self.scraper.pacer.signal_counts.items():
+                pacer_signals.extend([signal] * (count - signal_counts.get(signal, 0)))
+        return {"product_info": product_info, "pacer_signals": pacer_signals}
+
+    def close(self):
+        with self.lock:
+            self.scraper.client.stop_client(close_browser=True)
+            self.switcher.client.stop_client(close_browser=True)
+
+
+class DaemonRequestHandler(socketserver.StreamRequestHandler):
+    """One json request per line, and one json response per line."""
+
+    server: "BrowserDaemon"
+
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                res = {"ok": True, **self.server.dispatch(request)}
+            except Exception as e:
+                logger.warn(f"× BrowserDaemon: {e}")
+                res = {"ok": False, "error": str(e)}
+            self.wfile.write((json.dumps(res, ensure_ascii=False) + "\n").encode())
+            self.wfile.flush()
+
+
+class BrowserDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Long-lived process which owns browsers and location sessions of sites,
+    so browser launch, profile load and location switching are paid once,
+    instead of once per batcher invocation.
+
+    Ops: `ping`, `set_location`, `fetch`, `stop`.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path = DAEMON_SOCKET_PATH):
+        self.socket_path = Path(socket_path)
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.socket_path.exists():
+            if is_daemon_alive(self.socket_path):
+                raise RuntimeError(f"Daemon is already running: {self.socket_path}")
+            self.socket_path.unlink()
+        super().__init__(str(self.socket_path), DaemonRequestHandler)
+        self.workers: dict[str, SiteWorker] = {}
+        self.workers_lock = threading.Lock()
+        self.start_at = get_now_str()
+
+    def get_worker(self, site: WEBSITE_LITERAL) -> SiteWorker:
+        with self.workers_lock:
+            if site not in self.workers:
+                logger.note(f"> Init worker: {logstr.mesg(brk(site))}")
+                self.workers[site] = SiteWorker(site)
+            return self.workers[site]
+
+    def dispatch(self, request: dict) -> dict:
+        op = request.get("op")
+        if op == "ping":
+            return {
+                "pid": os.getpid(),
+                "start_at": self.start_at,
+                "jobs": {site: w.job_count for site, w in self.workers.items()},
+            }
+        if op == "stop":
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {}
+        site = request.get("site")
+        if site not in WEBSITE_NAMES:
+            raise ValueError(f"Unknown site: {site}")
+        set_labels(site=site, location=request.get("parent"))
+        worker = self.get_worker(site)
+        if op == "set_location":
+            return worker.set_location(request["location_idx"])
+        if op == "fetch":
+            return worker.fetch(
+                request["product_id"],
+                location_idx=request.get("location_idx"),
+                date_str=request.get("date_str"),
+                parent=request.get("parent"),
+                save_cookies=request.get("save_cookies", True),
+            )
+        raise ValueError(f"Unknown op: {op}")
+
+    def close(self):
+        for worker in self.workers.values():
+            try:
+                worker.close()
+            except Exception as e:
+                logger.warn(f"× BrowserDaemon.close: {e}")
+        self.server_close()
+        self.socket_path.unlink(missing_ok=True)
+
+
+class DaemonClient:
+    """Thin client of `BrowserDaemon`, with one connection for all requests."""
+
+    def __init__(
+        self, socket_path: Path = DAEMON_SOCKET_PATH, timeout: float = DAEMON_TIMEOUT
+    ):
+        self.socket_path = Path(socket_path)
+        self.timeout = timeout
+        self.sock = None
+        self.lock = threading.Lock()
+
+    def connect(self):
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self.sock.settimeout(self.timeout)
+            self.sock.connect(str(self.socket_path))
+            self.rfile = self.sock.makefile("rb")
+
+    def request(self, op: str, **kwargs) -> dict:
+        with self.lock:
+            self.connect()
+            line = json.dumps({"op": op, **kwargs}, ensure_ascii=False) + "\n"
+            self.sock.sendall(line.encode())
+            res_line = self.rfile.readline()
+        if not res_line:
+            self.close()
+            raise RuntimeError("Daemon closed connection")
+        res = json.loads(res_line)
+        if not res.pop("ok", False):
+            raise RuntimeError(f"Daemon {op} failed: {res.get('error')}")
+        return res
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def is_daemon_alive(socket_path: Path = DAEMON_SOCKET_PATH) -> bool:
+    client = DaemonClient(socket_path, timeout=5)
+    try:
+        client.request("ping")
+        return True
+    except (OSError, RuntimeError):
+        return False
+    finally:
+        client.close()
+
+
+class DaemonBrowserClient:
+    """Stands for browser client in batchers, as browser is owned by daemon."""
+
+    on_recycle = None
+
+    def close_other_tabs(self, create_new_tab: bool = True):
+        pass
+
+    def stop_client(self, close_browser: bool = False):
+        pass
+
+
+class DaemonSwitcher:
+    """Location switcher of batchers, which switches location in daemon."""
+
+    def __init__(self, site: WEBSITE_LITERAL, daemon: DaemonClient):
+        self.site = site
+        self.daemon = daemon
+        self.client = DaemonBrowserClient()
+        self.current_location_idx = None
+
+    def set_location(self, location_idx: int = 0):
+        self.daemon.request("set_location", site=self.site, location_idx=location_idx)
+        self.current_location_idx = location_idx
+
+
+class DaemonScraper:
+    """Scraper of batchers, which fetches and dumps products in daemon,
+    and delegates others (such as `get_dump_path`) to local scraper.
+    Location of switcher is sent with each fetch, as daemon is shared."""
+
+    def __init__(
+        self,
+        site: WEBSITE_LITERAL,
+        scraper,
+        daemon: DaemonClient,
+        switcher: DaemonSwitcher,
+    ):
+        self.site = site
+        self.scraper = scraper
+        self.daemon = daemon
+        self.switcher = switcher
+        self.pacer = get_pacer(site)
+        self.client = DaemonBrowserClient()
+
+    def __getattr__(self, name: str):
+        return getattr(self.scraper, name)
+
+    def run(
+        self, product_id: Union[str, int], save_cookies: bool = True, parent: str = None
+    ) -> dict:
+        res = self.daemon.request(
+            "fetch",
+            site=self.site,
+            product_id=product_id,
+            location_idx=self.switcher.current_location_idx,
+            date_str=self.scraper.date_str,
+            parent=parent,
+            save_cookies=save_cookies,
+        )
+        for signal in res.get("pacer_signals", []):
+            self.pacer.on_failure(signal)
+        return res.get("product_info")
+
+
+def use_daemon(batcher, site: WEBSITE_LITERAL, socket_path: Path = DAEMON_SOCKET_PATH):
+    """Replace switcher and scraper of batcher with proxies of daemon."""
+    if not is_daemon_alive(socket_path):
+        raise RuntimeError(f"Daemon is not running: {socket_path}")
+    daemon = DaemonClient(socket_path)
+    batcher.switcher = DaemonSwitcher(site, daemon)
+    batcher.scraper = DaemonScraper(site, batcher.scraper, daemon, batcher.switcher)
+    logger.okay(f"  ✓ Use browser daemon: {logstr.file(brk(socket_path))}")
+
+
+class DaemonArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-k", "--stop", action="store_true")
+        self.add_argument("-p", "--ping", action="store_true")
+        self.add_argument("-s", "--sites", nargs="+", default=[])
+        self.add_argument("--socket", type=str, default=str(DAEMON_SOCKET_PATH))
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+def main(args: argparse.Namespace):
+    socket_path = Path(args.socket)
+    if args.ping or args.stop:
+        client = DaemonClient(socket_path, timeout=10)
+        res = client.request("stop" if args.stop else "ping")
+        logger.okay(f"  ✓ Daemon: {res}")
+        client.close()
+        return
+
+    from web.metrics import PromTextfileExporter
+
+    exporter = PromTextfileExporter(job="browser_daemon")
+    exporter.start()
+    daemon = BrowserDaemon(socket_path)
+    try:
+        for site in args.sites:
+            daemon.get_worker(site)
+        logger.okay(f"  ✓ Daemon listening: {logstr.file(brk(socket_path))}")
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+        exporter.stop()
+
+
+if __name__ == "__main__":
+    arg_parser = DaemonArgParser()
+    args = arg_parser.parse_args()
+    main(args)
+
+    # Case 1: start daemon, and init browsers of blinkit and zepto
+    # python -m web.daemon -s blinkit zepto
+
+    # Case 2: batch scrape through daemon
+    # python -m web.blinkit.batcher -s -D
+
+    # Case 3: check or stop daemon
+    # python -m web.daemon -p
+    # python -m web.daemon -k
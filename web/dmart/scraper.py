@@ -1,19 +1,23 @@
 import json
 import urllib.parse
 
-from bs4 import BeautifulSoup
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from tclogger import logger, logstr, brk, get_now_str, dict_to_str
 from tclogger import dict_get, dict_set, dict_set_all
 from time import sleep
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 from configs.envs import DATA_ROOT, DMART_LOCATIONS, DMART_BROWSER_SETTING
 from web.browser import BrowserClient
 from web.fetch import fetch_with_retry
+from web.pacer import get_pacer, is_captcha_title
+from web.instrument import timed
+from web.session import LocationSessionCache
 from file.local_dump import LocalAddressExtractor
 
+if TYPE_CHECKING:
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
 WEBSITE_NAME = "dmart"
 DMART_MAIN_URL = "https://www.dmart.in"
 DMART_ITEM_URL = "https://www.dmart.in/product"
@@ -60,7 +64,7 @@ class DmartLocationChecker:
         return True
 
     def check_tab_location(
-        self, tab: ChromiumTab, location_idx: int, extra_msg: str = ""
+        self, tab: "ChromiumTab", location_idx: int, extra_msg: str = ""
     ):
         cookies = tab.cookies(all_info=True).as_dict()
         guest_info = dict_get(cookies, "guest", None)
@@ -88,10 +92,41 @@ class DmartLocationChecker:
 
 
 class DmartLocationSwitcher:
-    def __init__(self):
+    def __init__(self, client_settings: dict = None, locations: list = None):
+        self.client_settings = client_settings or DMART_BROWSER_SETTING
+        self.locations = locations or DMART_LOCATIONS
         self.checker = DmartLocationChecker()
-        self.client = BrowserClient(**DMART_BROWSER_SETTING)
+        self.client = BrowserClient(**self.client_settings)
+        self.session_cache = LocationSessionCache(
+            website=WEBSITE_NAME, client_settings=self.client_settings
+        )
+        self.current_location_idx = None
+
+    def get_location_name(self, location_idx: int) -> str:
+        return self.locations[location_idx].get("name", "")
+
+    def restore_session(self, tab: "ChromiumTab", location_idx: int) -> bool:
+        location_name = self.get_location_name(location_idx)
+        if not self.session_cache.restore(tab, location_name):
+            return False
+        tab.get(DMART_MAIN_URL, timeout=30)
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="DmartLocationSwitcher"
+        ):
+            return True
+        self.session_cache.invalidate(location_name)
+        return False
+
+    def save_session(self, tab: "ChromiumTab", location_idx: int, force: bool = True):
+        location_name = self.get_location_name(location_idx)
+        if not force and self.session_cache.get(location_name):
+            return
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="DmartLocationSwitcher"
+        ):
+            self.session_cache.snapshot(tab, location_name)
 
+    @timed("set_location", site=WEBSITE_NAME)
     def set_location(self, location_idx: int = 0) -> dict:
         logger.note(f"> Visiting main page: {logstr.mesg(brk(DMART_MAIN_URL))}")
         self.client.start_client()
@@ -105,9 +140,12 @@ class DmartLocationSwitcher:
             tab, location_idx, extra_msg="DmartLocationSwitcher"
         ):
             logger.okay("  * Location already correctly set. Skip.")
+            self.save_session(tab, location_idx, force=False)
+        elif self.restore_session(tab, location_idx):
+            logger.okay("  * Location restored from session cache. Skip.")
         else:
             logger.note(f"> Setting location:")
-            location_dict = DMART_LOCATIONS[location_idx]
+            location_dict = self.locations[location_idx]
             location_name = location_dict.get("name", "")
             location_text = location_dict.get("text", "")
             logger.file(f"  * {location_name} ({location_text})")
@@ -135,13 +173,17 @@ class DmartLocationSwitcher:
             confirm_button.click()
 
             sleep(3)
+            self.save_session(tab, location_idx)
 
+        self.current_location_idx = location_idx
         # self.client.close_other_tabs(create_new_tab=True)
         self.client.stop_client(close_browser=False)
 
 
 class DmartResponseParser:
     def extract_resp(self, html: str) -> dict:
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, "html.parser")
         target_ele = soup.find("script", id="__NEXT_DATA__", type="application/json")
         resp = json.loads(target_ele.string.strip())
@@ -159,6 +201,7 @@ class DmartBrowserScraper:
     def __init__(self, date_str: str = None):
         self.date_str = date_str
         self.client = BrowserClient(**DMART_BROWSER_SETTING)
+        self.pacer = get_pacer(WEBSITE_NAME)
         self.init_paths()
         self.init_resp_parser()
 
@@ -169,7 +212,7 @@ class DmartBrowserScraper:
     def init_resp_parser(self):
         self.resp_parser = DmartResponseParser()
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         for k, v in cookies_dict.items():
             try:
@@ -181,6 +224,7 @@ class DmartBrowserScraper:
         cookies_dict["now"] = get_now_str()
         return cookies_dict
 
+    @timed("fetch", site=WEBSITE_NAME)
     def fetch(self, product_id: Union[str, int], save_cookies: bool = True) -> dict:
         item_url = f"{DMART_ITEM_URL}/{product_id}"
         logger.note(f"> Visiting product page: {logstr.mesg(brk(product_id))}")
@@ -192,6 +236,8 @@ class DmartBrowserScraper:
 
         tab.get(item_url, interval=4)
         logger.mesg(f"  ✓ Title: {brk(tab.title)}")
+        if is_captcha_title(tab.title):
+            self.pacer.on_failure("captcha")
 
         product_info = {}
         resp = self.resp_parser.extract_resp(tab.html)
@@ -212,6 +258,7 @@ class DmartBrowserScraper:
             dump_path = self.dump_root / filename
         return dump_path
 
+    @timed("dump", site=WEBSITE_NAME)
     def dump(self, product_id: Union[str, int], resp: dict, parent: str = None):
         logger.note(f"  > Dump product data to json:", end=" ")
         dump_path = self.get_dump_path(product_id, parent)
@@ -224,7 +271,11 @@ class DmartBrowserScraper:
         self, product_id: Union[str, int], save_cookies: bool = True, parent: str = None
     ) -> dict:
         product_info = fetch_with_retry(
-            self.fetch, product_id=product_id, save_cookies=save_cookies, max_retries=5
+            self.fetch,
+            product_id=product_id,
+            save_cookies=save_cookies,
+            pacer=self.pacer,
+            max_retries=5,
         )
         self.dump(product_id=product_id, resp=product_info, parent=parent)
         return product_info
@@ -357,6 +408,7 @@ class DmartProductDataExtractor:
             logger.warn(f"\n  × No variant: {url}", verbose=self.verbose)
         return res
 
+    @timed("extract", site=WEBSITE_NAME)
     def extract(self, info: dict, ref_mrp: Union[int, float] = None) -> dict:
         """If `ref_mrp` is not None, would choose variant whose `mrp` is closest to `ref_mrp`."""
         if ref_mrp is None or ref_mrp <= 0:
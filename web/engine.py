@@ -0,0 +1,563 @@
+import argparse
+import asyncio
+import sys
+
+from tclogger import logger, logstr, brk, get_now_str, Runtimer
+from typing import Union
+
+from configs.envs import DATA_ROOT, WEBSITE_NAMES, WEBSITE_LITERAL
+from web.cdp import CDPConnection, CDPTab
+from web.fetch import async_fetch_with_retry
+from web.instrument import INSTRUMENT, span, incr, dump_summary
+from web.pacer import is_captcha_title
+from cli.arg import add_profile_arguments
+
+# columns of product links in sku sheet
+SITE_LINK_COLUMNS = {
+    "blinkit": "weblink_blinkit",
+    "zepto": "weblink_zepto",
+    "swiggy": "weblink_instamart",
+    "dmart": "weblink_dmart",
+}
+DEFAULT_TABS = 4
+
+
+class CDPPageSnapshot:
+    """Stand-in of DrissionPage tab, filled by async CDP calls, so `get_cookies`
+    and `get_local_storage` of scrapers are reused as they are."""
+
+    def __init__(
+        self, url: str, cookies: list[dict], local_storage: dict[str, str] = None
+    ):
+        self.url = url
+        self.cookies_list = cookies
+        self.local_storage_dict = local_storage or {}
+
+    def cookies(self, all_domains: bool = False, all_info: bool = False):
+        return CookiesList(self.cookies_list)
+
+    def local_storage(self, item: str = None):
+        return self.local_storage_dict.get(item)
+
+
+class CookiesList(list):
+    def as_dict(self) -> dict:
+        return {c["name"]: c["value"] for c in self}
+
+
+class AsyncPageHandler:
+    """Async version of `fetch` of browser scraper of site, on a `CDPTab`.
+
+    Parsing and cleaning of responses, cookies and dumps are delegated to the
+    scraper, so dumps are same as those of sync batchers.
+    """
+
+    site: WEBSITE_LITERAL = None
+    local_storage_items: list[str] = []
+    # same as `run` of scraper
+    max_retries: int = 3
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.pacer = scraper.pacer
+
+    def get_url(self, product_id: Union[str, int]) -> str:
+        raise NotImplementedError
+
+    async def visit(self, tab: CDPTab, product_id: Union[str, int]):
+        url = self.get_url(product_id)
+        logger.note(f"> Visiting product page: {logstr.mesg(brk(product_id))}")
+        logger.file(f"  * {url}")
+        await tab.navigate(url)
+
+    async def check_title(self, tab: CDPTab):
+        title = await tab.get_title()
+        logger.mesg(f"  ✓ Title: {brk(title)}")
+        if is_captcha_title(title):
+            self.pacer.on_failure("captcha")
+
+    async def get_snapshot(self, tab: CDPTab) -> CDPPageSnapshot:
+        local_storage = {}
+        for item in self.local_storage_items:
+            local_storage[item] = await tab.evaluate(f"localStorage.getItem({item!r})")
+        return CDPPageSnapshot(
+            url=await tab.evaluate("location.href"),
+            cookies=await tab.get_cookies(),
+            local_storage=local_storage,
+        )
+
+    async def fetch(
+        self, tab: CDPTab, product_id: Union[str, int], save_cookies: bool = True
+    ) -> dict:
+        raise NotImplementedError
+
+
+class BlinkitPageHandler(AsyncPageHandler):
+    site = "blinkit"
+
+    def get_url(self, product_id: Union[str, int]) -> str:
+        from web.blinkit.scraper import BLINKIT_PRN_URL
+
+        return f"{BLINKIT_PRN_URL}/{product_id}"
+
+    async def fetch(
+        self, tab: CDPTab, product_id: Union[str, int], save_cookies: bool = True
+    ) -> dict:
+        from web.blinkit.scraper import BLINKIT_LAYOUT_URL
+
+        layout_url = f"{BLINKIT_LAYOUT_URL}/{product_id}"
+        await self.visit(tab, product_id)
+        try:
+            status, layout_body = await tab.wait_response(layout_url, timeout=30)
+        except TimeoutError:
+            logger.warn(f"  × No layout packet: {logstr.file(brk(layout_url))}")
+            status, layout_body = None, None
+        await self.check_title(tab)
+        await tab.stop_loading()
+        layout_data = {}
+        if status == 429:
+            self.pacer.on_failure("http_429")
+        elif isinstance(layout_body, dict):
+            layout_data = self.scraper.clean_resp(layout_body)
+        if layout_data and save_cookies:
+            snapshot = await self.get_snapshot(tab)
+            layout_data["cookies"] = self.scraper.get_cookies(snapshot)
+        return layout_data
+
+
+class ZeptoPageHandler(AsyncPageHandler):
+    site = "zepto"
+    local_storage_items = ["user-position"]
+    max_retries = 5
+
+    def get_url(self, product_id: Union[str, int]) -> str:
+        from web.zepto.scraper import ZEPTO_ITEM_URL
+
+        return f"{ZEPTO_ITEM_URL}/{product_id}"
+
+    async def fetch(
+        self, tab: CDPTab, product_id: Union[str, int], save_cookies: bool = True
+    ) -> dict:
+        await self.visit(tab, product_id)
+        await tab.wait_dom_ready()
+        await self.check_title(tab)
+        product_info = {}
+        resp = self.scraper.resp_parser.extract_resp(await tab.get_html())
+        if resp and save_cookies:
+            snapshot = await self.get_snapshot(tab)
+            resp = self.scraper.resp_parser.clean_resp(resp)
+            product_info = {"resp": resp}
+            product_info["cookies"] = self.scraper.get_cookies(snapshot)
+            product_info["local_storage"] = self.scraper.get_local_storage(snapshot)
+            product_info["product_id"] = product_id
+        return product_info
+
+
+class SwiggyPageHandler(AsyncPageHandler):
+    site = "swiggy"
+
+    def get_url(self, product_id: Union[str, int]) -> str:
+        from web.swiggy.scraper import SWIGGY_ITEM_URL
+
+        return f"{SWIGGY_ITEM_URL}/{product_id}"
+
+    async def fetch(
+        self, tab: CDPTab, product_id: Union[str, int], save_cookies: bool = True
+    ) -> dict:
+        await self.visit(tab, product_id)
+        await tab.wait_dom_ready()
+        await self.check_title(tab)
+        product_info = await tab.evaluate("window.___INITIAL_STATE___")
+        if product_info and save_cookies:
+            product_info = self.scraper.clean_resp(product_info)
+            snapshot = await self.get_snapshot(tab)
+            product_info["cookies"] = self.scraper.get_cookies(snapshot)
+        return product_info
+
+
+class DmartPageHandler(AsyncPageHandler):
+    site = "dmart"
+    max_retries = 5
+
+    def get_url(self, product_id: Union[str, int]) -> str:
+        from web.dmart.scraper import DMART_ITEM_URL
+
+        return f"{DMART_ITEM_URL}/{product_id}"
+
+    async def fetch(
+        self, tab: CDPTab, product_id: Union[str, int], save_cookies: bool = True
+    ) -> dict:
+        from web.dmart.scraper import url_to_filename
+
+        await self.visit(tab, product_id)
+        await tab.wait_dom_ready()
+        await self.check_title(tab)
+        product_info = {}
+        resp = self.scraper.resp_parser.extract_resp(await tab.get_html())
+        if resp and save_cookies:
+            snapshot = await self.get_snapshot(tab)
+            resp = self.scraper.resp_parser.clean_resp(resp)
+            product_info = {"resp": resp}
+            product_info["cookies"] = self.scraper.get_cookies(snapshot)
+            product_info["product_id"] = url_to_filename(product_id)
+        return product_info
+
+
+HANDLER_CLASSES: dict[str, type[AsyncPageHandler]] = {
+    "blinkit": BlinkitPageHandler,
+    "zepto": ZeptoPageHandler,
+    "swiggy": SwiggyPageHandler,
+    "dmart": DmartPageHandler,
+}
+
+
+def get_site_batcher_class(site: WEBSITE_LITERAL) -> tuple[type, list[dict]]:
+    """(scrape batcher class, locations) of site, imported only when site is used."""
+    if site == "blinkit":
+        from configs.envs import BLINKIT_LOCATIONS
+        from web.blinkit.batcher import BlinkitScrapeBatcher
+
+        return BlinkitScrapeBatcher, BLINKIT_LOCATIONS
+    if site == "zepto":
+        from configs.envs import ZEPTO_LOCATIONS
+        from web.zepto.batcher import ZeptoScrapeBatcher
+
+        return ZeptoScrapeBatcher, ZEPTO_LOCATIONS
+    if site == "swiggy":
+        from configs.envs import SWIGGY_LOCATIONS
+        from web.swiggy.batcher import SwiggyScrapeBatcher
+
+        return SwiggyScrapeBatcher, SWIGGY_LOCATIONS
+    if site == "dmart":
+        from configs.envs import DMART_LOCATIONS
+        from web.dmart.batcher import DmartScrapeBatcher
+
+        return DmartScrapeBatcher, DMART_LOCATIONS
+    raise ValueError(f"Unknown site: {site}")
+
+
+class AsyncSiteRunner:
+    """Scrape batcher of one site, with `tabs` pages of its browser in flight.
+
+    Work queue, location switcher, location checker and dumps are
+    those of the sync batcher. Location is browser-wide, so switching location
+    (and recycling browser) waits until all tabs are idle.
+    """
+
+    def __init__(self, site: WEBSITE_LITERAL, batcher, tabs: int = DEFAULT_TABS):
+        self.site = site
+        self.batcher = batcher
+        self.tabs_count = tabs
+        self.client = batcher.scraper.client
+        self.handler = HANDLER_CLASSES[site](batcher.scraper)
+        self.pacer = batcher.pacer
+        self.conn: CDPConnection = None
+        self.tabs: list[CDPTab] = []
+        self.idle_tabs: asyncio.Queue = None
+        self.gate_lock = asyncio.Lock()
+        self.location_idx = None
+        self.is_location_reset = False
+
+    async def open_tabs(self):
+        await asyncio.to_thread(self.client.open_virtual_display)
+        await asyncio.to_thread(self.client.open_browser)
+        self.conn = await CDPConnection.from_address(self.client.browser.address)
+        self.tabs = [await CDPTab.create(self.conn) for _ in range(self.tabs_count)]
+        # queue is kept on reopen, as tasks may be waiting on it
+        if self.idle_tabs is None:
+            self.idle_tabs = asyncio.Queue()
+        for tab in self.tabs:
+            self.idle_tabs.put_nowait(tab)
+        logger.okay(
+            f"  ✓ Opened {logstr.mesg(len(self.tabs))} tabs: {logstr.mesg(self.site)}"
+        )
+
+    async def close_tabs(self):
+        if self.conn is None:
+            return
+        for tab in self.tabs:
+            await tab.close()
+        await self.conn.close()
+        self.conn, self.tabs = None, []
+
+    def is_conn_lost(self) -> bool:
+        return self.conn is None or self.conn.recv_task.done()
+
+    def is_gate_needed(self, location_idx: int) -> bool:
+        # only pages threshold is checked per page, as rss and targets are costly
+        recycle_pages = self.client.recycle_pages
+        return (
+            self.location_idx != location_idx
+            or self.is_location_reset
+            or self.is_conn_lost()
+            or bool(recycle_pages and self.client.page_count >= recycle_pages)
+        )
+
+    async def ensure_location(self, location_idx: int):
+        """Set location (and recycle browser if due) with all tabs taken,
+        so no page is in flight while browser state changes."""
+        if not self.is_gate_needed(location_idx):
+            return
+        async with self.gate_lock:
+            if not self.is_gate_needed(location_idx):
+                return
+            taken = [await self.idle_tabs.get() for _ in self.tabs]
+            reason = await asyncio.to_thread(self.client.get_recycle_reason)
+            if reason:
+                await self.close_tabs()
+                await asyncio.to_thread(self.client.recycle, reason)
+            # `on_recycle` of batcher restores current location after recycle
+            if self.location_idx != location_idx or self.is_location_reset:
+                await asyncio.to_thread(
+                    self.batcher.switcher.set_location, location_idx
+                )
+            if self.is_conn_lost():
+                await self.close_tabs()
+                await self.open_tabs()
+            else:
+                for tab in taken:
+                    self.idle_tabs.put_nowait(tab)
+            self.location_idx = location_idx
+            self.is_location_reset = False
+
+    def get_record_params(self, item: dict, location_name: str) -> dict:
+        return {"website": self.site, "location": location_name, "link": item["link"]}
+
+    def on_fetch_failed(self, item: dict, location_name: str, error: str):
+        batcher = self.batcher
+        recorder = getattr(batcher, "recorder", None)
+        with INSTRUMENT.labels(site=self.site, location=location_name):
+            if recorder:
+                recorder.update_record(**self.get_record_params(item, location_name))
+            incr("products", status="failed")
+            batcher.queue.mark_failed(item, error=error)
+
+    def post_process(
+        self, item: dict, product_info: dict, location_idx: int, location_name: str
+    ):
+        """Dump, check and mark fetched item. It runs in a worker thread, as dump
+        and journal of queue do blocking file io, which would stall all tabs."""
+        batcher = self.batcher
+        product_id = item["product_id"]
+        product_checker = getattr(batcher, "product_checker", None)
+        with INSTRUMENT.labels(site=self.site, location=location_name):
+            batcher.scraper.dump(product_id, resp=product_info, parent=location_name)
+            dump_path = batcher.scraper.get_dump_path(product_id, parent=location_name)
+            try:
+                batcher.checker.check_product_location(
+                    product_info, location_idx, extra_msg="AsyncSiteRunner"
+                )
+            except Exception as e:
+                dump_path.unlink(missing_ok=True)
+                self.pacer.on_failure("location_reset")
+                self.is_location_reset = True
+                self.on_fetch_failed(item, location_name, error=str(e))
+                return
+            if product_checker and not product_checker.check(dump_path):
+                # empty or incorrect product info is re-scraped, not extracted
+                logger.warn(
+                    f"  × Incorrect product info: {logstr.file(brk(dump_path))}"
+                )
+                dump_path.unlink(missing_ok=True)
+                self.on_fetch_failed(
+                    item, location_name, error="Incorrect product info"
+                )
+                return
+            incr("products", status="done")
+            batcher.queue.mark_done(item)
+            self.pacer.on_success()
+
+    async def scrape_item(self, item: dict, location_idx: int, location_name: str):
+        product_id = item["product_id"]
+        await self.ensure_location(location_idx)
+        tab = await self.idle_tabs.get()
+        # token is reserved only when a tab is free, so backoff of pacer
+        # applies to all requests not yet sent
+        await self.pacer.async_wait()
+        try:
+            with span("fetch", site=self.site, location=location_name):
+                product_info = await async_fetch_with_retry(
+                    self.handler.fetch,
+                    tab,
+                    product_id,
+                    pacer=self.pacer,
+                    max_retries=self.handler.max_retries,
+                )
+            self.client.page_count += 1
+        except Exception as e:
+            logger.warn(e)
+            await asyncio.to_thread(
+                self.on_fetch_failed, item, location_name, error=str(e)
+            )
+            return
+        finally:
+            self.idle_tabs.put_nowait(tab)
+        await asyncio.to_thread(
+            self.post_process, item, product_info, location_idx, location_name
+        )
+
+    async def run_location(self, location_idx: int, location_item: dict, links: list):
+        location_name = location_item.get("name", "")
+        location_text = location_item.get("text", "")
+        queue = self.batcher.queue
+        with INSTRUMENT.labels(site=self.site, location=location_name):
+            self.batcher.init_queue(location_name, links)
+        is_logged = False
+        while True:
+            items, wait_seconds = queue.get_ready_items(location_name)
+            if not items and not wait_seconds:
+                break
+            if not items:
+                logger.note(f"> Waiting {wait_seconds:.0f}s for failed items ...")
+                await asyncio.sleep(wait_seconds)
+                continue
+            if not is_logged:
+                logger.hint(f"> New Location: {location_name} ({location_text})")
+                is_logged = True
+            item_queue = asyncio.Queue()
+            for item in items:
+                item_queue.put_nowait(item)
+            await asyncio.gather(
+                *[
+                    self.run_worker(item_queue, location_idx, location_name)
+                    for _ in range(self.tabs_count)
+                ]
+            )
+        queue.log_counts(location_name)
+
+    async def run_worker(
+        self, item_queue: asyncio.Queue, location_idx: int, location_name: str
+    ):
+        """Scrape items one by one, so at most `tabs_count` items are in flight."""
+        while not item_queue.empty():
+            item = item_queue.get_nowait()
+            await self.scrape_item(item, location_idx, location_name)
+
+    async def run(self, locations: list[dict]):
+        column = SITE_LINK_COLUMNS[self.site]
+        links = self.batcher.excel_reader.get_column_by_name(column)
+        try:
+            for location_idx, location_item in enumerate(locations):
+                await self.run_location(location_idx, location_item, links[:])
+        finally:
+            await self.close_tabs()
+            self.batcher.close_scraper()
+
+
+class AsyncScrapeEngine:
+    """One event loop which runs scrape batchers of sites concurrently.
+
+    DrissionPage has no async api, so pages are driven by `CDPTab` on a CDP
+    websocket of each browser, opened by `BrowserClient` of the sync scraper.
+    Location switching stays in DrissionPage, and runs in a worker thread.
+    """
+
+    def __init__(
+        self,
+        tabs: Union[int, dict[str, int]] = DEFAULT_TABS,
+        date_str: str = None,
+        skip_exists: bool = True,
+        close_browser_after_done: bool = False,
+    ):
+        self.tabs = tabs
+        self.date_str = date_str
+        self.skip_exists = skip_exists
+        self.close_browser_after_done = close_browser_after_done
+
+    def get_tabs(self, site: WEBSITE_LITERAL) -> int:
+        if isinstance(self.tabs, dict):
+            return self.tabs.get(site, DEFAULT_TABS)
+        return self.tabs
+
+    async def run_site(self, site: WEBSITE_LITERAL):
+        batcher_class, locations = get_site_batcher_class(site)
+        # batchers read sku sheet and open their browsers, so build them in threads
+        batcher = await asyncio.to_thread(
+            batcher_class,
+            skip_exists=self.skip_exists,
+            date_str=self.date_str,
+            close_browser_after_done=self.close_browser_after_done,
+        )
+        if getattr(batcher, "proxy_pool", None):
+            logger.warn("  × Proxy pool is not used, as async engine drives browser")
+            batcher.proxy_pool = None
+        runner = AsyncSiteRunner(site, batcher, tabs=self.get_tabs(site))
+        await runner.open_tabs()
+        await runner.run(locations)
+
+    async def run(self, sites: list[WEBSITE_LITERAL] = WEBSITE_NAMES):
+        logger.note(f"> Async scrape: {logstr.mesg(brk(', '.join(sites)))}")
+        results = await asyncio.gather(
+            *[self.run_site(site) for site in sites], return_exceptions=True
+        )
+        for site, result in zip(sites, results):
+            if isinstance(result, Exception):
+                logger.warn(f"× AsyncScrapeEngine [{site}]: {result}")
+        if any(isinstance(result, Exception) for result in results):
+            raise RuntimeError("Async scrape failed for some sites")
+
+
+class EngineArgParser(argparse.ArgumentParser):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.add_argument("-w", "--websites", nargs="+", default=WEBSITE_NAMES)
+        self.add_argument("-t", "--tabs", type=int, default=DEFAULT_TABS)
+        self.add_argument("--site-tabs", nargs="+", default=[])
+        self.add_argument("-c", "--close-browser-after-done", action="store_true")
+        self.add_argument("-f", "--force-scrape", action="store_true")
+        self.add_argument("-d", "--date", type=str, default=None)
+        add_profile_arguments(self)
+
+    def parse_args(self):
+        self.args, self.unknown_args = self.parse_known_args(sys.argv[1:])
+        return self.args
+
+
+def get_tabs(args: argparse.Namespace) -> Union[int, dict[str, int]]:
+    """`--site-tabs blinkit=2 zepto=6` overrides `--tabs` of each site."""
+    if not args.site_tabs:
+        return args.tabs
+    tabs = {site: args.tabs for site in WEBSITE_NAMES}
+    for site_tabs in args.site_tabs:
+        site, count = site_tabs.split("=")
+        if site not in WEBSITE_NAMES:
+            raise ValueError(f"Unknown site: {site}")
+        tabs[site] = int(count)
+    return tabs
+
+
+def main(args: argparse.Namespace):
+    from file.work_queue import WorkQueue
+    from web.metrics import PromTextfileExporter
+
+    exporter = PromTextfileExporter(job="async_engine")
+    exporter.start()
+    try:
+        if args.force_scrape:
+            for site in args.websites:
+                WorkQueue(website=site, date_str=args.date).reset()
+        engine = AsyncScrapeEngine(
+            tabs=get_tabs(args),
+            date_str=args.date,
+            skip_exists=not args.force_scrape,
+            close_browser_after_done=args.close_browser_after_done,
+        )
+        asyncio.run(engine.run(sites=args.websites))
+    finally:
+        date_str = args.date or get_now_str()[:10]
+        dump_summary(DATA_ROOT / "output" / date_str / "engine")
+        exporter.stop()
+
+
+if __name__ == "__main__":
+    from web.profiler import profile_from_args
+
+    args = EngineArgParser().parse_args()
+    with Runtimer(), profile_from_args(args):
+        main(args)
+
+    # Case 1: scrape all sites in one event loop, with 4 tabs per site
+    # python -m web.engine
+
+    # Case 2: scrape blinkit and zepto, with 2 tabs of blinkit and 6 of zepto
+    # python -m web.engine -w blinkit zepto --site-tabs blinkit=2 zepto=6
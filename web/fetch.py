@@ -1,12 +1,18 @@
+import asyncio
+
 from tclogger import logger
 from time import sleep
 
+from web.instrument import incr
+from web.pacer import RatePacer
+
 
 def fetch_with_retry(
     fetch: callable,
     *args,
     max_retries: int = 3,
     retry_interval: float = 3,
+    pacer: RatePacer = None,
     **kwargs,
 ):
     retry_count = 0
@@ -18,16 +24,61 @@ def fetch_with_retry(
                 break
             else:
                 logger.warn(f"  × Empty response")
+                if pacer:
+                    pacer.on_failure("empty")
         except Exception as e:
             logger.warn(f"  × Fetch failed: {e}")
+            if pacer:
+                pacer.on_failure("error")
 
         retry_count += 1
         if retry_count < max_retries:
+            incr("fetch_retries")
             logger.note(f"  > Retry ({retry_count}/{max_retries})")
             sleep(retry_interval)
         else:
             err_mesg = f"  × Exceed max retries ({max_retries}). Fetch aborted."
             logger.warn(err_mesg)
+            incr("fetch_aborts")
+            raise RuntimeError(err_mesg)
+
+    return res
+
+
+async def async_fetch_with_retry(
+    fetch: callable,
+    *args,
+    max_retries: int = 3,
+    retry_interval: float = 3,
+    pacer: RatePacer = None,
+    **kwargs,
+):
+    """Same as `fetch_with_retry`, for coroutine function `fetch`."""
+    retry_count = 0
+    res = None
+    while retry_count < max_retries:
+        try:
+            res = await fetch(*args, **kwargs)
+            if res:
+                break
+            else:
+                logger.warn(f"  × Empty response")
+                if pacer:
+                    pacer.on_failure("empty")
+        except Exception as e:
+            logger.warn(f"  × Fetch failed: {e}")
+            if pacer:
+                pacer.on_failure("error")
+
+        retry_count += 1
+        if retry_count < max_retries:
+            incr("fetch_retries")
+            logger.note(f"  > Retry ({retry_count}/{max_retries})")
+            await asyncio.sleep(retry_interval)
+        else:
+            err_mesg = f"  × Exceed max retries ({max_retries}). Fetch aborted."
+            logger.warn(err_mesg)
+            incr("fetch_aborts")
             raise RuntimeError(err_mesg)
 
     return res
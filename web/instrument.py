@@ -0,0 +1,240 @@
+import json
+import os
+import threading
+
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from tclogger import logger, brk, get_now_str
+from time import perf_counter
+from typing import Callable, Protocol
+
+PERCENTILES = [50, 95, 99]
+
+
+def get_percentile(sorted_values: list[float], p: float) -> float:
+    """Percentile with linear interpolation between closest ranks."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * p / 100
+    lower = int(rank)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    ratio = rank - lower
+    return sorted_values[lower] * (1 - ratio) + sorted_values[upper] * ratio
+
+
+def round_float(value: float, ndigits: int = 4) -> float:
+    return None if value is None else round(value, ndigits)
+
+
+class SpanListener(Protocol):
+    def enter_span(self, stage: str): ...
+
+    def exit_span(self, stage: str): ...
+
+
+class Instrument:
+    """Span durations and counters of one run, labelled by site, location and stage.
+
+    Labels set by `set_labels` or `labels` are thread-local, and merged into
+    labels of each span and counter recorded in the same thread.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.start_at = get_now_str()
+            self.spans: dict[tuple, list[float]] = {}
+            self.counters: dict[tuple, float] = {}
+            self.gauges: dict[tuple, float] = {}
+            self.samplers: list[Callable[[], None]] = []
+            self.span_listeners: list[SpanListener] = []
+
+    def get_labels(self) -> dict:
+        return dict(getattr(self.local, "labels", {}))
+
+    def set_labels(self, **labels):
+        self.local.labels = {**self.get_labels(), **labels}
+
+    @contextmanager
+    def labels(self, **labels):
+        old_labels = self.get_labels()
+        self.set_labels(**labels)
+        try:
+            yield
+        finally:
+            self.local.labels = old_labels
+
+    def get_key(self, name: str, labels: dict) -> tuple[str, tuple]:
+        labels = {**self.get_labels(), **labels}
+        labels = {k: v for k, v in labels.items() if v is not None}
+        return name, tuple(sorted(labels.items()))
+
+    def observe(self, stage: str, seconds: float, **labels):
+        key = self.get_key(stage, labels)
+        with self.lock:
+            self.spans.setdefault(key, []).append(seconds)
+
+    def incr(self, name: str, value: float = 1, **labels):
+        key = self.get_key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        key = self.get_key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def add_sampler(self, sampler: Callable[[], None]):
+        """Sampler is called before each export, to refresh gauges."""
+        with self.lock:
+            if sampler not in self.samplers:
+                self.samplers.append(sampler)
+
+    def remove_sampler(self, sampler: Callable[[], None]):
+        with self.lock:
+            if sampler in self.samplers:
+                self.samplers.remove(sampler)
+
+    def sample(self):
+        with self.lock:
+            samplers = list(self.samplers)
+        for sampler in samplers:
+            try:
+                sampler()
+            except Exception as e:
+                logger.warn(f"× Instrument.sample: {e}")
+
+    def add_span_listener(self, listener: "SpanListener"):
+        """Listener is notified when spans enter and exit, in thread of span."""
+        with self.lock:
+            if listener not in self.span_listeners:
+                self.span_listeners.append(listener)
+
+    def remove_span_listener(self, listener: "SpanListener"):
+        with self.lock:
+            if listener in self.span_listeners:
+                self.span_listeners.remove(listener)
+
+    @contextmanager
+    def span(self, stage: str, **labels):
+        listeners = list(self.span_listeners)
+        for listener in listeners:
+            listener.enter_span(stage)
+        start = perf_counter()
+        try:
+            yield
+        except Exception:
+            self.incr(f"{stage}_errors", **labels)
+            raise
+        finally:
+            self.observe(stage, perf_counter() - start, **labels)
+            for listener in reversed(listeners):
+                listener.exit_span(stage)
+
+    def timed(self, stage: str, **labels) -> Callable:
+        """Decorator which records each call of func as a span of stage."""
+
+        def decorator(func: Callable) -> Callable:
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(stage, **labels):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def summarize_values(self, values: list[float]) -> dict:
+        sorted_values = sorted(values)
+        summary = {"count": len(values), "total": round_float(sum(values))}
+        for p in PERCENTILES:
+            summary[f"p{p}"] = round_float(get_percentile(sorted_values, p))
+        summary["max"] = round_float(sorted_values[-1])
+        return summary
+
+    def summarize(self) -> dict:
+        with self.lock:
+            spans = {key: list(values) for key, values in self.spans.items()}
+            counters = dict(self.counters)
+            gauges = dict(self.gauges)
+        # aggregate spans of all locations for each (site, stage)
+        stage_values: dict[tuple, list[float]] = {}
+        for (stage, labels), values in spans.items():
+            site = dict(labels).get("site", None)
+            stage_values.setdefault((site, stage), []).extend(values)
+        return {
+            "start_at": self.start_at,
+            "end_at": get_now_str(),
+            "stages": [
+                {"stage": stage, "site": site, **self.summarize_values(values)}
+                for (site, stage), values in stage_values.items()
+            ],
+            "spans": [
+                {"stage": stage, **dict(labels), **self.summarize_values(values)}
+                for (stage, labels), values in spans.items()
+            ],
+            "counters": [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in counters.items()
+            ],
+            "gauges": [
+                {"name": name, **dict(labels), "value": value}
+                for (name, labels), value in gauges.items()
+            ],
+        }
+
+    def dump(self, output_root: Path) -> Path:
+        run_id = self.start_at.replace(" ", "_").replace(":", "-")
+        summary_path = output_root / f"instrument_{run_id}.json"
+        summary_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = summary_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            json.dump(self.summarize(), wf, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, summary_path)
+        logger.okay(f"  * Instrument summary: {brk(summary_path)}")
+        return summary_path
+
+
+INSTRUMENT = Instrument()
+
+
+def set_labels(**labels):
+    INSTRUMENT.set_labels(**labels)
+
+
+def span(stage: str, **labels):
+    return INSTRUMENT.span(stage, **labels)
+
+
+def timed(stage: str, **labels) -> Callable:
+    return INSTRUMENT.timed(stage, **labels)
+
+
+def incr(name: str, value: float = 1, **labels):
+    INSTRUMENT.incr(name, value, **labels)
+
+
+def set_gauge(name: str, value: float, **labels):
+    INSTRUMENT.set_gauge(name, value, **labels)
+
+
+def dump_summary(output_root: Path) -> Path:
+    return INSTRUMENT.dump(output_root)
+
+
+if __name__ == "__main__":
+    from time import sleep
+
+    set_labels(site="blinkit", location="mumbai")
+    for i in range(5):
+        with span("fetch"):
+            sleep(0.01 * i)
+        incr("products", status="done")
+    print(json.dumps(INSTRUMENT.summarize(), indent=4))
+
+    # python -m web.instrument
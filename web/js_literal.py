@@ -0,0 +1,167 @@
+import json
+import re
+
+RE_NUMBER = re.compile(r"-?(?:0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)")
+RE_IDENTIFIER = re.compile(r"[A-Za-z_$][\w$]*")
+JS_CONSTANTS = {"true": "true", "false": "false", "null": "null", "undefined": "null"}
+JS_ESCAPE_CHARS = {
+    "n": "\n",
+    "t": "\t",
+    "r": "\r",
+    "b": "\b",
+    "f": "\f",
+    "v": "\v",
+    "0": "\0",
+}
+
+
+class JsLiteralParser:
+    """Tolerant tokenizer which converts a JS object literal to JSON string.
+
+    Supports what minifiers emit in data literals: unquoted and numeric keys,
+    single-quoted and template strings without substitutions, trailing commas,
+    comments, `!0`/`!1`, `void 0` and `undefined`.
+    Raise `ValueError` on anything else, such as functions or expressions.
+    """
+
+    def __init__(self, js_str: str):
+        self.js_str = js_str
+        self.n = len(js_str)
+
+    def error(self, mesg: str, i: int) -> ValueError:
+        snippet = self.js_str[max(i - 20, 0) : i + 20]
+        return ValueError(f"{mesg} at {i}: {snippet!r}")
+
+    def skip_comment(self, i: int) -> int:
+        if self.js_str.startswith("//", i):
+            end = self.js_str.find("\n", i)
+            return self.n if end < 0 else end + 1
+        if self.js_str.startswith("/*", i):
+            end = self.js_str.find("*/", i + 2)
+            if end < 0:
+                raise self.error("Unclosed comment", i)
+            return end + 2
+        return i
+
+    def read_string(self, i: int) -> tuple[str, int]:
+        quote = self.js_str[i]
+        chars = []
+        i += 1
+        while i < self.n:
+            ch = self.js_str[i]
+            if ch == quote:
+                return "".join(chars), i + 1
+            if quote == "`" and self.js_str.startswith("${", i):
+                raise self.error("Template substitution not supported", i)
+            if ch != "\\":
+                chars.append(ch)
+                i += 1
+                continue
+            esc = self.js_str[i + 1 : i + 2]
+            if esc in JS_ESCAPE_CHARS:
+                chars.append(JS_ESCAPE_CHARS[esc])
+                i += 2
+            elif esc == "x":
+                chars.append(chr(int(self.js_str[i + 2 : i + 4], 16)))
+                i += 4
+            elif esc == "u" and self.js_str.startswith("{", i + 2):
+                end = self.js_str.index("}", i + 3)
+                chars.append(chr(int(self.js_str[i + 3 : end], 16)))
+                i = end + 1
+            elif esc == "u":
+                chars.append(chr(int(self.js_str[i + 2 : i + 6], 16)))
+                i += 6
+            elif esc == "\r" and self.js_str.startswith("\r\n", i + 1):
+                i += 3
+            elif esc in ("\n", "\r", "\u2028", "\u2029"):
+                i += 2
+            else:
+                chars.append(esc)
+                i += 2
+        raise self.error("Unclosed string", i)
+
+    def read_number(self, i: int) -> tuple[str, int]:
+        match = RE_NUMBER.match(self.js_str, i)
+        if not match:
+            raise self.error("Invalid number", i)
+        num_str = match.group(0)
+        if num_str.lstrip("-")[:2].lower() == "0x":
+            value = int(num_str, 16)
+        elif re.fullmatch(r"-?\d+", num_str):
+            value = int(num_str)
+        else:
+            value = float(num_str)
+            if value.is_integer() and abs(value) < 2**53:
+                value = int(value)
+        return json.dumps(value), match.end()
+
+    def parse(self) -> str:
+        tokens: list[str] = []
+        stack: list[str] = []
+        i = 0
+        while i < self.n:
+            ch = self.js_str[i]
+            if ch.isspace():
+                i += 1
+                continue
+            if ch == "/":
+                j = self.skip_comment(i)
+                if j == i:
+                    raise self.error("Unexpected `/`", i)
+                i = j
+                continue
+            is_key = bool(stack) and stack[-1] == "{" and tokens[-1] in ("{", ",")
+            if ch in "{[":
+                stack.append(ch)
+                tokens.append(ch)
+                i += 1
+            elif ch in "}]":
+                if not stack or "{[".index(stack.pop()) != "}]".index(ch):
+                    raise self.error("Unbalanced bracket", i)
+                # trailing comma
+                if tokens[-1] == ",":
+                    tokens.pop()
+                tokens.append(ch)
+                i += 1
+            elif ch in ":,":
+                tokens.append(ch)
+                i += 1
+            elif ch in "\"'`":
+                value, i = self.read_string(i)
+                tokens.append(json.dumps(value, ensure_ascii=False))
+            elif ch == "!" and self.js_str[i + 1 : i + 2] in ("0", "1"):
+                tokens.append("true" if self.js_str[i + 1] == "0" else "false")
+                i += 2
+            elif ch == "-" or ch == "." or ch.isdigit():
+                num_str, i = self.read_number(i)
+                tokens.append(json.dumps(num_str) if is_key else num_str)
+            else:
+                match = RE_IDENTIFIER.match(self.js_str, i)
+                if not match:
+                    raise self.error(f"Unexpected char {ch!r}", i)
+                name = match.group(0)
+                i = match.end()
+                if is_key:
+                    tokens.append(json.dumps(name))
+                elif name in JS_CONSTANTS:
+                    tokens.append(JS_CONSTANTS[name])
+                elif name == "void" and self.js_str[i:].lstrip().startswith("0"):
+                    i = self.js_str.index("0", i) + 1
+                    tokens.append("null")
+                else:
+                    raise self.error(f"Unsupported identifier `{name}`", i)
+        if stack:
+            raise self.error("Unclosed bracket", i)
+        return "".join(tokens)
+
+
+def js_literal_to_json(js_str: str) -> str:
+    return JsLiteralParser(js_str).parse()
+
+
+if __name__ == "__main__":
+    js_str = """[{id:1,name:'Fruits \\u0026 Vegetables',is_new:!1,
+    subCategories:[{id:1489,name:"Fresh Vegetables",icon:void 0,},],}]"""
+    print(json.loads(js_literal_to_json(js_str)))
+
+    # python -m web.js_literal
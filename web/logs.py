@@ -1,7 +1,10 @@
-import pandas as pd
 import traceback
 
 from tclogger import logger, logstr
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def log_link_idx(link_idx: int, total_links: int):
@@ -11,13 +14,15 @@ def log_link_idx(link_idx: int, total_links: int):
     )
 
 
-def log_df_tail(df: pd.DataFrame, n: int = 5):
+def log_df_tail(df: "pd.DataFrame", n: int = 5):
+    import pandas as pd
+
     logger.mesg(f"> DataFrame tail {n} rows:")
     with pd.option_context("display.show_dimensions", False):
         logger.line(df.tail(n), indent=2)
 
 
-def log_df_dims(df: pd.DataFrame):
+def log_df_dims(df: "pd.DataFrame"):
     row_cnt, col_cnt = df.shape
     logger.mesg(f"* [{logstr.file(row_cnt)} rows x {logstr.file(col_cnt)} cols]")
 
@@ -0,0 +1,182 @@
+import os
+import re
+import threading
+
+from pathlib import Path
+from tclogger import logger, brk
+from time import time
+
+from configs.envs import DATA_ROOT, METRICS_SETTINGS
+from web.instrument import INSTRUMENT, Instrument
+
+METRIC_PREFIX = "sku"
+# buckets (seconds) of stage durations, which cover page loads and excel stages
+DURATION_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300]
+
+
+def norm_metric_name(name: str) -> str:
+    return re.sub(r"[^a-zA-Z0-9_]", "_", name)
+
+
+def escape_label_value(value) -> str:
+    value = str(value)
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels_to_str(labels: dict) -> str:
+    if not labels:
+        return ""
+    label_strs = [
+        f'{norm_metric_name(k)}="{escape_label_value(v)}"' for k, v in labels.items()
+    ]
+    return "{" + ",".join(label_strs) + "}"
+
+
+class PromTextfileExporter:
+    """Write metrics of instrument to `<job>.prom` for textfile collector of
+    node_exporter, periodically during run, and once more when stopped.
+
+    Textfile dir is `metrics_settings.textfile_dir` in secrets, or `data/metrics`.
+    """
+
+    def __init__(
+        self,
+        job: str,
+        interval: float = None,
+        textfile_dir: Path = None,
+        instrument: Instrument = INSTRUMENT,
+    ):
+        self.job = job
+        self.interval = interval or METRICS_SETTINGS.get("interval", 30)
+        self.textfile_dir = Path(
+            textfile_dir
+            or METRICS_SETTINGS.get("textfile_dir", None)
+            or DATA_ROOT / "metrics"
+        )
+        self.prom_path = self.textfile_dir / f"{norm_metric_name(job)}.prom"
+        self.instrument = instrument
+        self.start_ts = time()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def get_name(self, name: str) -> str:
+        return f"{METRIC_PREFIX}_{norm_metric_name(name)}"
+
+    def job_lines(self, is_running: bool) -> list[str]:
+        # alert on stale or unfinished runs by these gauges
+        labels_str = labels_to_str({"job": self.job})
+        values = {
+            "run_start_timestamp_seconds": self.start_ts,
+            "run_running": int(is_running),
+            "last_export_timestamp_seconds": time(),
+        }
+        lines = []
+        for name, value in values.items():
+            metric = self.get_name(name)
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric}{labels_str} {value}")
+        return lines
+
+    def counter_lines(self, counters: dict[tuple, float]) -> list[str]:
+        lines = []
+        families: dict[str, list[str]] = {}
+        for (name, labels), value in counters.items():
+            metric = self.get_name(f"{name}_total")
+            labels_str = labels_to_str({"job": self.job, **dict(labels)})
+            families.setdefault(metric, []).append(f"{metric}{labels_str} {value}")
+        for metric, samples in families.items():
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(samples)
+        return lines
+
+    def gauge_lines(self, gauges: dict[tuple, float]) -> list[str]:
+        lines = []
+        families: dict[str, list[str]] = {}
+        for (name, labels), value in gauges.items():
+            metric = self.get_name(name)
+            labels_str = labels_to_str({"job": self.job, **dict(labels)})
+            families.setdefault(metric, []).append(f"{metric}{labels_str} {value}")
+        for metric, samples in families.items():
+            lines.append(f"# TYPE {metric} gauge")
+            lines.extend(samples)
+        return lines
+
+    def histogram_lines(self, spans: dict[tuple, list[float]]) -> list[str]:
+        metric = self.get_name("stage_duration_seconds")
+        lines = [f"# TYPE {metric} histogram"] if spans else []
+        for (stage, labels), values in spans.items():
+            labels = {"job": self.job, "stage": stage, **dict(labels)}
+            for bucket in DURATION_BUCKETS:
+                count = sum(value <= bucket for value in values)
+                bucket_str = labels_to_str({**labels, "le": bucket})
+                lines.append(f"{metric}_bucket{bucket_str} {count}")
+            inf_str = labels_to_str({**labels, "le": "+Inf"})
+            lines.append(f"{metric}_bucket{inf_str} {len(values)}")
+            lines.append(f"{metric}_sum{labels_to_str(labels)} {sum(values)}")
+            lines.append(f"{metric}_count{labels_to_str(labels)} {len(values)}")
+        return lines
+
+    def to_text(self, is_running: bool = True) -> str:
+        self.instrument.sample()
+        with self.instrument.lock:
+            spans = {key: list(values) for key, values in self.instrument.spans.items()}
+            counters = dict(self.instrument.counters)
+            gauges = dict(self.instrument.gauges)
+        lines = [
+            *self.job_lines(is_running),
+            *self.counter_lines(counters),
+            *self.gauge_lines(gauges),
+            *self.histogram_lines(spans),
+        ]
+        return "\n".join(lines) + "\n"
+
+    def export(self, is_running: bool = True):
+        """Write to tmp file and rename, so collector never reads partial file."""
+        text = self.to_text(is_running=is_running)
+        self.textfile_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.prom_path.with_suffix(".prom.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            wf.write(text)
+        os.replace(tmp_path, self.prom_path)
+
+    def run_periodic(self):
+        while not self.stop_event.wait(self.interval):
+            try:
+                self.export(is_running=True)
+            except Exception as e:
+                logger.warn(f"× PromTextfileExporter.export: {e}")
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run_periodic, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+        self.export(is_running=False)
+        logger.okay(f"  * Metrics exported: {brk(self.prom_path)}")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+if __name__ == "__main__":
+    from web.instrument import set_labels, span, incr
+
+    set_labels(site="blinkit", location="mumbai")
+    with PromTextfileExporter(job="demo", interval=1) as exporter:
+        for i in range(3):
+            with span("fetch"):
+                pass
+            incr("products", status="done")
+    print(exporter.prom_path.read_text())
+
+    # python -m web.metrics
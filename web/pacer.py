@@ -0,0 +1,160 @@
+import asyncio
+import json
+import os
+import threading
+
+from tclogger import logger, logstr, brk, get_now_str
+from time import sleep, monotonic
+from typing import Literal
+
+from configs.envs import LOGS_ROOT, PACER_SETTINGS
+
+PACER_SIGNAL = Literal["empty", "captcha", "http_429", "location_reset", "error"]
+# initial seconds between requests, which are the former fixed sleeps
+DEFAULT_INTERVALS = {"blinkit": 2, "zepto": 3, "dmart": 2, "swiggy": 3}
+CAPTCHA_MARKS = ["captcha", "access denied", "are you a robot", "verify you are human"]
+
+
+def is_captcha_title(title: str) -> bool:
+    title = (title or "").lower()
+    return any(mark in title for mark in CAPTCHA_MARKS)
+
+
+class RatePacer:
+    """Token bucket whose refill rate is tuned by AIMD:
+    additive increase on healthy responses, multiplicative decrease on signals
+    of throttling (empty packets, captchas, HTTP 429, location resets)."""
+
+    def __init__(
+        self,
+        site: str,
+        interval: float = 3,
+        min_interval: float = None,
+        max_interval: float = None,
+        increase: float = None,
+        decrease: float = 0.5,
+        publish_every: int = 20,
+    ):
+        self.site = site
+        self.min_interval = min_interval or interval / 4
+        self.max_interval = max_interval or interval * 8
+        self.rate = 1 / interval
+        # by default, +10% of initial rate per healthy response
+        self.increase = increase or self.rate * 0.1
+        self.decrease = decrease
+        self.publish_every = publish_every
+        self.tokens = 1.0
+        self.last_ts = monotonic()
+        self.success_count = 0
+        self.signal_counts: dict[str, int] = {}
+        self.lock = threading.Lock()
+        self.publish_path = LOGS_ROOT / "pacers" / f"{site}.json"
+
+    @property
+    def interval(self) -> float:
+        return 1 / self.rate
+
+    def clip_rate(self, rate: float) -> float:
+        return min(max(rate, 1 / self.max_interval), 1 / self.min_interval)
+
+    def refill(self):
+        now = monotonic()
+        self.tokens = min(self.tokens + (now - self.last_ts) * self.rate, 1.0)
+        self.last_ts = now
+
+    def reserve(self) -> float:
+        """Consume a token, and return seconds to wait until it is available."""
+        with self.lock:
+            self.refill()
+            wait_seconds = (1 - self.tokens) / self.rate
+            # reserve the token now, so concurrent callers are spaced out
+            self.tokens -= 1
+        return wait_seconds
+
+    def wait(self):
+        """Block until a token is available, and consume it."""
+        wait_seconds = self.reserve()
+        if wait_seconds > 0:
+            logger.note(f"  > Waiting {wait_seconds:.1f}s for next ...")
+            sleep(wait_seconds)
+
+    async def async_wait(self):
+        """Same as `wait`, but only suspends the calling task."""
+        wait_seconds = self.reserve()
+        if wait_seconds > 0:
+            logger.note(f"  > Waiting {wait_seconds:.1f}s for next ...")
+            await asyncio.sleep(wait_seconds)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = self.clip_rate(self.rate + self.increase)
+            self.success_count += 1
+            should_publish = self.success_count % self.publish_every == 0
+        if should_publish:
+            self.publish()
+
+    def on_failure(self, signal: PACER_SIGNAL = "error"):
+        with self.lock:
+            self.rate = self.clip_rate(self.rate * self.decrease)
+            self.signal_counts[signal] = self.signal_counts.get(signal, 0) + 1
+        logger.warn(
+            f"  × Pacer [{self.site}] backoff on {logstr.file(brk(signal))}: "
+            f"interval={self.interval:.1f}s"
+        )
+        self.publish()
+
+    def to_dict(self) -> dict:
+        return {
+            "site": self.site,
+            "rate": round(self.rate, 4),
+            "interval": round(self.interval, 2),
+            "success_count": self.success_count,
+            "signal_counts": dict(self.signal_counts),
+            "now": get_now_str(),
+        }
+
+    def publish(self):
+        data = self.to_dict()
+        logger.mesg(
+            f"  * Pacer [{self.site}]: "
+            f"rate={data['rate']}/s, interval={data['interval']}s"
+        )
+        try:
+            self.publish_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.publish_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as wf:
+                json.dump(data, wf, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.publish_path)
+        except Exception as e:
+            logger.warn(f"× RatePacer.publish: {e}")
+
+
+PACERS: dict[str, RatePacer] = {}
+PACERS_LOCK = threading.Lock()
+
+
+def get_pacer(
+    site: str,
+    interval: float = None,
+    scope: str = None,
+    settings_key: str = None,
+    **kwargs,
+) -> RatePacer:
+    """Get shared pacer of site. Params in `pacer_settings` of secrets override args,
+    and only take effect when the pacer is first created in process.
+
+    `scope` gives a separate pacer, such as `"traverser"`, whose settings are
+    under key `"<site>/<scope>"`, or `settings_key` if given (such as site for
+    pacers of proxies, which share settings of site)."""
+    key = f"{site}/{scope}" if scope else site
+    settings_key = settings_key or key
+    with PACERS_LOCK:
+        if key not in PACERS:
+            interval = interval or DEFAULT_INTERVALS.get(site, 3)
+            settings = {
+                "interval": interval,
+                **kwargs,
+                **PACER_SETTINGS.get(settings_key, {}),
+            }
+            PACERS[key] = RatePacer(site=key, **settings)
+        return PACERS[key]
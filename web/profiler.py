@@ -0,0 +1,258 @@
+import argparse
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import tracemalloc
+
+from contextlib import nullcontext
+from pathlib import Path
+from tclogger import logger, logstr, brk, get_now_str
+from typing import Literal
+
+from configs.envs import LOGS_ROOT
+from web.instrument import INSTRUMENT, Instrument
+from cli.arg import PROFILE_MODES
+
+PROFILE_MODE_LITERAL = Literal["cprofile", "pyinstrument", "tracemalloc"]
+
+
+def get_entrypoint() -> str:
+    """Module name of `python -m <module>`, or stem of script."""
+    spec = getattr(sys.modules.get("__main__"), "__spec__", None)
+    if spec and spec.name:
+        return spec.name
+    return Path(sys.argv[0]).stem or "python"
+
+
+class Profiler:
+    """Profile whole run, or only spans of a named stage of instrument.
+
+    cProfile and pyinstrument only see the thread which starts them, so a
+    whole-run profile covers the main thread; a stage-scoped profile covers
+    each thread which enters the stage, and are merged at exit.
+    tracemalloc is process-wide, and with a stage it accumulates allocations
+    made while any thread is inside the stage.
+
+    Artifacts: `logs/profiles/<date>/<entrypoint>/<mode>_<time>[_<stage>].*`
+    """
+
+    def __init__(
+        self,
+        mode: PROFILE_MODE_LITERAL,
+        entrypoint: str = None,
+        stage: str = None,
+        top: int = 20,
+        instrument: Instrument = INSTRUMENT,
+    ):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {mode}")
+        self.mode = mode
+        self.entrypoint = entrypoint or get_entrypoint()
+        self.stage = stage
+        self.top = top
+        self.instrument = instrument
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.profilers = []
+        self.stage_depth = 0
+        self.stage_count = 0
+        self.alloc_stats: dict[str, list[int]] = {}
+        self.init_paths()
+
+    def init_paths(self):
+        now_str = get_now_str()
+        date_str, time_str = now_str[:10], now_str[11:].replace(":", "-")
+        self.profile_root = LOGS_ROOT / "profiles" / date_str / self.entrypoint
+        stage_suffix = f"_{self.stage}" if self.stage else ""
+        self.profile_stem = f"{self.mode}_{time_str}{stage_suffix}"
+
+    def get_path(self, suffix: str) -> Path:
+        return self.profile_root / f"{self.profile_stem}{suffix}"
+
+    def new_profiler(self):
+        if self.mode == "cprofile":
+            return cProfile.Profile()
+        try:
+            from pyinstrument import Profiler as PyinstrumentProfiler
+        except ImportError:
+            raise ImportError("`pip install pyinstrument` for `--profile pyinstrument`")
+        return PyinstrumentProfiler()
+
+    def start_profiler(self):
+        """Profiler of current thread, which is reused on re-entering stage."""
+        profiler = getattr(self.local, "profiler", None)
+        if profiler is None:
+            profiler = self.new_profiler()
+            self.local.profiler = profiler
+            with self.lock:
+                self.profilers.append(profiler)
+        if self.mode == "cprofile":
+            profiler.enable()
+        else:
+            profiler.start()
+
+    def stop_profiler(self):
+        profiler = self.local.profiler
+        if self.mode == "cprofile":
+            profiler.disable()
+        else:
+            profiler.stop()
+
+    def enter_span(self, stage: str):
+        if stage != self.stage:
+            return
+        if self.mode == "tracemalloc":
+            with self.lock:
+                self.stage_depth += 1
+                self.stage_count += 1
+                if self.stage_depth == 1:
+                    self.stage_snapshot = tracemalloc.take_snapshot()
+            return
+        depth = getattr(self.local, "depth", 0)
+        self.local.depth = depth + 1
+        if depth == 0:
+            self.start_profiler()
+            with self.lock:
+                self.stage_count += 1
+
+    def exit_span(self, stage: str):
+        if stage != self.stage:
+            return
+        if self.mode == "tracemalloc":
+            with self.lock:
+                self.stage_depth -= 1
+                if self.stage_depth == 0:
+                    self.add_alloc_stats(self.stage_snapshot)
+            return
+        self.local.depth -= 1
+        if self.local.depth == 0:
+            self.stop_profiler()
+
+    def add_alloc_stats(self, start_snapshot: tracemalloc.Snapshot):
+        snapshot = tracemalloc.take_snapshot()
+        for stat in snapshot.compare_to(start_snapshot, "lineno"):
+            line = str(stat.traceback[0])
+            size_count = self.alloc_stats.setdefault(line, [0, 0])
+            size_count[0] += stat.size_diff
+            size_count[1] += stat.count_diff
+
+    def start(self):
+        logger.note(
+            f"> Profiling {logstr.mesg(brk(self.entrypoint))} with "
+            f"{logstr.mesg(self.mode)}"
+            + (f", stage: {logstr.mesg(brk(self.stage))}" if self.stage else "")
+        )
+        if self.mode == "tracemalloc":
+            tracemalloc.start(25)
+        if self.stage:
+            self.instrument.add_span_listener(self)
+        elif self.mode != "tracemalloc":
+            self.start_profiler()
+
+    def stop(self):
+        if self.stage:
+            self.instrument.remove_span_listener(self)
+        elif self.mode != "tracemalloc":
+            self.stop_profiler()
+        self.profile_root.mkdir(parents=True, exist_ok=True)
+        if self.mode == "cprofile":
+            summary = self.save_cprofile()
+        elif self.mode == "pyinstrument":
+            summary = self.save_pyinstrument()
+        else:
+            summary = self.save_tracemalloc()
+            tracemalloc.stop()
+        summary_path = self.get_path(".txt")
+        with open(summary_path, "w", encoding="utf-8") as wf:
+            wf.write(summary)
+        logger.note(f"> Top {self.top} hotspots:")
+        print(summary)
+        logger.okay(f"  * Profile: {brk(self.profile_root / self.profile_stem)}.*")
+
+    def save_cprofile(self) -> str:
+        if not self.profilers:
+            return f"No spans of stage: {self.stage}\n"
+        stats = pstats.Stats(self.profilers[0])
+        for profiler in self.profilers[1:]:
+            stats.add(profiler)
+        stats.dump_stats(self.get_path(".prof"))
+        stream = io.StringIO()
+        stats = pstats.Stats(str(self.get_path(".prof")), stream=stream)
+        stats.sort_stats("cumulative").print_stats(self.top)
+        stream.write("\n")
+        stats.sort_stats("tottime").print_stats(self.top)
+        return stream.getvalue()
+
+    def save_pyinstrument(self) -> str:
+        from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer
+        from pyinstrument.session import Session
+
+        sessions = [p.last_session for p in self.profilers if p.last_session]
+        if not sessions:
+            return f"No spans of stage: {self.stage}\n"
+        session = sessions[0]
+        for other in sessions[1:]:
+            session = Session.combine(session, other)
+        with open(self.get_path(".html"), "w", encoding="utf-8") as wf:
+            wf.write(HTMLRenderer().render(session))
+        text = ConsoleRenderer(unicode=True, color=False).render(session)
+        return "\n".join(text.splitlines()[: self.top * 3]) + "\n"
+
+    def save_tracemalloc(self) -> str:
+        if self.stage:
+            alloc_items = sorted(
+                self.alloc_stats.items(), key=lambda item: -item[1][0]
+            )[: self.top]
+            lines = [f"Allocations in {self.stage_count} spans of {self.stage}:"]
+            for line, (size, count) in alloc_items:
+                lines.append(f"{size / 1024:>12.1f} KiB {count:>10} blocks  {line}")
+            return "\n".join(lines) + "\n"
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(str(self.get_path(".tracemalloc")))
+        current, peak = tracemalloc.get_traced_memory()
+        lines = [
+            f"Current: {current / 1024**2:.1f} MiB, peak: {peak / 1024**2:.1f} MiB"
+        ]
+        for stat in snapshot.statistics("lineno")[: self.top]:
+            lines.append(
+                f"{stat.size / 1024:>12.1f} KiB {stat.count:>10} blocks  "
+                f"{stat.traceback[0]}"
+            )
+        return "\n".join(lines) + "\n"
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+
+def profile_from_args(args: argparse.Namespace, entrypoint: str = None):
+    """Profiler if `--profile` is given, otherwise a no-op context."""
+    if not getattr(args, "profile", None):
+        return nullcontext()
+    return Profiler(
+        mode=args.profile,
+        entrypoint=entrypoint,
+        stage=args.profile_stage,
+        top=args.profile_top,
+    )
+
+
+if __name__ == "__main__":
+    from web.instrument import span
+
+    def build(n: int) -> list[str]:
+        return [str(i) * 10 for i in range(n)]
+
+    with Profiler(mode="cprofile", stage="extract", top=5):
+        for i in range(5):
+            with span("extract"):
+                build(10000)
+            with span("dump"):
+                build(10000)
+
+    # python -m web.profiler
@@ -0,0 +1,338 @@
+import json
+import os
+import threading
+
+from collections import deque
+
+from tclogger import logger, logstr, brk, get_now_str
+from time import sleep, time
+from typing import Optional, TypedDict
+
+from configs.envs import DATA_ROOT, LOGS_ROOT, PROXY_SETTINGS
+from web.instrument import incr, set_gauge
+from web.pacer import PACER_SIGNAL
+
+
+class ProxySettingType(TypedDict):
+    name: str
+    url: str
+    port: int
+
+
+class ProxyNode:
+    """One proxy, and its health counters in this process.
+    Failure rate is over the last `window` results, which are cleared when
+    cooldown starts, so it reflects recent health only."""
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        port: int,
+        window: int = 20,
+        ewma_alpha: float = 0.2,
+    ):
+        self.name = name
+        self.url = url
+        self.port = port
+        self.ewma_alpha = ewma_alpha
+        self.results: deque[bool] = deque(maxlen=window)
+        self.request_count = 0
+        self.failure_count = 0
+        self.consecutive_failures = 0
+        self.latency: float = None
+        self.cooldown_until = 0.0
+        self.signal_counts: dict[str, int] = {}
+
+    @property
+    def failure_rate(self) -> float:
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def on_success(self, latency: float = None):
+        self.results.append(True)
+        self.request_count += 1
+        self.consecutive_failures = 0
+        if latency is not None:
+            if self.latency is None:
+                self.latency = latency
+            else:
+                a = self.ewma_alpha
+                self.latency = a * latency + (1 - a) * self.latency
+
+    def on_failure(self, signal: PACER_SIGNAL = "error"):
+        self.results.append(False)
+        self.request_count += 1
+        self.failure_count += 1
+        self.consecutive_failures += 1
+        self.signal_counts[signal] = self.signal_counts.get(signal, 0) + 1
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "port": self.port,
+            "request_count": self.request_count,
+            "failure_count": self.failure_count,
+            "failure_rate": round(self.failure_rate, 4),
+            "consecutive_failures": self.consecutive_failures,
+            "latency": round(self.latency, 3) if self.latency is not None else None,
+            "cooldown_until": self.cooldown_until,
+            "signal_counts": dict(self.signal_counts),
+        }
+
+
+class ProxyPool:
+    """Proxies of one site, each with its own browser profile and port.
+
+    Locations are stickily assigned to proxies, as location sessions live in
+    browser profiles: a location keeps its proxy while it is healthy, and
+    fails over to the least loaded healthy proxy otherwise. Assignments are
+    persisted in `data/proxies/<site>.json`, so stickiness holds across runs.
+
+    A proxy is unhealthy during cooldown, which starts after
+    `max_consecutive_failures` failures in a row, or when failure rate of last
+    `window` results exceeds `max_failure_rate` after `min_requests` results.
+
+    Each proxy needs a unique `port`, as DrissionPage attaches browsers on same
+    port to the first one launched, with its proxy.
+    """
+
+    def __init__(
+        self,
+        site: str,
+        proxies: list[ProxySettingType],
+        max_failure_rate: float = 0.5,
+        min_requests: int = 10,
+        window: int = 20,
+        max_consecutive_failures: int = 3,
+        cooldown: float = 300,
+    ):
+        if not proxies:
+            raise ValueError(f"No proxies in pool of site: {site}")
+        self.site = site
+        self.nodes: dict[str, ProxyNode] = {}
+        ports = set()
+        for idx, proxy in enumerate(proxies):
+            name = str(proxy.get("name") or idx)
+            if name in self.nodes:
+                raise ValueError(f"Duplicated proxy name of {site}: {name}")
+            port = proxy.get("port")
+            if not port:
+                raise ValueError(f"No port of proxy of {site}: {name}")
+            if int(port) in ports:
+                raise ValueError(f"Duplicated proxy port of {site}: {port}")
+            ports.add(int(port))
+            self.nodes[name] = ProxyNode(name, proxy["url"], port=port, window=window)
+        self.max_failure_rate = max_failure_rate
+        self.min_requests = min_requests
+        self.max_consecutive_failures = max_consecutive_failures
+        self.cooldown = cooldown
+        self.lock = threading.RLock()
+        self.init_paths()
+        self.load_assignments()
+
+    def init_paths(self):
+        self.assign_path = DATA_ROOT / "proxies" / f"{self.site}.json"
+        self.publish_path = LOGS_ROOT / "proxies" / f"{self.site}.json"
+
+    def load_assignments(self):
+        self.assignments: dict[str, str] = {}
+        if not self.assign_path.exists():
+            return
+        try:
+            with open(self.assign_path, "r", encoding="utf-8") as rf:
+                assignments = json.load(rf)
+        except Exception as e:
+            logger.warn(f"× ProxyPool.load_assignments: {e}")
+            return
+        # proxies removed from settings are dropped, and re-assigned on use
+        self.assignments = {
+            location: name
+            for location, name in assignments.items()
+            if name in self.nodes
+        }
+
+    def save_assignments(self):
+        try:
+            self.assign_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.assign_path.with_suffix(".json.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as wf:
+                json.dump(self.assignments, wf, indent=4, ensure_ascii=False)
+            os.replace(tmp_path, self.assign_path)
+        except Exception as e:
+            logger.warn(f"× ProxyPool.save_assignments: {e}")
+
+    def get_client_settings(self, node: ProxyNode, client_settings: dict) -> dict:
+        """Browser settings of proxy, whose profile and port are its own, so
+        browsers of proxies never share a process, and are launched in any order."""
+        base_port = client_settings.get("port")
+        if base_port and int(base_port) == int(node.port):
+            raise ValueError(
+                f"Port of proxy {node.name} is same as browser of {self.site}: "
+                f"{node.port}"
+            )
+        settings = {**client_settings, "proxy": node.url, "port": node.port}
+        settings["uid"] = f"{self.site}_{node.name}"
+        return settings
+
+    def is_healthy(self, node: ProxyNode) -> bool:
+        return time() >= node.cooldown_until
+
+    def wait_healthy(self):
+        """Sleep until cooldown of first proxy ends, if none is healthy."""
+        with self.lock:
+            cooldown_until = min(node.cooldown_until for node in self.nodes.values())
+        wait_seconds = cooldown_until - time()
+        if wait_seconds > 0:
+            logger.warn(
+                f"  × No healthy proxy of {self.site}, "
+                f"wait {wait_seconds:.0f}s for cooldown"
+            )
+            sleep(wait_seconds)
+
+    def get_load(self, node: ProxyNode) -> int:
+        return sum(1 for name in self.assignments.values() if name == node.name)
+
+    def pick(self, exclude: str = None) -> ProxyNode:
+        """Least loaded healthy proxy, then with lower failure rate and latency.
+        If none is healthy, the one whose cooldown ends first."""
+        nodes = [node for node in self.nodes.values() if node.name != exclude]
+        nodes = nodes or list(self.nodes.values())
+        healthy_nodes = [node for node in nodes if self.is_healthy(node)]
+        if not healthy_nodes:
+            node = min(nodes, key=lambda node: node.cooldown_until)
+            logger.warn(
+                f"  × No healthy proxy of {self.site}, "
+                f"use {logstr.file(brk(node.name))} in cooldown"
+            )
+            return node
+        return min(
+            healthy_nodes,
+            key=lambda node: (
+                self.get_load(node),
+                node.failure_rate,
+                node.latency or 0,
+            ),
+        )
+
+    def assign(self, location: str) -> ProxyNode:
+        """Sticky proxy of location, which fails over if it is unhealthy."""
+        with self.lock:
+            name = self.assignments.get(location)
+            node = self.nodes.get(name)
+            if node and self.is_healthy(node):
+                return node
+            # stale assignment is not counted as load of its proxy
+            self.assignments.pop(location, None)
+            new_node = self.pick(exclude=name)
+            self.assignments[location] = new_node.name
+            self.save_assignments()
+        if node:
+            incr("proxy_failovers", site=self.site)
+            logger.warn(
+                f"  × Proxy failover of {logstr.mesg(brk(location))}: "
+                f"{logstr.file(brk(node.name))} -> {logstr.file(brk(new_node.name))}"
+            )
+        else:
+            logger.note(
+                f"  > Assign proxy of {logstr.mesg(brk(location))}: "
+                f"{logstr.file(brk(new_node.name))}"
+            )
+        return new_node
+
+    def on_success(self, node: ProxyNode, latency: float = None):
+        with self.lock:
+            node.on_success(latency)
+        self.publish(node)
+
+    def on_failure(self, node: ProxyNode, signal: PACER_SIGNAL = "error"):
+        with self.lock:
+            node.on_failure(signal)
+            is_tripped = node.consecutive_failures >= self.max_consecutive_failures
+            if (
+                len(node.results) >= self.min_requests
+                and node.failure_rate > self.max_failure_rate
+            ):
+                is_tripped = True
+            if is_tripped and self.is_healthy(node):
+                failure_rate = node.failure_rate
+                node.cooldown_until = time() + self.cooldown
+                node.consecutive_failures = 0
+                # proxy is judged by results after cooldown only
+                node.results.clear()
+            else:
+                is_tripped = False
+        incr("proxy_failures", site=self.site, proxy=node.name, signal=signal)
+        if is_tripped:
+            logger.warn(
+                f"  × Proxy [{self.site}] {logstr.file(brk(node.name))} unhealthy: "
+                f"failure_rate={failure_rate:.2f}, cooldown={self.cooldown}s"
+            )
+        self.publish(node)
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            return {
+                "site": self.site,
+                "proxies": [node.to_dict() for node in self.nodes.values()],
+                "assignments": dict(self.assignments),
+                "now": get_now_str(),
+            }
+
+    def publish(self, node: ProxyNode = None):
+        """Refresh gauges of proxy, and write health of pool to logs."""
+        if node:
+            labels = {"site": self.site, "proxy": node.name}
+            set_gauge("proxy_failure_rate", node.failure_rate, **labels)
+            set_gauge("proxy_healthy", int(self.is_healthy(node)), **labels)
+            if node.latency is not None:
+                set_gauge("proxy_latency_seconds", node.latency, **labels)
+        try:
+            with self.lock:
+                data = self.to_dict()
+                self.publish_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.publish_path.with_suffix(".json.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as wf:
+                    json.dump(data, wf, indent=4, ensure_ascii=False)
+                os.replace(tmp_path, self.publish_path)
+        except Exception as e:
+            logger.warn(f"× ProxyPool.publish: {e}")
+
+
+PROXY_POOLS: dict[str, ProxyPool] = {}
+PROXY_POOLS_LOCK = threading.Lock()
+
+
+def get_proxy_pool(site: str) -> Optional[ProxyPool]:
+    """Shared proxy pool of site from `proxy_settings` of secrets,
+    or None if site has no proxies, then its single browser is used."""
+    settings = dict(PROXY_SETTINGS.get(site) or {})
+    if not settings.get("proxies"):
+        return None
+    with PROXY_POOLS_LOCK:
+        if site not in PROXY_POOLS:
+            PROXY_POOLS[site] = ProxyPool(site=site, **settings)
+        return PROXY_POOLS[site]
+
+
+if __name__ == "__main__":
+    pool = ProxyPool(
+        site="test",
+        proxies=[
+            {"name": "p1", "url": "http://127.0.0.1:10001", "port": 9501},
+            {"name": "p2", "url": "http://127.0.0.1:10002", "port": 9502},
+        ],
+        max_consecutive_failures=2,
+        cooldown=60,
+    )
+    node_a = pool.assign("loc_a")
+    node_b = pool.assign("loc_b")
+    pool.on_success(node_a, latency=1.2)
+    for _ in range(2):
+        pool.on_failure(node_b, "captcha")
+    pool.assign("loc_b")
+    logger.mesg(pool.to_dict())
+
+    # python -m web.proxy
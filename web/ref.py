@@ -1,19 +1,21 @@
-import pandas as pd
-
 from tclogger import logger, match_val
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
-from web.blinkit.batcher import BlinkitExtractBatcher
-from web.zepto.batcher import ZeptoExtractBatcher
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 class RefProductDataLoader:
     def __init__(self, date_str: str = None) -> None:
+        # imported here, as swiggy and dmart batchers import this module
+        from web.blinkit.batcher import BlinkitExtractBatcher
+        from web.zepto.batcher import ZeptoExtractBatcher
+
         self.date_str = date_str
         self.blinkit_batcher = BlinkitExtractBatcher(date_str=date_str)
         self.zepto_batcher = ZeptoExtractBatcher(date_str=date_str)
 
-    def get_product_id(self, df: pd.DataFrame, col_name: str, idx: int) -> str:
+    def get_product_id(self, df: "pd.DataFrame", col_name: str, idx: int) -> str:
         product_info_row = df.iloc[idx]
         product_link = product_info_row.get(col_name, "")
         product_id = product_link.split("/")[-1].strip()
@@ -0,0 +1,123 @@
+import json
+import os
+
+from tclogger import logger, logstr, brk, get_now_str, str_to_t
+from typing import TYPE_CHECKING, TypedDict
+
+from configs.envs import DATA_ROOT, WEBSITE_LITERAL
+
+if TYPE_CHECKING:
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
+# keys of Network.CookieParam, other keys from Network.getCookies are dropped
+COOKIE_PARAM_KEYS = [
+    *["name", "value", "domain", "path", "secure", "httpOnly"],
+    *["sameSite", "expires", "priority", "sourceScheme", "sourcePort"],
+]
+LOCAL_STORAGE_KEYS = ["user-position"]
+
+
+class LocationSessionType(TypedDict):
+    cookies: list[dict]
+    local_storage: dict[str, str]
+    gr_1_locality: str
+    url: str
+    verified_at: str
+
+
+class LocationSessionCache:
+    """Persisted location sessions (cookies and localStorage) per browser profile,
+    so a switcher could restore a verified location without the UI flow."""
+
+    def __init__(
+        self,
+        website: WEBSITE_LITERAL,
+        client_settings: dict = None,
+        max_age_hours: float = 12,
+    ):
+        self.website = website
+        self.client_settings = client_settings or {}
+        self.max_age_hours = max_age_hours
+        self.init_paths()
+        self.load()
+
+    def init_paths(self):
+        uid = self.client_settings.get("uid", None) or "default"
+        self.cache_path = DATA_ROOT / "sessions" / f"{uid}.json"
+
+    def load(self):
+        self.data: dict[str, dict[str, LocationSessionType]] = {}
+        if not self.cache_path.exists():
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as rf:
+                self.data = json.load(rf)
+        except Exception as e:
+            logger.warn(f"× LocationSessionCache.load: {e}")
+
+    def save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.cache_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as wf:
+            json.dump(self.data, wf, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def get(self, location: str) -> LocationSessionType:
+        session = self.data.get(self.website, {}).get(location, None)
+        if not session:
+            return None
+        age_seconds = (
+            str_to_t(get_now_str()) - str_to_t(session["verified_at"])
+        ).total_seconds()
+        if age_seconds > self.max_age_hours * 3600:
+            logger.mesg(f"  * Session cache expired: {logstr.file(brk(location))}")
+            return None
+        return session
+
+    def snapshot(self, tab: "ChromiumTab", location: str):
+        cookies = list(tab.cookies(all_info=True))
+        local_storage = {}
+        for key in LOCAL_STORAGE_KEYS:
+            value = tab.local_storage(item=key)
+            if value:
+                local_storage[key] = value
+        locality = ""
+        for cookie in cookies:
+            if cookie.get("name") == "gr_1_locality":
+                locality = cookie.get("value", "")
+        session: LocationSessionType = {
+            "cookies": cookies,
+            "local_storage": local_storage,
+            "gr_1_locality": locality,
+            "url": tab.url,
+            "verified_at": get_now_str(),
+        }
+        self.data.setdefault(self.website, {})[location] = session
+        self.save()
+        logger.okay(f"  ✓ Session cached: {logstr.file(brk(location))}")
+
+    def restore(self, tab: "ChromiumTab", location: str) -> bool:
+        """Inject cached cookies and localStorage into tab.
+        Caller should reload page and verify location afterwards."""
+        session = self.get(location)
+        if not session:
+            return False
+        logger.note(f"  > Restoring session: {logstr.file(brk(location))}")
+        cookie_params = [
+            {k: v for k, v in cookie.items() if k in COOKIE_PARAM_KEYS}
+            for cookie in session.get("cookies", [])
+        ]
+        try:
+            tab.run_cdp("Network.setCookies", cookies=cookie_params)
+            for key, value in session.get("local_storage", {}).items():
+                tab.set.local_storage(key, value)
+        except Exception as e:
+            logger.warn(f"  × Failed to restore session: {e}")
+            return False
+        return True
+
+    def invalidate(self, location: str):
+        website_data = self.data.get(self.website, {})
+        if location in website_data:
+            website_data.pop(location)
+            self.save()
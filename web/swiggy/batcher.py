@@ -10,12 +10,19 @@ from typing import Union
 
 from configs.envs import DATA_ROOT, SWIGGY_LOCATIONS
 from file.excel_parser import ExcelReader, DataframeParser
+from web.browser import BrowserClient
 from web.swiggy.scraper import SwiggyLocationChecker, SwiggyLocationSwitcher
 from web.swiggy.scraper import SwiggyBrowserScraper, SwiggyProductDataExtractor
 from web.ref import RefProductDataLoader
 from web.logs import log_link_idx, log_traceback
 from file.local_dump import LocalAddressExtractor, SwiggyProductRespChecker
 from file.record import LinksRecorder
+from file.work_queue import WorkQueue
+from web.pacer import get_pacer
+from web.instrument import set_labels, incr, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from web.daemon import use_daemon
 from cli.arg import BatcherArgParser
 
 WEBSITE_NAME = "swiggy"
@@ -41,11 +48,18 @@ class SwiggyScrapeBatcher:
         self.excel_reader = ExcelReader()
         self.switcher = SwiggyLocationSwitcher()
         self.scraper = SwiggyBrowserScraper(date_str=date_str)
-        self.extractor = SwiggyProductDataExtractor()
+        self.scraper.client.on_recycle = self.restore_location
         self.addr_extractor = LocalAddressExtractor(website_name=WEBSITE_NAME)
         self.product_checker = SwiggyProductRespChecker()
         self.checker = SwiggyLocationChecker()
         self.recorder = LinksRecorder(website=WEBSITE_NAME, date_str=date_str)
+        self.queue = WorkQueue(website=WEBSITE_NAME, date_str=date_str)
+        self.pacer = get_pacer(WEBSITE_NAME)
+
+    def restore_location(self, client: BrowserClient):
+        """Relaunch recycled browser by switcher, and set its location again."""
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
 
     def close_switcher(self):
         try:
@@ -61,74 +75,102 @@ class SwiggyScrapeBatcher:
         except Exception as e:
             logger.warn(f"× SwiggyScrapeBatcher.close_scraper: {e}")
 
+    def init_queue(self, location_name: str, links: list[str]):
+        """Add links of location which are not in queue yet, such as rows added to
+        xlsx later, and validate their local dumps once."""
+        logger.note(f"> Init work queue: {logstr.mesg(brk(location_name))}")
+        for link_idx, link in enumerate(links):
+            if not link:
+                continue
+            product_id = link.split("/")[-1].strip()
+            if self.queue.get_item(location_name, product_id):
+                continue
+            state = "pending"
+            dump_path = self.scraper.get_dump_path(product_id, parent=location_name)
+            if self.skip_exists and dump_path.exists():
+                location_check = self.addr_extractor.check_dump_path_location(
+                    dump_path, correct_location_name=location_name
+                )
+                product_check = self.product_checker.check(dump_path)
+                if location_check and product_check:
+                    state = "done"
+                    incr("products", status="skipped")
+                else:
+                    log_link_idx(link_idx, len(links))
+                    logger.file(f"  * {dump_path}")
+                    if not location_check:
+                        logger.warn(f"  × Incorrect location")
+                    if not product_check:
+                        logger.warn(f"  × Incorrect product info")
+                    logger.warn(f"  * Remove local dump file, and re-scrape")
+                    dump_path.unlink(missing_ok=True)
+            self.queue.add(
+                location_name, product_id, link=link, idx=link_idx, state=state
+            )
+        if not self.queue.has_location(location_name):
+            self.queue.add_location(location_name)
+
     def run(self):
         swiggy_links = self.excel_reader.get_column_by_name("weblink_instamart")
         for location_idx, location_item in enumerate(SWIGGY_LOCATIONS):
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             location_text = location_item.get("text", "")
             links = swiggy_links[:]
+            self.init_queue(location_name, links)
             is_set_location = False
-            # multiple runs to scan and recover missing products
-            for loop_idx in range(3):
-                for link_idx, link in enumerate(links):
-                    is_log_link_idx = False
-                    if not link:
-                        # logger.mesg(f"> Skip empty link at row [{link_idx}]")
-                        continue
-
-                    record_params = {
-                        "website": WEBSITE_NAME,
-                        "location": location_name,
-                        "link": link,
-                    }
-                    if not self.recorder.is_record_good(**record_params, max_count=3):
-                        if loop_idx == 0:
-                            logger.warn(
-                                f"* Skip link for too many error times: {logstr.file(link)}"
-                            )
-                        continue
-
-                    product_id = link.split("/")[-1].strip()
-                    dump_path = self.scraper.get_dump_path(
-                        product_id, parent=location_name
-                    )
-                    if self.skip_exists and dump_path.exists():
-                        location_check = self.addr_extractor.check_dump_path_location(
-                            dump_path, correct_location_name=location_name
-                        )
-                        product_check = self.product_checker.check(dump_path)
-                        if location_check and product_check:
-                            # logger.note(f"> Skip exists:  {logstr.file(brk(dump_path))}")
-                            continue
-                        else:
-                            if not is_log_link_idx:
-                                log_link_idx(link_idx, len(links))
-                                is_log_link_idx = True
-                            logger.file(f"  * {dump_path}")
-                            if not location_check:
-                                logger.warn(f"  × Incorrect location")
-                            if not product_check:
-                                logger.warn(f"  × Incorrect product info")
-                            logger.warn(f"  * Remove local dump file, and re-scrape")
-                            self.recorder.update_record(**record_params)
-                            dump_path.unlink(missing_ok=True)
-                    if not is_set_location:
-                        logger.hint(
-                            f"> New Location: {location_name} ({location_text})"
-                        )
-                        self.switcher.set_location(location_idx)
-                        is_set_location = True
-                    if not is_log_link_idx:
-                        log_link_idx(link_idx, len(links))
-                        is_log_link_idx = True
+            for item in self.queue.iter_pending(location_name):
+                product_id = item["product_id"]
+                record_params = {
+                    "website": WEBSITE_NAME,
+                    "location": location_name,
+                    "link": item["link"],
+                }
+                if not is_set_location:
+                    logger.hint(f"> New Location: {location_name} ({location_text})")
+                    self.switcher.set_location(location_idx)
+                    is_set_location = True
+                log_link_idx(item["idx"], len(links))
+                self.pacer.wait()
+                try:
                     product_info = self.scraper.run(product_id, parent=location_name)
+                except Exception as e:
+                    log_traceback(e)
+                    self.recorder.update_record(**record_params)
+                    incr("products", status="failed")
+                    self.queue.mark_failed(item, error=str(e))
+                    continue
+                try:
                     self.checker.check_product_location(
                         product_info, location_idx, extra_msg="SwiggyScrapeBatcher"
                     )
-                    extracted_data = self.extractor.extract(product_info)
-                    if extracted_data:
-                        sleep(3)
-
+                except Exception as e:
+                    # location might be reset by website, so set it again
+                    dump_path = self.scraper.get_dump_path(
+                        product_id, parent=location_name
+                    )
+                    dump_path.unlink(missing_ok=True)
+                    self.pacer.on_failure("location_reset")
+                    self.recorder.update_record(**record_params)
+                    incr("products", status="failed")
+                    self.queue.mark_failed(item, error=str(e))
+                    is_set_location = False
+                    continue
+                dump_path = self.scraper.get_dump_path(product_id, parent=location_name)
+                if not self.product_checker.check(dump_path):
+                    # empty or incorrect product info is re-scraped, not extracted
+                    logger.warn(
+                        f"  × Incorrect product info: {logstr.file(brk(dump_path))}"
+                    )
+                    dump_path.unlink(missing_ok=True)
+                    self.recorder.update_record(**record_params)
+                    incr("products", status="failed")
+                    self.queue.mark_failed(item, error="Incorrect product info")
+                    continue
+                incr("products", status="done")
+                self.queue.mark_done(item)
+                self.pacer.on_success()
+            self.queue.log_counts(location_name)
         self.close_scraper()
 
 
@@ -189,6 +231,7 @@ class SwiggyExtractBatcher:
             df = deepcopy(self.excel_reader.df)
             df_parser = DataframeParser(df, verbose=self.verbose)
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             links = swiggy_links[:]
             location_bar.update(desc=logstr.mesg(brk(location_name)), flush=True)
             row_dicts: list[dict] = []
@@ -244,6 +287,8 @@ def run_scrape_batcher(args: argparse.Namespace):
             date_str=args.date,
             close_browser_after_done=args.close_browser_after_done,
         )
+        if args.daemon:
+            use_daemon(scraper_batcher, WEBSITE_NAME)
         scraper_batcher.run()
     except Exception as e:
         log_traceback(e)
@@ -254,20 +299,30 @@ def run_scrape_batcher(args: argparse.Namespace):
 
 
 def main(args: argparse.Namespace):
-    if args.scrape:
-        with Retrier(max_retries=50, retry_interval=60) as retrier:
-            retrier.run(run_scrape_batcher, args=args)
+    exporter = PromTextfileExporter(job=f"{WEBSITE_NAME}_batcher")
+    exporter.start()
+    try:
+        if args.scrape:
+            if args.force_scrape:
+                WorkQueue(website=WEBSITE_NAME, date_str=args.date).reset()
+            # retried batcher resumes from pending items in work queue
+            with Retrier(max_retries=50, retry_interval=60) as retrier:
+                retrier.run(run_scrape_batcher, args=args)
 
-    if args.extract:
-        extract_batcher = SwiggyExtractBatcher(date_str=args.date)
-        extract_batcher.run()
+        if args.extract:
+            extract_batcher = SwiggyExtractBatcher(date_str=args.date)
+            extract_batcher.run()
+    finally:
+        date_str = args.date or get_now_str()[:10]
+        dump_summary(DATA_ROOT / "output" / date_str / WEBSITE_NAME)
+        exporter.stop()
 
 
 if __name__ == "__main__":
     arg_parser = BatcherArgParser()
     args = arg_parser.parse_args()
 
-    with Runtimer():
+    with Runtimer(), profile_from_args(args):
         main(args)
 
     # Case 1: Batch scrape
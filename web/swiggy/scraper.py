@@ -1,18 +1,23 @@
 import json
 import urllib.parse
 
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from tclogger import logger, logstr, brk, get_now_str, dict_to_str, dict_get, dict_set
 from time import sleep
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 from configs.envs import DATA_ROOT, SWIGGY_LOCATIONS, SWIGGY_BROWSER_SETTING
 from web.clicker import SwiggyLocationClicker
 from web.browser import BrowserClient
 from web.fetch import fetch_with_retry
+from web.pacer import get_pacer, is_captcha_title
+from web.instrument import timed
+from web.session import LocationSessionCache
 from file.local_dump import LocalAddressExtractor
 
+if TYPE_CHECKING:
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
 WEBSITE_NAME = "swiggy"
 SWIGGY_MAIN_URL = "https://www.swiggy.com"
 SWIGGY_ITEM_URL = "https://www.swiggy.com/stores/instamart/item"
@@ -56,7 +61,7 @@ class SwiggyLocationChecker:
         return True
 
     def check_tab_location(
-        self, tab: ChromiumTab, location_idx: int, extra_msg: str = ""
+        self, tab: "ChromiumTab", location_idx: int, extra_msg: str = ""
     ):
         cookies = tab.cookies(all_info=True).as_dict()
         user_location_raw = dict_get(cookies, "userLocation", None)
@@ -87,6 +92,9 @@ class SwiggyLocationSwitcher:
         self.locations = locations or SWIGGY_LOCATIONS
         self.checker = SwiggyLocationChecker()
         self.client = BrowserClient(**self.client_settings)
+        self.session_cache = LocationSessionCache(
+            website=WEBSITE_NAME, client_settings=self.client_settings
+        )
         self.current_location_idx = None
 
     def is_at_idx(self, location_idx: int) -> bool:
@@ -95,6 +103,31 @@ class SwiggyLocationSwitcher:
             and self.current_location_idx == location_idx
         )
 
+    def get_location_name(self, location_idx: int) -> str:
+        return self.locations[location_idx].get("name", "")
+
+    def restore_session(self, tab: "ChromiumTab", location_idx: int) -> bool:
+        location_name = self.get_location_name(location_idx)
+        if not self.session_cache.restore(tab, location_name):
+            return False
+        tab.get(SWIGGY_MAIN_URL)
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="SwiggyLocationSwitcher"
+        ):
+            return True
+        self.session_cache.invalidate(location_name)
+        return False
+
+    def save_session(self, tab: "ChromiumTab", location_idx: int, force: bool = True):
+        location_name = self.get_location_name(location_idx)
+        if not force and self.session_cache.get(location_name):
+            return
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="SwiggyLocationSwitcher"
+        ):
+            self.session_cache.snapshot(tab, location_name)
+
+    @timed("set_location", site=WEBSITE_NAME)
     def set_location(self, location_idx: int = 0) -> dict:
         logger.note(f"> Visiting main page: {logstr.mesg(brk(SWIGGY_MAIN_URL))}")
         self.client.start_client()
@@ -108,6 +141,9 @@ class SwiggyLocationSwitcher:
             tab, location_idx, extra_msg="SwiggyLocationSwitcher"
         ):
             logger.okay("  * Location already correctly set. Skip.")
+            self.save_session(tab, location_idx, force=False)
+        elif self.restore_session(tab, location_idx):
+            logger.okay("  * Location restored from session cache. Skip.")
         else:
             self.clicker = SwiggyLocationClicker(tab=tab, suffix=WEBSITE_NAME)
             logger.note(f"> Setting location:")
@@ -128,6 +164,7 @@ class SwiggyLocationSwitcher:
             self.clicker.click_target_position()
 
             sleep(10)
+            self.save_session(tab, location_idx)
 
         self.current_location_idx = location_idx
         # self.client.close_other_tabs(create_new_tab=True)
@@ -138,13 +175,14 @@ class SwiggyBrowserScraper:
     def __init__(self, date_str: str = None):
         self.date_str = date_str
         self.client = BrowserClient(**SWIGGY_BROWSER_SETTING)
+        self.pacer = get_pacer(WEBSITE_NAME)
         self.init_paths()
 
     def init_paths(self):
         self.date_str = self.date_str or get_now_str()[:10]
         self.dump_root = DATA_ROOT / "dumps" / self.date_str / WEBSITE_NAME
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         cookies_dict["url"] = tab.url
         cookies_dict["now"] = get_now_str()
@@ -163,6 +201,7 @@ class SwiggyBrowserScraper:
                 dict_set(resp, variant_keys + [var_idx, sub_key], [])
         return resp
 
+    @timed("fetch", site=WEBSITE_NAME)
     def fetch(self, product_id: Union[str, int], save_cookies: bool = True) -> dict:
         item_url = f"{SWIGGY_ITEM_URL}/{product_id}"
         logger.note(f"> Visiting product page: {logstr.mesg(brk(product_id))}")
@@ -175,6 +214,8 @@ class SwiggyBrowserScraper:
 
         tab.get(item_url, interval=4)
         logger.mesg(f"  ✓ Title: {brk(tab.title)}")
+        if is_captcha_title(tab.title):
+            self.pacer.on_failure("captcha")
 
         product_info = tab.run_js("return window.___INITIAL_STATE___;")
         if product_info and save_cookies:
@@ -192,6 +233,7 @@ class SwiggyBrowserScraper:
             dump_path = self.dump_root / filename
         return dump_path
 
+    @timed("dump", site=WEBSITE_NAME)
     def dump(self, product_id: Union[str, int], resp: dict, parent: str = None):
         logger.note(f"  > Dump product data to json:", end=" ")
         dump_path = self.get_dump_path(product_id, parent)
@@ -204,7 +246,10 @@ class SwiggyBrowserScraper:
         self, product_id: Union[str, int], save_cookies: bool = True, parent: str = None
     ) -> dict:
         product_info = fetch_with_retry(
-            self.fetch, product_id=product_id, save_cookies=save_cookies
+            self.fetch,
+            product_id=product_id,
+            save_cookies=save_cookies,
+            pacer=self.pacer,
         )
         self.dump(product_id=product_id, resp=product_info, parent=parent)
         return product_info
@@ -315,6 +360,7 @@ class SwiggyProductDataExtractor:
             logger.warn(f"\n  × No variant: {url}", verbose=self.verbose)
         return res
 
+    @timed("extract", site=WEBSITE_NAME)
     def extract(self, resp: dict, ref_mrp: Union[int, float] = None) -> list[dict]:
         """If `ref_mrp` is not None, would choose variant whose `mrp` is closest to `ref_mrp`."""
         if ref_mrp is None or ref_mrp <= 0:
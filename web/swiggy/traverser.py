@@ -1,23 +1,38 @@
 import argparse
 import json
-import pandas as pd
+import math
+import os
 import re
+import threading
 
 from acto import Retrier
 from dataclasses import dataclass
-from DrissionPage._pages.chromium_tab import ChromiumTab
+from datetime import datetime, timedelta
 from pathlib import Path
-from time import sleep
+from time import sleep, monotonic
 from tclogger import logger, logstr, brk, get_now_str, Runtimer, dict_get
 from tclogger import raise_breakpoint
+from typing import TYPE_CHECKING, Literal
 from urllib.parse import parse_qs, urlparse, urlencode, quote, unquote
 
 from configs.envs import DATA_ROOT, SWIGGY_LOCATIONS, SWIGGY_TRAVERSER_SETTING
 from web.swiggy.scraper import SwiggyLocationChecker, SwiggyLocationSwitcher
 from web.blinkit.traverser import norm_name, load_json
 from web.browser import BrowserClient
+from web.categ_tree import get_categ_tree
 from web.constants import norm_date_str
-from cli.arg import TraverserArgParser
+from web.instrument import set_labels, timed, incr, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from web.pacer import get_pacer
+from file.row_cache import RowCache
+from file.traverse_index import get_checksum
+from cli.arg import SwiggyTraverserArgParser
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from DrissionPage._pages.chromium_tab import ChromiumTab
 
 
 WEBSITE_NAME = "swiggy"
@@ -30,6 +45,7 @@ SWIGGY_API_FILTER_URL = "https://www.swiggy.com/api/instamart/category-listing/f
 SWIGGY_API_FILTER_RE = (
     "https://www.swiggy.com/api/instamart/category-listing/filter\?.*"
 )
+FETCH_MODE = Literal["listen", "direct", "batch"]
 
 
 def get_dump_root(date_str: str = None) -> Path:
@@ -56,6 +72,11 @@ def get_filters_dump_path(date_str: str = None, location: str = None) -> Path:
     return dump_root.joinpath(*path_parts)
 
 
+def get_prev_date_str(date_str: str) -> str:
+    prev_date = datetime.strptime(date_str, "%Y-%m-%d") - timedelta(days=1)
+    return prev_date.strftime("%Y-%m-%d")
+
+
 def get_url_params(url: str) -> dict:
     return parse_qs(urlparse(url).query)
 
@@ -129,6 +150,7 @@ class SwiggyCategoriesExtractor:
             res.append(card_info)
         return res
 
+    @timed("extract_categories", site=WEBSITE_NAME)
     def extract(self, categ_json: dict) -> dict:
         logger.enter_quiet(not self.verbose)
         if not categ_json:
@@ -159,7 +181,7 @@ class SwiggyCategoriesFetcher:
         self.extractor = SwiggyCategoriesExtractor(client=client, verbose=True)
         self.location = location
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         cookies_dict["url"] = tab.url
         cookies_dict["now"] = get_now_str()
@@ -208,13 +230,13 @@ class SwiggyCategoriesFetcher:
         self.client.stop_client(close_browser=False)
         return categ_data
 
+    @timed("dump_categories", site=WEBSITE_NAME)
     def dump(self, resp: dict):
-        self.dump_path = get_categ_dump_path(self.date_str, location=self.location)
-        logger.note(f"  > Dump categories data to json:", end=" ")
-        self.dump_path.parent.mkdir(parents=True, exist_ok=True)
-        with open(self.dump_path, "w", encoding="utf-8") as wf:
-            json.dump(resp, wf, indent=4, ensure_ascii=False)
+        categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+        self.dump_path = categ_tree.tree_path
+        logger.note(f"  > Merge categories data to tree:", end=" ")
         logger.okay(f"{brk(self.dump_path)}")
+        categ_tree.add_location(self.location, resp)
 
     def run(self, location_idx: int = None):
         if not self.switcher.is_at_idx(location_idx):
@@ -227,7 +249,48 @@ class SwiggyCategoriesFetcher:
             return {}
 
 
+class SwiggyFiltersStore:
+    """Filters of all categories in one location, loaded once and kept in memory.
+    Updates are flushed atomically to `filters.json` on a timer and at shutdown."""
+
+    def __init__(self, filters_path: Path, flush_interval: float = 60):
+        self.filters_path = filters_path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.is_dirty = False
+        self.last_flush_ts = monotonic()
+        self.load()
+
+    def load(self):
+        self.data: dict[str, dict] = load_json(self.filters_path)
+
+    def exists(self) -> bool:
+        return self.filters_path.exists() or bool(self.data)
+
+    def get(self, categ_name: str) -> dict:
+        return self.data.get(categ_name, None)
+
+    def set(self, categ_name: str, categ_filters: dict):
+        with self.lock:
+            self.data[categ_name] = categ_filters
+            self.is_dirty = True
+        if monotonic() - self.last_flush_ts >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            if self.is_dirty:
+                self.filters_path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.filters_path.with_suffix(".json.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as wf:
+                    json.dump(self.data, wf, ensure_ascii=False, indent=4)
+                os.replace(tmp_path, self.filters_path)
+                self.is_dirty = False
+            self.last_flush_ts = monotonic()
+
+
 class SwiggyFiltersExtractor:
+    @timed("extract_filters", site=WEBSITE_NAME)
     def extract(self, resp: dict, listing_params: dict = {}, cname: str = None) -> dict:
         """Return:
         ```json
@@ -284,25 +347,54 @@ class SwiggyFiltersExtractor:
         }
         return res
 
-    def save(self, categ_filters: dict, save_path: Path):
+    def save(self, categ_filters: dict, store: SwiggyFiltersStore):
         filters_count = len(dict_get(categ_filters, "filters", []))
         categ_name = dict_get(categ_filters, "categ_name", None)
         if not categ_name:
             logger.warn("  × No categ_name found, skip saving")
             return
         logger.okay(f"  ✓ Save {logstr.mesg(filters_count)} filters to:", end=" ")
-        if not save_path.exists():
-            save_path.parent.mkdir(parents=True, exist_ok=True)
-            data = {}
-        else:
-            data = load_json(save_path)
-        with open(save_path, "w", encoding="utf-8") as wf:
-            data[categ_name] = categ_filters
-            json.dump(data, wf, ensure_ascii=False, indent=4)
-        logger.okay(f"{brk(save_path)}")
+        store.set(categ_name, categ_filters)
+        logger.okay(f"{brk(store.filters_path)}")
 
 
 class SwiggyListingExtractor:
+    # prune listing resp in page to fields used by `extract` and `item_to_dict`,
+    # which keeps the resp structure, and shrinks the transfer size over CDP
+    prune_js = """
+    const pruneListing = (resp) => {
+        const pick = (obj, keys) => {
+            const res = {};
+            for (const key of keys) {
+                if (obj && obj[key] !== undefined) { res[key] = obj[key]; }
+            }
+            return res;
+        };
+        const pruneVariation = (variation) => ({
+            ...pick(variation, [
+                "listing_variant", "sku_quantity_with_combo",
+                "brand", "sourced_from", "super_category",
+            ]),
+            cart_allowed_quantity: pick(variation.cart_allowed_quantity, ["total"]),
+            price: pick(variation.price, ["offer_price", "mrp"]),
+        });
+        const pruneItem = (item) => ({
+            ...pick(item, ["product_id", "display_name", "in_stock"]),
+            variations: (item.variations || []).map(pruneVariation),
+        });
+        const data = (resp && resp.data) || {};
+        const widgets = (data.widgets || []).map((widget) => {
+            const widgetInfo = pick(widget.widgetInfo, ["widgetType", "title"]);
+            const widgetType = (widgetInfo.widgetType || "").toLowerCase();
+            if (widgetType === "product_list") {
+                return { widgetInfo, data: (widget.data || []).map(pruneItem) };
+            }
+            return { widgetInfo };
+        });
+        return { data: { ...pick(data, ["hasMore"]), widgets } };
+    };
+    """
+
     def select_variation(self, variations: list[dict]) -> dict:
         if not variations:
             return {}
@@ -332,6 +424,20 @@ class SwiggyListingExtractor:
         }
         return item_info
 
+    def get_page_fingerprint(self, listings: list[dict]) -> dict:
+        """Ordered product ids of a page, and a hash of their prices."""
+        product_ids = [item.get("product_id", None) for item in listings]
+        prices = [[item.get("price", None), item.get("mrp", None)] for item in listings]
+        price_hash = get_checksum(json.dumps(prices))
+        return {"product_ids": product_ids, "price_hash": price_hash}
+
+    def get_fingerprints(self, listings: list[dict], limit: int = 20) -> list[dict]:
+        return [
+            self.get_page_fingerprint(listings[i : i + limit])
+            for i in range(0, len(listings), limit)
+        ]
+
+    @timed("extract_listing", site=WEBSITE_NAME)
     def extract(self, resp: dict) -> list[dict]:
         res = []
         widgets = dict_get(resp, "data.widgets") or []
@@ -409,22 +515,35 @@ class SwiggyCategoryIterator:
         self.dump_root = get_dump_root(self.date_str)
         self.load_categories()
 
-    def load_categories(self) -> list[dict]:
+    def load_categories(self):
+        """Load categories of location from shared categ tree,
+        or from legacy per-location `categories.json`."""
+        self.categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+        if self.categ_tree.has_location(self.location):
+            self.categ_path = self.categ_tree.tree_path
+            self.categories = None
+            self.ctotal = self.categ_tree.count_categories(self.location)
+            return
         self.categ_path = get_categ_dump_path(
             date_str=self.date_str, location=self.location
         )
-        if not self.categ_path.exists():
-            return []
-        with open(self.categ_path, "r", encoding="utf-8") as rf:
-            categ_data = json.load(rf)
-        self.categories = categ_data.get("categories", []) or []
+        self.categories = []
+        if self.categ_path.exists():
+            categ_data = load_json(self.categ_path)
+            self.categories = categ_data.get("categories", []) or []
+        self.ctotal = len(self.categories)
+
+    def iter_categories(self):
+        if self.categories is None:
+            return self.categ_tree.iter_categories(self.location)
+        return iter(self.categories)
 
     def get_json_path(self, cid: int, sid: int) -> Path:
         return None
 
     def __iter__(self):
-        ctotal = len(self.categories)
-        for cidx, categ in enumerate(self.categories, start=1):
+        ctotal = self.ctotal
+        for cidx, categ in enumerate(self.iter_categories(), start=1):
             cname = categ.get("name", "")
             cid = categ.get("id", -1)
             sub_categs = categ.get("subCategories", []) or []
@@ -459,26 +578,38 @@ class SwiggyCategoryIterator:
 
 
 class SwiggyCategoryScraper:
+    # number of pages fetched in one batch, adapted per filter
+    BATCH_INIT_SIZE = 2
+    BATCH_MAX_SIZE = 8
+    BATCH_MAX_ATTEMPTS = 3
+
     def __init__(
         self,
         client: BrowserClient,
         switcher: SwiggyLocationSwitcher,
         date_str: str = None,
         location: str = None,
+        fetch_mode: FETCH_MODE = "listen",
+        carry_over: bool = True,
     ):
         self.client = client
         self.switcher = switcher
         self.date_str = norm_date_str(date_str)
         self.location = location
+        self.fetch_mode = fetch_mode
+        self.carry_over = carry_over
         self.listing_extractor = SwiggyListingExtractor()
         self.filters_extractor = SwiggyFiltersExtractor()
+        self.filters_store = SwiggyFiltersStore(
+            get_filters_dump_path(self.date_str, self.location)
+        )
+        # pacers of traverser are separate from batcher: listing pages are paced
+        # by `pacer`, and subcategories by `subcateg_pacer`
+        self.pacer = get_pacer(WEBSITE_NAME, interval=2, scope="traverser_page")
+        self.subcateg_pacer = get_pacer(WEBSITE_NAME, interval=8, scope="traverser")
 
     def load_local_filters(self, sctx: SwiggySubCategoryContext) -> dict:
-        filters_path = get_filters_dump_path(self.date_str, self.location)
-        if not filters_path.exists():
-            return None
-        data = load_json(filters_path)
-        sname_data = dict_get(data, sctx.sname, {})
+        sname_data = self.filters_store.get(sctx.sname) or {}
         filters = dict_get(sname_data, "filters", [])
         if filters:
             return sname_data
@@ -497,7 +628,6 @@ class SwiggyCategoryScraper:
                     f"{logstr.mesg(brk(sctx.cname))} - {logstr.file(brk(sctx.sname))}"
                 )
                 return local_filters_dict
-        filters_path = get_filters_dump_path(self.date_str, self.location)
         tab = self.client.browser.latest_tab
         taxonomyType = get_url_param_value(sctx.url, "taxonomyType")
         listing_params = {
@@ -510,6 +640,7 @@ class SwiggyCategoryScraper:
         url = f"{SWIGGY_API_LISTING_URL}?{urlencode_quote(listing_params)}"
         logger.note(f"  * GET filters: {logstr.mesg(brk(sctx.sname))}")
         tab.get(url, timeout=10)
+        self.client.page_count += 1
 
         resp_json = None
         is_get_json = False
@@ -524,7 +655,7 @@ class SwiggyCategoryScraper:
             categ_filters = self.filters_extractor.extract(
                 resp_json, listing_params=listing_params, cname=sctx.cname
             )
-            self.filters_extractor.save(categ_filters, filters_path)
+            self.filters_extractor.save(categ_filters, self.filters_store)
         else:
             logger.warn(f"  × No filters from url:")
             logger.file(f"    *  api url: {url}")
@@ -554,15 +685,99 @@ class SwiggyCategoryScraper:
             return data
         return []
 
-    def fetch_listing(
+    def load_prev_listings(
+        self, sctx: SwiggySubCategoryContext, filter_item: dict
+    ) -> dict:
+        prev_date_str = get_prev_date_str(self.date_str)
+        listings_root = get_filters_dump_path(prev_date_str, self.location).parent
+        filter_name = dict_get(filter_item, "name")
+        path_parts = [sctx.cname, sctx.sname, f"{filter_name}.json"]
+        prev_listings_path = listings_root.joinpath(*path_parts)
+        if not prev_listings_path.exists():
+            return None
+        return load_json(prev_listings_path)
+
+    def probe_listings(
+        self,
+        tab: "ChromiumTab",
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        limit: int = 20,
+    ) -> tuple[list[dict], list[int]]:
+        """Probe first and last pages, and compare them with fingerprints of
+        yesterday's listings. If both pages and `productCount` are unchanged,
+        reuse yesterday's pages between them.
+
+        Yesterday's listings which are carried over themselves are not reused,
+        so carried pages are at most one day old.
+
+        Return: `(listings_data, carried_pages)`, or `None` if changed.
+        """
+        prev_data = self.load_prev_listings(sctx, filter_item)
+        if not prev_data:
+            return None
+        if prev_data.get("carried_over"):
+            logger.mesg("    * Yesterday's listings are carried over, re-fetch")
+            return None
+        product_count = dict_get(filter_item, "productCount", None)
+        prev_listings = dict_get(prev_data, "listings", []) or []
+        if not product_count or product_count != prev_data.get("count_expected"):
+            return None
+        # yesterday's listings are incomplete, or from pages in another size
+        prev_page_size = prev_data.get("page_size", limit)
+        if len(prev_listings) < product_count or prev_page_size != limit:
+            return None
+        prev_fingerprints = prev_data.get(
+            "fingerprints"
+        ) or self.listing_extractor.get_fingerprints(prev_listings, limit)
+        last_page_no = len(prev_fingerprints) - 1
+        probe_pages = sorted({0, last_page_no})
+        logger.file(f"    * Probe pages: {probe_pages}")
+        self.pacer.wait()
+        results = self.fetch_listings_batch(
+            tab=tab,
+            sctx=sctx,
+            filter_item=filter_item,
+            page_nos=probe_pages,
+            limit=limit,
+        )
+        page_listings: dict[int, list[dict]] = {}
+        for page_no, result in results.items():
+            body = result.get("body")
+            if not body:
+                self.pacer.on_failure(
+                    "http_429" if result.get("status") == 429 else "empty"
+                )
+                return None
+            listings = self.listing_extractor.extract(body)
+            fingerprint = self.listing_extractor.get_page_fingerprint(listings)
+            if fingerprint != prev_fingerprints[page_no]:
+                logger.mesg(f"    * Page {page_no} changed since yesterday")
+                self.pacer.on_success()
+                return None
+            page_listings[page_no] = listings
+        self.pacer.on_success()
+        carried_pages = list(range(1, last_page_no))
+        listings_data = [
+            *page_listings[0],
+            *prev_listings[limit : last_page_no * limit],
+        ]
+        if last_page_no > 0:
+            listings_data.extend(page_listings[last_page_no])
+        logger.okay(
+            f"    ✓ Carry over {logstr.mesg(len(carried_pages))} unchanged pages "
+            f"from {logstr.file(brk(get_prev_date_str(self.date_str)))}"
+        )
+        return listings_data, carried_pages
+
+    def get_listing_url(
         self,
-        tab: ChromiumTab,
         sctx: SwiggySubCategoryContext,
         filter_item: dict,
         page_no: int,
         offset: int,
         limit: int = 20,
-    ) -> dict:
+    ) -> str:
         # https://www.swiggy.com/api/instamart/category-listing/filter?filterId=6822eeeded32000001e25aa2&storeId=1135722&primaryStoreId=1135722&secondaryStoreId=1396282&type=Speciality%20taxonomy%201&pageNo=1&limit=20&filterName=Fresh%20Vegetables&categoryName=Fresh%20Vegetables&offset=20
         filter_name = dict_get(filter_item, "name", None)
         taxonomy_type = dict_get(filter_item, "type", None)
@@ -577,6 +792,18 @@ class SwiggyCategoryScraper:
         }
         listing_params.update({"pageNo": page_no, "limit": limit, "offset": offset})
         url = f"{SWIGGY_API_FILTER_URL}?{urlencode_quote(listing_params)}"
+        return url
+
+    def fetch_listing(
+        self,
+        tab: "ChromiumTab",
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        page_no: int,
+        offset: int,
+        limit: int = 20,
+    ) -> dict:
+        url = self.get_listing_url(sctx, filter_item, page_no, offset, limit)
         payload = {"facets": {}, "sortAttribute": ""}
         payload_json = json.dumps(payload)
 
@@ -594,12 +821,16 @@ class SwiggyCategoryScraper:
         }});
         """
         tab.run_js(fetch_js)
+        self.client.page_count += 1
 
         try:
             for packet in tab.listen.steps(timeout=15):
                 if re.match(SWIGGY_API_FILTER_RE, packet.url):
                     packet_resp = packet.response
-                    if packet_resp:
+                    if packet_resp and packet_resp.status == 429:
+                        logger.warn(f"    × Too many requests (429)")
+                        self.pacer.on_failure("http_429")
+                    elif packet_resp:
                         logger.okay(f"    ✓ Captured packet")
                         listing_resp = packet_resp.body
                         return listing_resp
@@ -612,43 +843,175 @@ class SwiggyCategoryScraper:
 
         return None
 
-    def scrape_listings(
+    def fetch_listings_batch(
         self,
+        tab: "ChromiumTab",
         sctx: SwiggySubCategoryContext,
         filter_item: dict,
-        skip_exists: bool = True,
-    ) -> list[dict]:
-        if skip_exists:
-            local_listings_dict = self.load_local_listings(sctx, filter_item)
-            if local_listings_dict:
-                listings_count = len(dict_get(local_listings_dict, "listings", []))
-                logger.okay(
-                    f"  ✓ Load {logstr.mesg(listings_count)} local listings: "
-                    f"{logstr.mesg(brk(sctx.cname))} - {logstr.file(brk(sctx.sname))} - "
-                    f"{logstr.file(brk(dict_get(filter_item, 'name', None)))}"
-                )
-                return local_listings_dict
+        page_nos: list[int],
+        limit: int = 20,
+    ) -> dict[int, dict]:
+        """Fetch pages in one injected script with `Promise.all`,
+        and return pruned bodies directly from `run_js`, without listener.
 
-        tab = self.client.browser.latest_tab
-        if not tab.url.startswith(SWIGGY_LISTING_URL):
-            logger.note(f"  * Visit: {logstr.file(sctx.url)}")
-            tab.get(sctx.url, timeout=10)
-            sleep(3)
+        Return: `{page_no: {"status": int, "body": dict}}`
+        """
+        urls = [
+            self.get_listing_url(sctx, filter_item, page_no, page_no * limit, limit)
+            for page_no in page_nos
+        ]
+        payload = {"facets": {}, "sortAttribute": ""}
+        payload_json = json.dumps(payload)
+        batch_js = f"""
+        (async () => {{
+            {self.listing_extractor.prune_js}
+            const urls = {json.dumps(urls)};
+            const results = await Promise.all(urls.map(async (url) => {{
+                try {{
+                    const resp = await fetch(url, {{
+                        method: "POST",
+                        headers: {{
+                            "Content-Type": "application/json",
+                            "Accept": "application/json, text/plain, */*",
+                        }},
+                        body: '{payload_json}',
+                        credentials: "include"
+                    }});
+                    if (!resp.ok) {{
+                        return {{ status: resp.status, body: null }};
+                    }}
+                    const body = pruneListing(await resp.json());
+                    return {{ status: resp.status, body: body }};
+                }} catch (e) {{
+                    return {{ status: 0, body: null, error: String(e) }};
+                }}
+            }}));
+            return JSON.stringify(results);
+        }})()
+        """
+        self.client.page_count += len(page_nos)
+        try:
+            results_str = tab.run_js(batch_js, as_expr=True, timeout=30)
+            results = json.loads(results_str)
+        except Exception as e:
+            logger.warn(f"    × Batch fetch failed: {e}")
+            results = [{"status": 0, "body": None} for _ in page_nos]
+        return dict(zip(page_nos, results))
 
-        filter_name = dict_get(filter_item, "name", None)
-        logger.note(
-            f"  * GET listings: "
-            f"{logstr.mesg(brk(sctx.sname))} - {logstr.file(brk(filter_name))}"
+    def fetch_listing_direct(
+        self,
+        tab: "ChromiumTab",
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        page_no: int,
+        offset: int,
+        limit: int = 20,
+    ) -> dict:
+        """Same as `fetch_listing`, but get pruned json returned by injected fetch,
+        so no packet of other filters could be captured by mistake."""
+        results = self.fetch_listings_batch(
+            tab=tab,
+            sctx=sctx,
+            filter_item=filter_item,
+            page_nos=[page_no],
+            limit=limit,
         )
+        result = results.get(page_no) or {}
+        if result.get("status") == 429:
+            logger.warn(f"    × Too many requests (429)")
+            self.pacer.on_failure("http_429")
+        elif result.get("body"):
+            logger.okay(f"    ✓ Fetched json")
+        else:
+            logger.warn(f"    × No json from fetch: status={result.get('status')}")
+        return result.get("body")
 
-        offset, page_no, limit = 0, 0, 20
+    def fetch_listings_batched(
+        self,
+        tab: "ChromiumTab",
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        product_count: int,
+        limit: int = 20,
+    ) -> list[dict]:
+        """Fetch pages known from `productCount` in batches.
+        Batch size doubles after a clean batch, and halves after any failed page."""
+        pages_count = max(math.ceil(product_count / limit), 1)
+        todo_pages = list(range(pages_count))
+        last_page_no = pages_count - 1
+        page_attempts: dict[int, int] = {}
+        page_listings: dict[int, list[dict]] = {}
+        batch_size = self.BATCH_INIT_SIZE
+        while todo_pages:
+            batch_pages = todo_pages[:batch_size]
+            todo_pages = todo_pages[batch_size:]
+            self.pacer.wait()
+            logger.file(f"    * pages={batch_pages}, batch_size={batch_size}")
+            results = self.fetch_listings_batch(
+                tab=tab,
+                sctx=sctx,
+                filter_item=filter_item,
+                page_nos=batch_pages,
+                limit=limit,
+            )
+            failed_pages = []
+            is_throttled = False
+            for page_no, result in results.items():
+                body = result.get("body")
+                if result.get("status") == 429:
+                    is_throttled = True
+                if not body:
+                    failed_pages.append(page_no)
+                    continue
+                listings = self.listing_extractor.extract(body)
+                page_listings[page_no] = listings
+                has_more = dict_get(body, "data.hasMore", False)
+                # productCount might be stale, so follow hasMore of last page
+                if page_no == last_page_no and has_more and listings:
+                    last_page_no += 1
+                    todo_pages.append(last_page_no)
+            if failed_pages:
+                logger.warn(f"    × Failed pages: {failed_pages}")
+                self.pacer.on_failure("http_429" if is_throttled else "empty")
+                batch_size = max(batch_size // 2, 1)
+                for page_no in failed_pages:
+                    page_attempts[page_no] = page_attempts.get(page_no, 0) + 1
+                    if page_attempts[page_no] < self.BATCH_MAX_ATTEMPTS:
+                        todo_pages.append(page_no)
+                    else:
+                        logger.warn(f"    × Give up page {page_no}")
+            else:
+                self.pacer.on_success()
+                batch_size = min(batch_size * 2, self.BATCH_MAX_SIZE)
+        listings_data = []
+        for page_no in sorted(page_listings.keys()):
+            listings_data.extend(page_listings[page_no])
+        logger.okay(
+            f"    ✓ Extract {logstr.file(len(listings_data))} products "
+            f"from {logstr.mesg(len(page_listings))} pages"
+        )
+        return listings_data
+
+    def fetch_listings_sequential(
+        self,
+        tab: "ChromiumTab",
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        limit: int = 20,
+    ) -> list[dict]:
+        offset, page_no = 0, 0
         has_more = True
         listings_data = []
         while has_more:
+            self.pacer.wait()
             logger.file(f"    * page={page_no}, offset={offset}")
             logger.store_indent()
             logger.indent(2)
-            listing_resp = self.fetch_listing(
+            if self.fetch_mode == "direct":
+                fetch_func = self.fetch_listing_direct
+            else:
+                fetch_func = self.fetch_listing
+            listing_resp = fetch_func(
                 tab=tab,
                 sctx=sctx,
                 filter_item=filter_item,
@@ -658,6 +1021,7 @@ class SwiggyCategoryScraper:
             )
 
             if listing_resp:
+                self.pacer.on_success()
                 listings = self.listing_extractor.extract(listing_resp)
                 listings_data.extend(listings)
                 has_more = dict_get(listing_resp, "data.hasMore", False)
@@ -667,20 +1031,70 @@ class SwiggyCategoryScraper:
                 )
             else:
                 logger.warn(f"    × Failed to fetch page {page_no}")
+                self.pacer.on_failure("empty")
                 has_more = False
 
             if has_more:
                 page_no += 1
                 offset += limit
-                sleep(2)
             logger.restore_indent()
+        return listings_data
+
+    def scrape_listings(
+        self,
+        sctx: SwiggySubCategoryContext,
+        filter_item: dict,
+        skip_exists: bool = True,
+    ) -> list[dict]:
+        if skip_exists:
+            local_listings_dict = self.load_local_listings(sctx, filter_item)
+            if local_listings_dict:
+                listings_count = len(dict_get(local_listings_dict, "listings", []))
+                logger.okay(
+                    f"  ✓ Load {logstr.mesg(listings_count)} local listings: "
+                    f"{logstr.mesg(brk(sctx.cname))} - {logstr.file(brk(sctx.sname))} - "
+                    f"{logstr.file(brk(dict_get(filter_item, 'name', None)))}"
+                )
+                incr("listings", status="skipped")
+                return local_listings_dict
+
+        tab = self.client.browser.latest_tab
+        if not tab.url.startswith(SWIGGY_LISTING_URL):
+            logger.note(f"  * Visit: {logstr.file(sctx.url)}")
+            tab.get(sctx.url, timeout=10)
+            self.client.page_count += 1
+            sleep(3)
+
+        filter_name = dict_get(filter_item, "name", None)
+        logger.note(
+            f"  * GET listings: "
+            f"{logstr.mesg(brk(sctx.sname))} - {logstr.file(brk(filter_name))}"
+        )
+
+        product_count = dict_get(filter_item, "productCount", None)
+        probed = None
+        if self.carry_over:
+            probed = self.probe_listings(tab=tab, sctx=sctx, filter_item=filter_item)
+        carried_pages = []
+        if probed:
+            listings_data, carried_pages = probed
+        elif self.fetch_mode == "batch" and product_count:
+            listings_data = self.fetch_listings_batched(
+                tab=tab, sctx=sctx, filter_item=filter_item, product_count=product_count
+            )
+        else:
+            listings_data = self.fetch_listings_sequential(
+                tab=tab, sctx=sctx, filter_item=filter_item
+            )
 
         logger.okay(
             f"  ✓ Fetched {logstr.mesg(len(listings_data))} products of "
             f"{logstr.file(brk(filter_name))}"
         )
 
-        self.save_listings(listings_data, sctx, filter_item)
+        self.save_listings(listings_data, sctx, filter_item, carried_pages)
+        incr("listing_products", len(listings_data))
+        incr("listings", status="done" if listings_data else "failed")
 
         return listings_data
 
@@ -689,7 +1103,16 @@ class SwiggyCategoryScraper:
         sctx: SwiggySubCategoryContext,
         listings_data: list[dict],
         filter_item: dict,
+        carried_pages: list[int] = None,
+        limit: int = 20,
     ) -> dict:
+        if carried_pages:
+            carried_over = {
+                "date": get_prev_date_str(self.date_str),
+                "pages": carried_pages,
+            }
+        else:
+            carried_over = None
         save_data = {
             "categ": sctx.cname,
             "sub_categ": sctx.sname,
@@ -702,6 +1125,11 @@ class SwiggyCategoryScraper:
             "location": self.location,
             "count": len(listings_data),
             "count_expected": dict_get(filter_item, "productCount", None),
+            "carried_over": carried_over,
+            "page_size": limit,
+            "fingerprints": self.listing_extractor.get_fingerprints(
+                listings_data, limit
+            ),
             "listings": listings_data,
         }
         return save_data
@@ -711,17 +1139,22 @@ class SwiggyCategoryScraper:
         listings_data: list[dict],
         sctx: SwiggySubCategoryContext,
         filter_item: dict,
+        carried_pages: list[int] = None,
     ):
         listings_path = self.get_listings_path(sctx, filter_item)
         logger.okay(f"  ✓ Save {logstr.mesg(len(listings_data))} items to:", end=" ")
         listings_path.parent.mkdir(parents=True, exist_ok=True)
         save_data = self.construct_listings_save_data(
-            sctx=sctx, listings_data=listings_data, filter_item=filter_item
+            sctx=sctx,
+            listings_data=listings_data,
+            filter_item=filter_item,
+            carried_pages=carried_pages,
         )
         with open(listings_path, "w", encoding="utf-8") as wf:
             json.dump(save_data, wf, ensure_ascii=False, indent=4)
         logger.okay(f"{brk(listings_path)}")
 
+    @timed("process_context", site=WEBSITE_NAME)
     def process_context(
         self, cctx: SwiggyCategoryContext, sctx: SwiggySubCategoryContext
     ):
@@ -730,22 +1163,29 @@ class SwiggyCategoryScraper:
             for filter_item in dict_get(categ_filters, "filters", []):
                 self.scrape_listings(sctx, filter_item, skip_exists=True)
 
-    def wait_next(self, seconds: int = 8):
-        logger.note(f"  > Waiting {seconds}s for next ...")
-        sleep(seconds)
+    def wait_next(self):
+        self.subcateg_pacer.wait()
 
     def run(self, location_idx: int = 0):
         iterator = SwiggyCategoryIterator(
             date_str=self.date_str, location=self.location
         )
-        self.client.start_client()
-        for cctx in iterator:
-            cctx.log_info()
-            for sctx in cctx.sctxs:
-                sctx.log_info()
-                if not self.switcher.is_at_idx(location_idx):
-                    self.switcher.set_location(location_idx)
-                self.process_context(cctx=cctx, sctx=sctx)
+        self.filters_store = SwiggyFiltersStore(
+            get_filters_dump_path(self.date_str, self.location)
+        )
+        try:
+            for cctx in iterator:
+                cctx.log_info()
+                for sctx in cctx.sctxs:
+                    sctx.log_info()
+                    # browser is recycled between sub-categories if over thresholds,
+                    # and `on_recycle` restores location
+                    self.client.start_client()
+                    if not self.switcher.is_at_idx(location_idx):
+                        self.switcher.set_location(location_idx)
+                    self.process_context(cctx=cctx, sctx=sctx)
+        finally:
+            self.filters_store.flush()
         self.client.stop_client()
 
 
@@ -756,6 +1196,8 @@ class SwiggyTraverser:
         date_str: str = None,
         client_settings: dict = None,
         locations: list = None,
+        fetch_mode: FETCH_MODE = "listen",
+        carry_over: bool = True,
     ):
         self.skip_exists = skip_exists
         self.date_str = norm_date_str(date_str)
@@ -766,16 +1208,27 @@ class SwiggyTraverser:
         self.switcher = SwiggyLocationSwitcher(
             client_settings=self.client_settings, locations=self.locations
         )
+        self.client.on_recycle = self.restore_location
         self.fetcher = SwiggyCategoriesFetcher(
             client=self.client, switcher=self.switcher, date_str=self.date_str
         )
         self.scraper = SwiggyCategoryScraper(
-            client=self.client, switcher=self.switcher, date_str=self.date_str
+            client=self.client,
+            switcher=self.switcher,
+            date_str=self.date_str,
+            fetch_mode=fetch_mode,
+            carry_over=carry_over,
         )
 
+    def restore_location(self, client: BrowserClient):
+        """Relaunch recycled browser by switcher, and set its location again."""
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
+
     def run(self):
         for location_idx, location_item in enumerate(self.locations[:]):
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             location_text = location_item.get("text", "")
             self.fetcher.location = location_name
             self.scraper.location = location_name
@@ -783,6 +1236,9 @@ class SwiggyTraverser:
             categ_path = get_categ_dump_path(
                 date_str=self.date_str, location=location_name
             )
+            categ_tree = get_categ_tree(WEBSITE_NAME, self.date_str)
+            if categ_tree.has_location(location_name):
+                categ_path = categ_tree.tree_path
             if self.skip_exists and categ_path.exists():
                 logger.mesg(
                     f"> Skip fetch existed categories: {logstr.file(brk(categ_path))}"
@@ -812,6 +1268,7 @@ class SwiggySummarizer:
         self.date_str = norm_date_str(date_str)
         self.locations = locations or SWIGGY_LOCATIONS
         self.summary_root = get_summary_root(self.date_str)
+        self.row_cache = RowCache(self.summary_root / "row_cache.parquet")
 
     def get_listings_path(
         self, sctx: SwiggySubCategoryContext, filter_item: dict, location: str
@@ -839,15 +1296,17 @@ class SwiggySummarizer:
         return row
 
     def get_rows_from_context(
-        self, sctx: SwiggySubCategoryContext, location: str
+        self,
+        sctx: SwiggySubCategoryContext,
+        location: str,
+        filters_store: SwiggyFiltersStore,
     ) -> list[dict]:
-        filters_path = get_filters_dump_path(self.date_str, location)
-        if not filters_path.exists():
+        if not filters_store.exists():
+            filters_path = filters_store.filters_path
             logger.warn(f"  × Filters not exists: {logstr.file(brk(filters_path))}")
             return []
         res = []
-        filters_data = load_json(filters_path)
-        filter_items = dict_get(filters_data, sctx.sname, {}).get("filters", [])
+        filter_items = (filters_store.get(sctx.sname) or {}).get("filters", [])
         for filter_item in filter_items:
             listings_path = self.get_listings_path(
                 sctx, filter_item=filter_item, location=location
@@ -857,25 +1316,43 @@ class SwiggySummarizer:
                     f"  × Listings not exists: {logstr.file(brk(listings_path))}"
                 )
                 continue
-            listings_data = load_json(listings_path)
-            categ_row = self.categ_dict_to_row(listings_data)
-            products = dict_get(listings_data, "listings", []) or []
-            product_rows = [self.product_dict_to_row(product) for product in products]
-            rows = []
-            for product_row in product_rows:
-                if not product_row:
-                    continue
-                row = {
-                    "date": self.date_str,
-                    "location": location,
-                    **categ_row,
-                    **product_row,
-                }
-                rows.append(row)
+            rows = self.row_cache.get_rows(
+                listings_path,
+                lambda: self.get_rows_from_listings(listings_path, location),
+            )
             res.extend(rows)
         return res
 
-    def rows_to_df(self, rows: list[dict]) -> pd.DataFrame:
+    def get_rows_from_listings(self, listings_path: Path, location: str) -> list[dict]:
+        listings_data = load_json(listings_path)
+        categ_row = self.categ_dict_to_row(listings_data)
+        products = dict_get(listings_data, "listings", []) or []
+        # products on carried pages are marked with date they are fetched
+        carried_over = listings_data.get("carried_over") or {}
+        carried_pages = set(carried_over.get("pages") or [])
+        page_size = listings_data.get("page_size") or 20
+        rows = []
+        for idx, product in enumerate(products):
+            product_row = self.product_dict_to_row(product)
+            if not product_row:
+                continue
+            if idx // page_size in carried_pages:
+                carried_over_date = carried_over.get("date")
+            else:
+                carried_over_date = None
+            row = {
+                "date": self.date_str,
+                "location": location,
+                **categ_row,
+                **product_row,
+                "carried_over": carried_over_date,
+            }
+            rows.append(row)
+        return rows
+
+    def rows_to_df(self, rows: list[dict]) -> "pd.DataFrame":
+        import pandas as pd
+
         df = pd.DataFrame(rows)
         for col in DF_INT_COLUMNS:
             if col not in df.columns:
@@ -891,7 +1368,7 @@ class SwiggySummarizer:
     def get_xlsx_sheet_name(self, location: str) -> tuple[Path, str]:
         return f"{self.date_str}_{WEBSITE_NAME}_{location}"
 
-    def save_df_to_xlsx(self, df: pd.DataFrame, location: str):
+    def save_df_to_xlsx(self, df: "pd.DataFrame", location: str):
         sheet_name = self.get_xlsx_sheet_name(location)
         xlsx_name = f"summary_{sheet_name}.xlsx"
         xlsx_path = self.summary_root / xlsx_name
@@ -900,10 +1377,15 @@ class SwiggySummarizer:
         df.to_excel(xlsx_path, sheet_name=sheet_name, index=False, engine="openpyxl")
         logger.okay(f"  * {brk(xlsx_path)}")
 
-    def save_dfs_to_xlsx(self, df_locs: list[tuple[pd.DataFrame, str]]):
+    def get_combined_xlsx_path(self) -> Path:
         xlsx_name = f"summary_{self.date_str}_{WEBSITE_NAME}.xlsx"
-        xlsx_root = self.summary_root.parent
-        xlsx_path = xlsx_root / xlsx_name
+        return self.summary_root.parent / xlsx_name
+
+    @timed("dump_excel", site=WEBSITE_NAME)
+    def save_dfs_to_xlsx(self, df_locs: "list[tuple[pd.DataFrame, str]]"):
+        import pandas as pd
+
+        xlsx_path = self.get_combined_xlsx_path()
         logger.note(f"> Save combined summary to xslx:")
         with pd.ExcelWriter(xlsx_path, engine="openpyxl") as writer:
             for df, location in df_locs:
@@ -914,28 +1396,45 @@ class SwiggySummarizer:
         logger.okay(f"  * {brk(xlsx_path)}")
 
     def run(self):
-        df_locs: list[tuple[pd.DataFrame, str]] = []
+        rows_locs: list[tuple[list[dict], str]] = []
         for location_idx, location_item in enumerate(self.locations[:]):
             location = location_item.get("name", "")
             location_text = location_item.get("text", "")
             logger.hint(f"> Location: {location} - {location_text}")
             iterator = SwiggyCategoryIterator(date_str=self.date_str, location=location)
+            filters_store = SwiggyFiltersStore(
+                get_filters_dump_path(self.date_str, location)
+            )
             rows: list[dict] = []
             for cctx in iterator:
                 for sctx in cctx.sctxs:
-                    sctx_rows = self.get_rows_from_context(sctx=sctx, location=location)
+                    sctx_rows = self.get_rows_from_context(
+                        sctx=sctx, location=location, filters_store=filters_store
+                    )
                     rows.extend(sctx_rows)
-            df = self.rows_to_df(rows)
-            df_locs.append((df, location))
+            rows_locs.append((rows, location))
+
+        self.row_cache.prune()
+        if not self.row_cache.is_changed() and self.get_combined_xlsx_path().exists():
+            logger.okay(f"> Skip summary, as no listings json changed")
+            self.row_cache.save()
+            return
 
+        df_locs = [(self.rows_to_df(rows), location) for rows, location in rows_locs]
         for df, location in df_locs:
             self.save_df_to_xlsx(df, location)
         self.save_dfs_to_xlsx(df_locs)
+        self.row_cache.save()
 
 
 def run_traverser(args: argparse.Namespace):
     try:
-        traverser = SwiggyTraverser(skip_exists=True, date_str=args.date)
+        traverser = SwiggyTraverser(
+            skip_exists=True,
+            date_str=args.date,
+            fetch_mode=args.fetch_mode,
+            carry_over=not args.no_carry_over,
+        )
         traverser.run()
     except Exception as e:
         logger.warn(e)
@@ -946,23 +1445,38 @@ def run_traverser(args: argparse.Namespace):
 
 
 def main(args: argparse.Namespace):
-    if args.traverse:
-        with Retrier(max_retries=50, retry_interval=60) as retrier:
-            retrier.run(run_traverser, args=args)
+    exporter = PromTextfileExporter(job=f"{WEBSITE_NAME}_traverser")
+    exporter.start()
+    try:
+        if args.traverse:
+            with Retrier(max_retries=50, retry_interval=60) as retrier:
+                retrier.run(run_traverser, args=args)
 
-    if args.summarize:
-        summarizer = SwiggySummarizer(date_str=args.date)
-        summarizer.run()
+        if args.summarize:
+            summarizer = SwiggySummarizer(date_str=args.date)
+            summarizer.run()
+    finally:
+        dump_summary(get_dump_root(args.date))
+        exporter.stop()
 
 
 if __name__ == "__main__":
-    arg_parser = TraverserArgParser()
+    arg_parser = SwiggyTraverserArgParser()
     args = arg_parser.parse_args()
-    with Runtimer():
+    with Runtimer(), profile_from_args(args):
         main(args)
 
     # Case 1: traverse, scrape, save
     # python -m web.swiggy.traverser -s
 
-    # Case 2: summarize
+    # Case 2: traverse, fetch listing pages in batches
+    # python -m web.swiggy.traverser -s -F batch
+
+    # Case 3: traverse, get listing json from injected fetch page by page
+    # python -m web.swiggy.traverser -s -F direct
+
+    # Case 4: traverse, re-fetch all pages without carrying over from yesterday
+    # python -m web.swiggy.traverser -s -n
+
+    # Case 5: summarize
     # python -m web.swiggy.traverser -e
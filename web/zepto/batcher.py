@@ -1,20 +1,30 @@
 import argparse
 import json
+import threading
 
 from acto import Retrier
 from copy import deepcopy
 from tclogger import logger, logstr, brk, get_now_str, Runtimer, TCLogbar, TCLogbarGroup
-from time import sleep
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, perf_counter
 from pathlib import Path
 from typing import Union
 
-from configs.envs import DATA_ROOT, ZEPTO_LOCATIONS
+from configs.envs import DATA_ROOT, ZEPTO_LOCATIONS, ZEPTO_BROWSER_SETTING
 from file.excel_parser import ExcelReader, DataframeParser
+from web.browser import BrowserClient
 from web.zepto.scraper import ZeptoLocationChecker, ZeptoLocationSwitcher
 from web.zepto.scraper import ZeptoBrowserScraper, ZeptoProductDataExtractor
 from web.logs import log_link_idx, log_traceback
 from file.local_dump import LocalAddressExtractor, ZeptoProductRespChecker
 from file.record import LinksRecorder
+from file.work_queue import WorkQueue
+from web.pacer import get_pacer
+from web.proxy import ProxyNode, get_proxy_pool
+from web.instrument import INSTRUMENT, set_labels, incr, dump_summary
+from web.metrics import PromTextfileExporter
+from web.profiler import profile_from_args
+from web.daemon import use_daemon
 from cli.arg import BatcherArgParser
 
 WEBSITE_NAME = "zepto"
@@ -36,6 +46,25 @@ ZEPTO_KEY_COLUMN_MAP = {
 }
 
 
+class ZeptoProxyWorker:
+    """Switcher and scraper on browser of one proxy. Both use the same settings,
+    so either could launch the browser. Locations of one proxy run serially."""
+
+    def __init__(self, node: ProxyNode, client_settings: dict, date_str: str = None):
+        self.node = node
+        self.switcher = ZeptoLocationSwitcher(client_settings=client_settings)
+        self.scraper = ZeptoBrowserScraper(
+            date_str=date_str, client_settings=client_settings, pacer_scope=node.name
+        )
+        self.scraper.client.on_recycle = self.restore_location
+        self.pacer = self.scraper.pacer
+        self.lock = threading.Lock()
+
+    def restore_location(self, client: BrowserClient):
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
+
+
 class ZeptoScrapeBatcher:
     def __init__(
         self,
@@ -54,11 +83,34 @@ class ZeptoScrapeBatcher:
         # switcher would not work, as scraper is already initiating a browser without proxy
         self.switcher = ZeptoLocationSwitcher()
         self.scraper = ZeptoBrowserScraper(date_str=date_str)
-        self.extractor = ZeptoProductDataExtractor()
+        self.scraper.client.on_recycle = self.restore_location
         self.addr_extractor = LocalAddressExtractor(website_name=WEBSITE_NAME)
         self.product_checker = ZeptoProductRespChecker()
         self.checker = ZeptoLocationChecker()
         self.recorder = LinksRecorder(website=WEBSITE_NAME, date_str=date_str)
+        self.queue = WorkQueue(website=WEBSITE_NAME, date_str=date_str)
+        self.pacer = get_pacer(WEBSITE_NAME)
+        # with proxies in `proxy_settings`, locations run on browsers of proxies,
+        # and switcher and scraper above only serve non-proxy runs (such as daemon)
+        self.proxy_pool = get_proxy_pool(WEBSITE_NAME)
+        self.workers: dict[str, ZeptoProxyWorker] = {}
+        self.workers_lock = threading.Lock()
+
+    def get_worker(self, node: ProxyNode) -> ZeptoProxyWorker:
+        with self.workers_lock:
+            if node.name not in self.workers:
+                client_settings = self.proxy_pool.get_client_settings(
+                    node, ZEPTO_BROWSER_SETTING
+                )
+                self.workers[node.name] = ZeptoProxyWorker(
+                    node, client_settings, date_str=self.scraper.date_str
+                )
+            return self.workers[node.name]
+
+    def restore_location(self, client: BrowserClient):
+        """Relaunch recycled browser by switcher, and set its location again."""
+        if self.switcher.current_location_idx is not None:
+            self.switcher.set_location(self.switcher.current_location_idx)
 
     def close_switcher(self):
         try:
@@ -67,84 +119,203 @@ class ZeptoScrapeBatcher:
             logger.warn(f"× ZeptoScrapeBatcher.close_switcher: {e}")
 
     def close_scraper(self):
-        try:
-            self.scraper.client.close_other_tabs(create_new_tab=True)
-            if self.close_browser_after_done:
-                self.scraper.client.stop_client(close_browser=True)
-        except Exception as e:
-            logger.warn(f"× ZeptoScrapeBatcher.close_scraper: {e}")
+        scrapers = [self.scraper] + [w.scraper for w in self.workers.values()]
+        for scraper in scrapers:
+            try:
+                scraper.client.close_other_tabs(create_new_tab=True)
+                if self.close_browser_after_done:
+                    scraper.client.stop_client(close_browser=True)
+            except Exception as e:
+                logger.warn(f"× ZeptoScrapeBatcher.close_scraper: {e}")
+
+    def init_queue(self, location_name: str, links: list[str]):
+        """Add links of location which are not in queue yet, such as rows added to
+        xlsx later, and validate their local dumps once."""
+        logger.note(f"> Init work queue: {logstr.mesg(brk(location_name))}")
+        for link_idx, link in enumerate(links):
+            if not link:
+                continue
+            product_id = link.split("/")[-1].strip()
+            if self.queue.get_item(location_name, product_id):
+                continue
+            state = "pending"
+            dump_path = self.scraper.get_dump_path(product_id, parent=location_name)
+            if self.skip_exists and dump_path.exists():
+                location_check = self.addr_extractor.check_dump_path_location(
+                    dump_path, correct_location_name=location_name
+                )
+                product_check = self.product_checker.check(dump_path)
+                if location_check and product_check:
+                    state = "done"
+                    incr("products", status="skipped")
+                else:
+                    log_link_idx(link_idx, len(links))
+                    logger.file(f"  * {dump_path}")
+                    if not location_check:
+                        logger.warn(f"  × Incorrect location")
+                    if not product_check:
+                        logger.warn(f"  × Incorrect product")
+                    logger.warn(f"  * Remove local dump file, and re-scrape")
+                    dump_path.unlink(missing_ok=True)
+            self.queue.add(
+                location_name, product_id, link=link, idx=link_idx, state=state
+            )
+        if not self.queue.has_location(location_name):
+            self.queue.add_location(location_name)
+
+    def run_location(
+        self,
+        location_idx: int,
+        location_item: dict,
+        links: list[str],
+        worker: ZeptoProxyWorker = None,
+    ) -> bool:
+        """Scrape pending items of location, by browser of worker if given.
+        Return False if proxy of worker turns unhealthy, to fail over.
+        With worker, return once only items in backoff are left, so that lock
+        of worker is not held while waiting for them."""
+        switcher = worker.switcher if worker else self.switcher
+        scraper = worker.scraper if worker else self.scraper
+        pacer = worker.pacer if worker else self.pacer
+        location_name = location_item.get("name", "")
+        location_text = location_item.get("text", "")
+        is_set_location = False
+        for item in self.queue.iter_pending(location_name, wait=not worker):
+            product_id = item["product_id"]
+            record_params = {
+                "website": WEBSITE_NAME,
+                "location": location_name,
+                "link": item["link"],
+            }
+            if not is_set_location:
+                logger.hint(f"> New Location: {location_name} ({location_text})")
+                switcher.set_location(location_idx)
+                is_set_location = True
+            log_link_idx(item["idx"], len(links))
+            pacer.wait()
+            # signals raised by scraper are also counted to health of proxy
+            signal_counts = dict(scraper.pacer.signal_counts)
+            fetch_start = perf_counter()
+            is_proxy_healthy = True
+            try:
+                product_info = scraper.run(product_id, parent=location_name)
+            except Exception as e:
+                log_traceback(e)
+                self.recorder.update_record(**record_params)
+                incr("products", status="failed")
+                if worker and not self.on_proxy_result(worker, signal_counts, "error"):
+                    # failure on unhealthy proxy is not counted to attempts of item
+                    self.queue.release(item, error=str(e))
+                    return False
+                self.queue.mark_failed(item, error=str(e))
+                continue
+            if worker:
+                is_proxy_healthy = self.on_proxy_result(
+                    worker, signal_counts, latency=perf_counter() - fetch_start
+                )
+            mark_failed = (
+                self.queue.mark_failed if is_proxy_healthy else self.queue.release
+            )
+            try:
+                self.checker.check_product_location(
+                    product_info, location_idx, extra_msg="ZeptoScrapeBatcher"
+                )
+            except Exception as e:
+                # location might be reset by website, so set it again
+                dump_path = scraper.get_dump_path(product_id, parent=location_name)
+                dump_path.unlink(missing_ok=True)
+                pacer.on_failure("location_reset")
+                self.recorder.update_record(**record_params)
+                incr("products", status="failed")
+                mark_failed(item, error=str(e))
+                is_set_location = False
+            else:
+                dump_path = scraper.get_dump_path(product_id, parent=location_name)
+                if self.product_checker.check(dump_path):
+                    incr("products", status="done")
+                    self.queue.mark_done(item)
+                    pacer.on_success()
+                else:
+                    # empty or incorrect product info is re-scraped, not extracted
+                    logger.warn(
+                        f"  × Incorrect product info: {logstr.file(brk(dump_path))}"
+                    )
+                    dump_path.unlink(missing_ok=True)
+                    self.recorder.update_record(**record_params)
+                    incr("products", status="failed")
+                    mark_failed(item, error="Incorrect product info")
+            # item is finished before failover, so it is never scraped twice
+            if not is_proxy_healthy:
+                return False
+        self.queue.log_counts(location_name)
+        return True
+
+    def on_proxy_result(
+        self,
+        worker: ZeptoProxyWorker,
+        signal_counts: dict[str, int],
+        error: str = None,
+        latency: float = None,
+    ) -> bool:
+        """Update health of proxy by new pacer signals of fetch, and error.
+        Return whether proxy is still healthy."""
+        signals = []
+        for signal, count in worker.scraper.pacer.signal_counts.items():
+            signals.extend([signal] * (count - signal_counts.get(signal, 0)))
+        if error:
+            signals.append(error)
+        for signal in signals:
+            self.proxy_pool.on_failure(worker.node, signal)
+        if not signals:
+            self.proxy_pool.on_success(worker.node, latency=latency)
+        return self.proxy_pool.is_healthy(worker.node)
+
+    def run_proxy_location(
+        self, location_idx: int, location_item: dict, links: list[str]
+    ):
+        """Run location on its sticky proxy, and fail over until it is done.
+        Items in backoff are waited for without lock of proxy, so other
+        locations of proxy could run meanwhile."""
+        location_name = location_item.get("name", "")
+        set_labels(site=WEBSITE_NAME, location=location_name)
+        while True:
+            # no failover loop while all proxies are in cooldown
+            self.proxy_pool.wait_healthy()
+            worker = self.get_worker(self.proxy_pool.assign(location_name))
+            with worker.lock, INSTRUMENT.labels(proxy=worker.node.name):
+                is_proxy_healthy = self.run_location(
+                    location_idx, location_item, links, worker
+                )
+            if not is_proxy_healthy:
+                continue
+            ready_items, wait_seconds = self.queue.get_ready_items(location_name)
+            if not ready_items and not wait_seconds:
+                return
+            if wait_seconds:
+                logger.note(f"> Waiting {wait_seconds:.0f}s for failed items ...")
+                sleep(wait_seconds)
 
     def run(self):
         zepto_links = self.excel_reader.get_column_by_name("weblink_zepto")
-        for location_idx, location_item in enumerate(ZEPTO_LOCATIONS):
+        for location_item in ZEPTO_LOCATIONS:
             location_name = location_item.get("name", "")
-            location_text = location_item.get("text", "")
-            links = zepto_links[:]
-            is_set_location = False
-            # multiple runs to scan and recover missing products
-            for loop_idx in range(3):
-                for link_idx, link in enumerate(links):
-                    is_log_link_idx = False
-                    if not link:
-                        # logger.mesg(f"> Skip empty link at row [{link_idx}]")
-                        continue
-
-                    record_params = {
-                        "website": WEBSITE_NAME,
-                        "location": location_name,
-                        "link": link,
-                    }
-                    if not self.recorder.is_record_good(**record_params, max_count=3):
-                        if loop_idx == 0:
-                            logger.warn(
-                                f"* Skip link for too many error times: {logstr.file(link)}"
-                            )
-                        continue
-
-                    product_id = link.split("/")[-1].strip()
-                    dump_path = self.scraper.get_dump_path(
-                        product_id, parent=location_name
-                    )
-                    if self.skip_exists and dump_path.exists():
-                        location_check = self.addr_extractor.check_dump_path_location(
-                            dump_path, correct_location_name=location_name
-                        )
-                        product_check = self.product_checker.check(dump_path)
-                        if location_check and product_check:
-                            # logger.note(f"> Skip exists:  {logstr.file(brk(dump_path))}")
-                            continue
-                        else:
-                            if not is_log_link_idx:
-                                log_link_idx(link_idx, len(links))
-                                is_log_link_idx = True
-                            logger.file(f"  * {dump_path}")
-                            if not location_check:
-                                logger.warn(f"  × Incorrect location")
-                            if not product_check:
-                                logger.warn(f"  × Incorrect product")
-                            logger.warn(f"> Remove local dump file, and re-scrape")
-                            self.recorder.update_record(**record_params)
-                            dump_path.unlink(missing_ok=True)
-                    if not is_set_location:
-                        logger.hint(
-                            f"> New Location: {location_name} ({location_text})"
-                        )
-                        self.switcher.set_location(location_idx)
-                        is_set_location = True
-                    if not is_log_link_idx:
-                        log_link_idx(link_idx, len(links))
-                        is_log_link_idx = True
-                    try:
-                        product_info = self.scraper.run(
-                            product_id, parent=location_name
-                        )
-                    except Exception as e:
-                        self.recorder.update_record(**record_params)
-                        continue
-                    self.checker.check_product_location(product_info, location_idx)
-                    extracted_data = self.extractor.extract(product_info)
-                    if extracted_data:
-                        sleep(3)
+            set_labels(site=WEBSITE_NAME, location=location_name)
+            self.init_queue(location_name, zepto_links[:])
+        if self.proxy_pool:
+            # browsers of proxies run concurrently, and locations of same proxy
+            # wait for its lock, so an idle proxy is never blocked by a busy one
+            with ThreadPoolExecutor(max_workers=len(ZEPTO_LOCATIONS)) as executor:
+                futures = [
+                    executor.submit(self.run_proxy_location, idx, item, zepto_links[:])
+                    for idx, item in enumerate(ZEPTO_LOCATIONS)
+                ]
+                for future in futures:
+                    future.result()
+        else:
+            for location_idx, location_item in enumerate(ZEPTO_LOCATIONS):
+                location_name = location_item.get("name", "")
+                set_labels(site=WEBSITE_NAME, location=location_name)
+                self.run_location(location_idx, location_item, zepto_links[:])
         self.close_scraper()
 
 
@@ -205,6 +376,7 @@ class ZeptoExtractBatcher:
             df = deepcopy(self.excel_reader.df)
             df_parser = DataframeParser(df, verbose=self.verbose)
             location_name = location_item.get("name", "")
+            set_labels(site=WEBSITE_NAME, location=location_name)
             links = zepto_links[:]
             location_bar.update(desc=logstr.mesg(brk(location_name)), flush=True)
             row_dicts: list[dict] = []
@@ -261,6 +433,11 @@ def run_scrape_batcher(args: argparse.Namespace):
             date_str=args.date,
             close_browser_after_done=args.close_browser_after_done,
         )
+        if args.daemon:
+            if scraper_batcher.proxy_pool:
+                logger.warn("  × Proxy pool is not used, as daemon owns browser")
+                scraper_batcher.proxy_pool = None
+            use_daemon(scraper_batcher, WEBSITE_NAME)
         scraper_batcher.run()
     except Exception as e:
         log_traceback(e)
@@ -271,20 +448,30 @@ def run_scrape_batcher(args: argparse.Namespace):
 
 
 def main(args: argparse.Namespace):
-    if args.scrape:
-        with Retrier(max_retries=30, retry_interval=60) as retrier:
-            retrier.run(run_scrape_batcher, args=args)
+    exporter = PromTextfileExporter(job=f"{WEBSITE_NAME}_batcher")
+    exporter.start()
+    try:
+        if args.scrape:
+            if args.force_scrape:
+                WorkQueue(website=WEBSITE_NAME, date_str=args.date).reset()
+            # retried batcher resumes from pending items in work queue
+            with Retrier(max_retries=30, retry_interval=60) as retrier:
+                retrier.run(run_scrape_batcher, args=args)
 
-    if args.extract:
-        extract_batcher = ZeptoExtractBatcher(date_str=args.date)
-        extract_batcher.run()
+        if args.extract:
+            extract_batcher = ZeptoExtractBatcher(date_str=args.date)
+            extract_batcher.run()
+    finally:
+        date_str = args.date or get_now_str()[:10]
+        dump_summary(DATA_ROOT / "output" / date_str / WEBSITE_NAME)
+        exporter.stop()
 
 
 if __name__ == "__main__":
     arg_parser = BatcherArgParser()
     args = arg_parser.parse_args()
 
-    with Runtimer():
+    with Runtimer(), profile_from_args(args):
         main(args)
 
     # Case 1: Batch scrape
@@ -1,18 +1,23 @@
 import json
 import re
 
-from DrissionPage._pages.chromium_tab import ChromiumTab
 from pathlib import Path
 from tclogger import logger, logstr, brk, get_now_str, dict_to_str
 from tclogger import dict_get, dict_set, match_val
 from time import sleep
-from typing import Union
+from typing import TYPE_CHECKING, Union
 
 from configs.envs import DATA_ROOT, ZEPTO_LOCATIONS, ZEPTO_BROWSER_SETTING
 from web.browser import BrowserClient
 from web.fetch import fetch_with_retry
+from web.pacer import get_pacer, is_captcha_title
+from web.instrument import timed
+from web.session import LocationSessionCache
 from file.local_dump import LocalAddressExtractor
 
+if TYPE_CHECKING:
+    from DrissionPage._pages.chromium_tab import ChromiumTab
+
 WEBSITE_NAME = "zepto"
 ZEPTO_MAIN_URL = "https://www.zeptonow.com"
 ZEPTO_ITEM_URL = "https://www.zeptonow.com/pn/x/pvid"
@@ -59,7 +64,7 @@ class ZeptoLocationChecker:
         return True
 
     def check_tab_location(
-        self, tab: ChromiumTab, location_idx: int, extra_msg: str = ""
+        self, tab: "ChromiumTab", location_idx: int, extra_msg: str = ""
     ):
         local_storage_str = tab.local_storage(item="user-position")
         if not local_storage_str:
@@ -88,10 +93,41 @@ class ZeptoLocationChecker:
 
 
 class ZeptoLocationSwitcher:
-    def __init__(self):
+    def __init__(self, client_settings: dict = None, locations: list = None):
+        self.client_settings = client_settings or ZEPTO_BROWSER_SETTING
+        self.locations = locations or ZEPTO_LOCATIONS
         self.checker = ZeptoLocationChecker()
-        self.client = BrowserClient(**ZEPTO_BROWSER_SETTING)
+        self.client = BrowserClient(**self.client_settings)
+        self.session_cache = LocationSessionCache(
+            website=WEBSITE_NAME, client_settings=self.client_settings
+        )
+        self.current_location_idx = None
 
+    def get_location_name(self, location_idx: int) -> str:
+        return self.locations[location_idx].get("name", "")
+
+    def restore_session(self, tab: "ChromiumTab", location_idx: int) -> bool:
+        location_name = self.get_location_name(location_idx)
+        if not self.session_cache.restore(tab, location_name):
+            return False
+        tab.get(ZEPTO_MAIN_URL, timeout=30)
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="ZeptoLocationSwitcher"
+        ):
+            return True
+        self.session_cache.invalidate(location_name)
+        return False
+
+    def save_session(self, tab: "ChromiumTab", location_idx: int, force: bool = True):
+        location_name = self.get_location_name(location_idx)
+        if not force and self.session_cache.get(location_name):
+            return
+        if self.checker.check_tab_location(
+            tab, location_idx, extra_msg="ZeptoLocationSwitcher"
+        ):
+            self.session_cache.snapshot(tab, location_name)
+
+    @timed("set_location", site=WEBSITE_NAME)
     def set_location(self, location_idx: int = 0) -> dict:
         logger.note(f"> Visiting main page: {logstr.mesg(brk(ZEPTO_MAIN_URL))}")
         self.client.start_client()
@@ -105,9 +141,12 @@ class ZeptoLocationSwitcher:
             tab, location_idx, extra_msg="ZeptoLocationSwitcher"
         ):
             logger.okay("  * Location already correctly set. Skip.")
+            self.save_session(tab, location_idx, force=False)
+        elif self.restore_session(tab, location_idx):
+            logger.okay("  * Location restored from session cache. Skip.")
         else:
             logger.note(f"> Setting location:")
-            location_dict = ZEPTO_LOCATIONS[location_idx]
+            location_dict = self.locations[location_idx]
             location_name = location_dict.get("name", "")
             location_text = location_dict.get("text", "")
             logger.file(f"  * {location_name} ({location_text})")
@@ -150,7 +189,9 @@ class ZeptoLocationSwitcher:
             confirm_button.click()
 
             sleep(3)
+            self.save_session(tab, location_idx)
 
+        self.current_location_idx = location_idx
         # self.client.close_other_tabs(create_new_tab=True)
         self.client.stop_client(close_browser=False)
 
@@ -261,9 +302,17 @@ class ZeptoResponseParser:
 
 
 class ZeptoBrowserScraper:
-    def __init__(self, date_str: str = None):
+    def __init__(
+        self,
+        date_str: str = None,
+        client_settings: dict = None,
+        pacer_scope: str = None,
+    ):
         self.date_str = date_str
-        self.client = BrowserClient(**ZEPTO_BROWSER_SETTING)
+        self.client = BrowserClient(**(client_settings or ZEPTO_BROWSER_SETTING))
+        self.pacer = get_pacer(
+            WEBSITE_NAME, scope=pacer_scope, settings_key=WEBSITE_NAME
+        )
         self.init_paths()
         self.init_resp_parser()
 
@@ -274,17 +323,18 @@ class ZeptoBrowserScraper:
     def init_resp_parser(self):
         self.resp_parser = ZeptoResponseParser()
 
-    def get_cookies(self, tab: ChromiumTab) -> dict:
+    def get_cookies(self, tab: "ChromiumTab") -> dict:
         cookies_dict = tab.cookies(all_info=True).as_dict()
         cookies_dict["url"] = tab.url
         cookies_dict["now"] = get_now_str()
         return cookies_dict
 
-    def get_local_storage(self, tab: ChromiumTab) -> dict:
+    def get_local_storage(self, tab: "ChromiumTab") -> dict:
         local_storage = tab.local_storage(item="user-position")
         local_storage_dict = deserialize_str_to_json(local_storage)
         return local_storage_dict
 
+    @timed("fetch", site=WEBSITE_NAME)
     def fetch(self, product_id: Union[str, int], save_cookies: bool = True) -> dict:
         item_url = f"{ZEPTO_ITEM_URL}/{product_id}"
         logger.note(f"> Visiting product page: {logstr.mesg(brk(product_id))}")
@@ -296,6 +346,8 @@ class ZeptoBrowserScraper:
 
         tab.get(item_url, interval=4)
         logger.mesg(f"  ✓ Title: {brk(tab.title)}")
+        if is_captcha_title(tab.title):
+            self.pacer.on_failure("captcha")
 
         product_info = {}
         resp = self.resp_parser.extract_resp(tab.html)
@@ -317,6 +369,7 @@ class ZeptoBrowserScraper:
             dump_path = self.dump_root / filename
         return dump_path
 
+    @timed("dump", site=WEBSITE_NAME)
     def dump(self, product_id: Union[str, int], resp: dict, parent: str = None):
         logger.note(f"  > Dump product data to json:", end=" ")
         dump_path = self.get_dump_path(product_id, parent)
@@ -329,7 +382,11 @@ class ZeptoBrowserScraper:
         self, product_id: Union[str, int], save_cookies: bool = True, parent: str = None
     ) -> dict:
         product_info = fetch_with_retry(
-            self.fetch, product_id=product_id, save_cookies=save_cookies, max_retries=5
+            self.fetch,
+            product_id=product_id,
+            save_cookies=save_cookies,
+            pacer=self.pacer,
+            max_retries=5,
         )
         self.dump(product_id=product_id, resp=product_info, parent=parent)
         return product_info
@@ -352,6 +409,7 @@ class ZeptoProductDataExtractor:
         size_unit_str = f"{packsize} {unit_str}"
         return size_unit_str.strip()
 
+    @timed("extract", site=WEBSITE_NAME)
     def extract(self, info: dict) -> dict:
         logger.enter_quiet(not self.verbose)
         if not info: